@@ -0,0 +1,70 @@
+import json
+import os
+from typing import List, Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from app.services.subscriptionManager.event_broadcaster import (
+    event_broadcaster, EVENT_TYPES, TooManySubscribers
+)
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+# Addresses plus tx hashes one subscription may filter on
+MAX_SUBSCRIPTION_FILTERS = 100
+# Seconds between keep-alive comments on an idle stream, so proxies don't close it
+EVENT_STREAM_HEARTBEAT = float(os.getenv("EVENT_STREAM_HEARTBEAT", "15"))
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    address: List[str] = Query([]),
+    tx_hash: List[str] = Query([]),
+    event: List[str] = Query([]),
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Server-Sent Events stream of TransactionRecorded, PointsAwarded and
+    PointsRedeemed, filtered by customer/retailer `address` and/or `tx_hash`
+    (repeatable; no filter streams everything) and optionally by `event` type.
+    Events of a `tx_hash` mined shortly before subscribing are sent first, and
+    a reconnecting client resumes after its `Last-Event-ID`. A `reorg` message
+    names the first replaced block; events from it onwards are sent again, and
+    its id makes a client reconnecting after it resume from that block.
+    """
+    if event_broadcaster.decoder is None:
+        raise HTTPException(status_code=503, detail="Event stream not started yet.")
+    if len(address) + len(tx_hash) > MAX_SUBSCRIPTION_FILTERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SUBSCRIPTION_FILTERS} addresses and tx hashes per subscription.")
+    unknown = set(event) - set(EVENT_TYPES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown event type(s): {', '.join(sorted(unknown))}.")
+
+    try:
+        subscription = event_broadcaster.subscribe(address, tx_hash, event, after=last_event_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid subscription: {e}")
+    except TooManySubscribers as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+    async def body():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                message = await subscription.get(EVENT_STREAM_HEARTBEAT)
+                if message is None:
+                    if subscription.closed is not None:
+                        yield f"event: closed\ndata: {json.dumps({'reason': subscription.closed})}\n\n"
+                        break
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                event_id = f"id: {message['id']}\n" if "id" in message else ""
+                yield f"{event_id}event: {message['event']}\ndata: {json.dumps(message)}\n\n"
+        finally:
+            event_broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
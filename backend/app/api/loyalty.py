@@ -1,10 +1,23 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+import json
+from web3 import Web3
 from app.startup import contractsStartup as cs
-from app.models.schemas import LoyaltyPointsActionRequest, LoyaltyBalanceResponse
+from app.models.schemas import LoyaltyPointsActionRequest, LoyaltyBalanceResponse, BulkLoyaltyBalanceRequest
 from app.services.loyaltyManager.loyalty_util import get_loyalty_balance, redeem_loyalty_points
+from app.services.loyaltyManager.bulk_balance import resolve_block, stream_loyalty_balances
+from app.services.chainManager.receipt_tracker import receipt_tracker
+from app.services.chainManager.tx_sender import locate_transaction
+from app.services.idempotencyManager.idempotency import idempotency, IdempotencyKeyReused
 
 router = APIRouter(prefix="/loyalty", tags=["Loyalty"])
 
+MAX_BULK_BALANCE_ADDRESSES = 50000
+
+# Idempotency-Key scope of redemptions
+REDEEM_SCOPE = "loyalty.redeem"
+
 @router.get("/balance/{customer_address}", response_model=LoyaltyBalanceResponse)
 async def get_customer_loyalty_balance(customer_address: str):
     if not cs.loyalty_points_contract:
@@ -16,25 +29,169 @@ async def get_customer_loyalty_balance(customer_address: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching loyalty balance: {e}")
 
+@router.post("/balances")
+async def get_customer_loyalty_balances(request: BulkLoyaltyBalanceRequest):
+    """
+    Looks up many balances at once, all read at the same block.
+    Results are streamed back as newline-delimited JSON, one object per address,
+    in the order the underlying JSON-RPC batches complete.
+    """
+    if not cs.loyalty_points_contract:
+        raise HTTPException(status_code=500, detail="Loyalty Points contract not initialized.")
+    if len(request.addresses) > MAX_BULK_BALANCE_ADDRESSES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_BALANCE_ADDRESSES} addresses per request.")
+
+    try:
+        block_number = await resolve_block(request.block_number)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error resolving block number: {e}")
+
+    async def body():
+        async for result in stream_loyalty_balances(request.addresses, block_number):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
 @router.post("/redeem")
-async def redeem_customer_loyalty_points(request: LoyaltyPointsActionRequest):
+async def redeem_customer_loyalty_points(
+    request: LoyaltyPointsActionRequest, wait: bool = True, idempotency_key: Optional[str] = Header(None)
+):
+    """
+    Redeems loyalty points.
+    With `wait=false` the call returns 202 as soon as the transaction is sent; the result
+    is then available from `GET /transactions/status/{transaction_hash}` once mined.
+    A retry carrying the same `Idempotency-Key` header attaches to the original
+    redemption's transaction, or gets its response, instead of redeeming again.
+    """
     if not cs.loyalty_points_contract or not cs.deployer_account:
         raise HTTPException(status_code=500, detail="Loyalty Points contract not initialized or deployer account missing.")
 
+    on_signed = None
+    if idempotency_key:
+        try:
+            record = idempotency.begin(REDEEM_SCOPE, idempotency_key, request.model_dump())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except IdempotencyKeyReused as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if record is not None:
+            return await _replay_redemption(idempotency_key, record, request, wait)
+
+        def on_signed(tx, tx_hash):
+            # Committed before the send, so a retry waits on this transaction rather than redeeming again
+            idempotency.attach(
+                REDEEM_SCOPE, idempotency_key, tx_hash=Web3.to_hex(tx_hash), sender=tx["from"], nonce=tx["nonce"]
+            )
+
     try:
         result = await redeem_loyalty_points(
             request.customer_address,
             request.points_amount,
-            cs.deployer_account
+            wait_for_receipt=wait,
+            on_signed=on_signed
         )
-        if not result["success"]:
-            raise HTTPException(status_code=400, detail=result.get("message", "Failed to redeem points."))
-        return {
-            "message": "Loyalty points redeemed successfully",
-            "points_redeemed": result["points_redeemed"],
-            "transaction_hash": result["transaction_hash"]
-        }
-    except HTTPException as e:
-        raise e
     except Exception as e:
+        if idempotency_key:
+            await _forget_unsent_redemption(idempotency_key)
+            idempotency.abandon(REDEEM_SCOPE, idempotency_key)
         raise HTTPException(status_code=500, detail=f"Error redeeming loyalty points: {e}")
+
+    status_code, content = _redemption_response(result)
+    if idempotency_key:
+        if result.get("transaction_hash") is None:
+            # Refused before anything was sent (e.g. insufficient points): a retry is checked afresh
+            idempotency.abandon(REDEEM_SCOPE, idempotency_key)
+        elif status_code == 202:
+            idempotency.detach(REDEEM_SCOPE, idempotency_key)
+        else:
+            idempotency.complete(REDEEM_SCOPE, idempotency_key, status_code, content)
+    return _respond(status_code, content)
+
+async def _forget_unsent_redemption(idempotency_key):
+    """
+    After a failed redemption, drops the tx hash attached to its key unless the
+    node has the transaction. A send the node rejected must not leave retries
+    waiting on a hash that will never be mined.
+    """
+    record = idempotency.get(REDEEM_SCOPE, idempotency_key)
+    if record is None or record["tx_hash"] is None:
+        return
+    try:
+        state, _ = await locate_transaction(record["tx_hash"], record["sender"], record["nonce"])
+    except Exception as e:
+        print(f"⚠️  Could not look up redemption {record['tx_hash']}, keeping it attached: {e}")
+        return
+    # Right after the send, a transaction the node accepted is either pending or mined
+    if state not in ("mined", "pending"):
+        idempotency.forget_tx(REDEEM_SCOPE, idempotency_key)
+
+async def _replay_redemption(idempotency_key, record, request, wait):
+    """
+    Response for a retry of a redemption already made under the same Idempotency-Key.
+    """
+    if idempotency.running(REDEEM_SCOPE, idempotency_key):
+        # The original request is still being handled in this process
+        record = await idempotency.wait(REDEEM_SCOPE, idempotency_key, timeout=120)
+        if idempotency.running(REDEEM_SCOPE, idempotency_key):
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress.")
+    if record is None:
+        # The original request freed the key without sending anything
+        return await redeem_customer_loyalty_points(request, wait, idempotency_key)
+
+    if record["status"] == "done":
+        return _respond(record["status_code"], record["response"])
+    if record["tx_hash"] is None:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress.")
+
+    try:
+        state, _ = await locate_transaction(record["tx_hash"], record["sender"], record["nonce"])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error looking up redemption {record['tx_hash']}: {e}")
+    if state == "dropped":
+        # Signed but never reached the chain (e.g. the process stopped before sending): redeem afresh
+        idempotency.forget_tx(REDEEM_SCOPE, idempotency_key)
+        idempotency.abandon(REDEEM_SCOPE, idempotency_key)
+        return await redeem_customer_loyalty_points(request, wait, idempotency_key)
+    if state == "unknown":
+        raise HTTPException(status_code=409, detail=(
+            f"Redemption {record['tx_hash']} is unknown but nonce {record['nonce']} of {record['sender']} was used; check it by hand."
+        ))
+
+    result = {"success": True, "pending": True, "points_redeemed": request.points_amount, "transaction_hash": record["tx_hash"]}
+    if wait:
+        try:
+            receipt = await receipt_tracker.wait(record["tx_hash"])
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error waiting for redemption {record['tx_hash']}: {e}")
+        result = {"success": receipt.status == 1, "points_redeemed": request.points_amount, "transaction_hash": record["tx_hash"]}
+
+    status_code, content = _redemption_response(result)
+    if status_code != 202:
+        idempotency.complete(REDEEM_SCOPE, idempotency_key, status_code, content)
+    return _respond(status_code, content)
+
+def _redemption_response(result):
+    """
+    (status code, body) for the result of redeem_loyalty_points.
+    """
+    if not result["success"]:
+        return 400, {"detail": result.get("message", "Failed to redeem points.")}
+    if result.get("pending"):
+        return 202, {
+            "message": "Loyalty points redemption submitted",
+            "points_redeemed": result["points_redeemed"],
+            "transaction_hash": result["transaction_hash"],
+            "status_url": f"/transactions/status/{result['transaction_hash']}"
+        }
+    return 200, {
+        "message": "Loyalty points redeemed successfully",
+        "points_redeemed": result["points_redeemed"],
+        "transaction_hash": result["transaction_hash"]
+    }
+
+def _respond(status_code, content):
+    if status_code >= 400:
+        raise HTTPException(status_code=status_code, detail=content["detail"])
+    if status_code == 202:
+        return JSONResponse(status_code=202, content=content)
+    return content
@@ -0,0 +1,41 @@
+from typing import List
+from fastapi import APIRouter, HTTPException, Query
+from app.models.schemas import OutboxIntentResponse
+from app.services.outboxManager.outbox import outbox
+
+router = APIRouter(prefix="/outbox", tags=["Outbox"])
+
+@router.get("/stats")
+def get_outbox_stats():
+    """
+    Intents per status and how close the queue is to refusing new ones.
+    """
+    return outbox.stats()
+
+@router.get("/dead-letters", response_model=List[OutboxIntentResponse])
+def get_dead_letters(limit: int = Query(100, ge=1, le=1000), offset: int = Query(0, ge=0)):
+    """
+    Intents that were given up on ("dead") or failed on-chain ("failed").
+    """
+    return [_intent_response(intent) for intent in outbox.dead_letters(limit, offset)]
+
+@router.post("/dead-letters/{intent_id}/retry", response_model=OutboxIntentResponse)
+async def retry_dead_letter(intent_id: int):
+    """
+    Queues a dead intent again. Failed ones may have changed state on-chain and must be checked by hand.
+    """
+    if not await outbox.retry(intent_id):
+        raise HTTPException(status_code=409, detail="Only dead intents can be retried.")
+    return _intent_response(outbox.get(intent_id))
+
+@router.get("/{intent_id}", response_model=OutboxIntentResponse)
+def get_outbox_intent(intent_id: int):
+    intent = outbox.get(intent_id)
+    if intent is None:
+        raise HTTPException(status_code=404, detail="Intent not found.")
+    return _intent_response(intent)
+
+def _intent_response(intent):
+    return OutboxIntentResponse(transaction_hash=intent["tx_hash"], **{
+        key: intent[key] for key in ("id", "kind", "status", "attempts", "payload", "result", "error", "created_at", "updated_at")
+    })
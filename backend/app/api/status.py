@@ -1,7 +1,44 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.startup import contractsStartup as cs
+from app.services.chainManager.chain_state import chain_state
+from app.services.chainManager.receipt_tracker import receipt_tracker
+from app.services.chainManager.signer_pool import signer_pool
+from app.services.outboxManager.outbox import outbox
+from app.services.indexManager.event_indexer import event_indexer
 
 router = APIRouter()
 
 @router.get("/")
 def health_check():
     return {"status": "Retail Blockchain API is running!"}
+
+@router.get("/ready")
+def readiness_check():
+    """
+    Reports whether contracts are loaded and chain data is flowing.
+    Returns 503 until then, so load balancers can hold traffic while the node warms up.
+    """
+    ready = bool(
+        cs.retail_transaction_contract and cs.loyalty_points_contract and chain_state.block_number is not None
+        and cs.startup_error is None
+    )
+    return JSONResponse(status_code=200 if ready else 503, content={
+        "ready": ready,
+        "error": cs.startup_error,
+        "chain_id": chain_state.chain_id,
+        "block_number": chain_state.block_number,
+        "gas_price": chain_state.gas_price,
+        "contracts": {
+            "RetailTransaction": cs.retail_transaction_contract.address if cs.retail_transaction_contract else None,
+            "LoyaltyPoints": cs.loyalty_points_contract.address if cs.loyalty_points_contract else None,
+            "CheckoutRouter": cs.checkout_router_contract.address if cs.checkout_router_contract else None,
+        },
+        "signers": len(signer_pool.accounts),
+        "pending_transactions": receipt_tracker.pending_count(),
+        "outbox": outbox.stats(),
+        "event_index": {
+            "backfill_complete": event_indexer.backfill_complete,
+            "backfill_error": event_indexer.backfill_error,
+        },
+    })
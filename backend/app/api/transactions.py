@@ -1,101 +1,489 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import uuid
+from typing import List, Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import JSONResponse
 from web3 import Web3
+from web3.logs import DISCARD
 
 from app.startup import contractsStartup as cs
-from app.models.schemas import RecordTransactionRequest, TransactionResponse
+from app.models.schemas import (
+    RecordTransactionRequest, TransactionResponse, BatchTransactionResponse, TransactionStatusResponse,
+    TransactionHistoryPage, TransactionMatchRequest, TransactionMatch, TransactionMatchResponse
+)
 from app.services.currencyManager.currency_converter import INR_to_wei, wei_to_INR
-from app.services.loyaltyManager.loyalty_util import award_loyalty_points
+from app.services.loyaltyManager.loyalty_util import award_points_intent
+from app.services.loyaltyManager.points_calculator import calculate_loyalty_points
+from app.services.loyaltyManager.balance_cache import balance_cache
+from app.services.chainManager.receipt_tracker import receipt_tracker
+from app.services.indexManager.event_indexer import event_indexer
+from app.services.indexManager.transaction_history import get_transaction_history
+from app.services.indexManager.log_scanner import decode_cursor
+from app.services.metricsManager.request_stages import stage
+from app.services.outboxManager.outbox import outbox, OutboxFull, OUTBOX_RETRY_AFTER
+from app.services.idempotencyManager.idempotency import idempotency, IdempotencyKeyReused
+from app.transactionManager import transaction_matcher
+from app.transactionManager.transaction_matcher import (
+    REFERENCE_TYPES, ReferenceClaimed, sale_references, match_references, index_references, referenced_sale,
+    claim_references, transfer_references, release_references
+)
 
 router = APIRouter(prefix="/transactions", tags=["Transactions"])
 
+# Upper bound on sales per batch so a single transaction stays well under the block gas limit
+MAX_BATCH_SIZE = 50
+# Upper bound on references per bulk match request
+MAX_MATCH_REFERENCES = 50000
+
+# Idempotency-Key scopes, so a key can be reused across endpoints
+RECORD_SCOPE = "transactions.record"
+RECORD_BATCH_SCOPE = "transactions.record_batch"
+
 @router.post("/record", response_model=TransactionResponse)
-async def record_retail_transaction(request: RecordTransactionRequest):
+async def record_retail_transaction(
+    request: RecordTransactionRequest, wait: bool = True, idempotency_key: Optional[str] = Header(None)
+):
+    """
+    Records a sale and awards loyalty points.
+    The sale is queued durably before anything is sent. With `wait=false` the call
+    returns 202 straight away; the result is then available from `GET /outbox/{intent_id}`.
+    A retry carrying the same `Idempotency-Key` header gets the original sale's
+    result (or waits on it) instead of recording the sale again.
+    """
     if not cs.retail_transaction_contract or not cs.loyalty_points_contract or not cs.deployer_account:
         raise HTTPException(status_code=500, detail="Contracts not initialized.")
 
+    if idempotency_key:
+        record = _begin_idempotent(RECORD_SCOPE, idempotency_key, request.model_dump())
+        if record is not None:
+            return await _replay_intent(RECORD_SCOPE, idempotency_key, record, wait, TransactionResponse)
+
+    try:
+        intent_id = await _enqueue_idempotent(RECORD_SCOPE, idempotency_key, [request], "record_transaction", lambda: {
+            "request": request.model_dump(), "amount_wei": INR_to_wei(request.amount_INR)
+        })
+
+        if not wait:
+            return _queued_response(intent_id)
+
+        with stage("outbox_wait"):
+            intent = await outbox.wait(intent_id, timeout=300)
+        return _intent_result(intent, TransactionResponse)
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Error recording transaction: {e}")
+
+def _check_references_distinct(requests):
+    """
+    Refuses a batch carrying the same payment ref or receipt number twice.
+    """
+    references = [reference for request in requests for reference in sale_references(request)]
+    if len(set(references)) != len(references):
+        raise HTTPException(status_code=400, detail="Off-chain references must be unique within a batch.")
+    return references
+
+async def _claim_references(references):
+    """
+    Claims the sales' references in the reference index, which refuses any
+    already recorded or claimed by another sale. Returns the claim's owner.
+    """
+    if not references:
+        return None
+    owner = f"request:{uuid.uuid4().hex}"
     try:
-        amount_in_wei = INR_to_wei(request.amount_INR)
-        
-        nonce = cs.w3.eth.get_transaction_count(cs.deployer_account.address)
+        await asyncio.to_thread(claim_references, references, owner)
+    except ReferenceClaimed as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return owner
+
+async def _enqueue(kind, payload):
+    try:
+        return await outbox.enqueue(kind, payload)
+    except OutboxFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(OUTBOX_RETRY_AFTER)})
+
+def _begin_idempotent(scope, idempotency_key, body):
+    try:
+        return idempotency.begin(scope, idempotency_key, body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+async def _enqueue_idempotent(scope, idempotency_key, requests, kind, build_payload):
+    """
+    Claims the sales' references and queues them, tying the intent to the
+    Idempotency-Key (if any) so retries attach to it. A request refused before
+    anything was queued frees its key and its references.
+    """
+    owner = None
+    try:
+        owner = await _claim_references(_check_references_distinct(requests))
+        intent_id = await _enqueue(kind, build_payload())
+    except Exception:
+        if owner:
+            await asyncio.to_thread(release_references, owner)
+        if idempotency_key:
+            idempotency.abandon(scope, idempotency_key)
+        raise
+    if owner:
+        # The claim now lasts as long as the intent: until its sales are indexed, or it's dead
+        await asyncio.to_thread(transfer_references, owner, f"intent:{intent_id}")
+    if idempotency_key:
+        idempotency.attach(scope, idempotency_key, intent_id=intent_id)
+        idempotency.detach(scope, idempotency_key)
+    return intent_id
+
+async def _replay_intent(scope, idempotency_key, record, wait, response_model):
+    """
+    Response for a retry of a sale already accepted under the same Idempotency-Key:
+    the original intent's result, waited on like the original request would be.
+    """
+    if record["intent_id"] is None:
+        # The original request is still checking and queuing its sales in this process
+        record = await idempotency.wait(scope, idempotency_key, timeout=30)
+    if record is None or record["intent_id"] is None:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress.")
+
+    if wait:
+        with stage("outbox_wait"):
+            intent = await outbox.wait(record["intent_id"], timeout=300)
+    else:
+        intent = outbox.get(record["intent_id"])
+    if intent is None:
+        raise HTTPException(status_code=409, detail=f"Outbox intent {record['intent_id']} is no longer retained.")
+    return _intent_result(intent, response_model)
 
-        tx = cs.retail_transaction_contract.functions.recordTransaction(
-            Web3.to_checksum_address(request.customer_address),
-            Web3.to_checksum_address(request.retailer_address),
+def _queued_response(intent_id):
+    """
+    202 response for sales queued without waiting for them to be mined.
+    """
+    return JSONResponse(status_code=202, content={
+        "message": "Transaction queued",
+        "intent_id": intent_id,
+        "status_url": f"/outbox/{intent_id}"
+    })
+
+def _intent_result(intent, response_model):
+    """
+    Response for an intent the caller waited on: its result once done, 202 if still in flight.
+    """
+    if intent["status"] == "done":
+        return response_model(**intent["result"])
+    if intent["status"] in ("dead", "failed"):
+        raise HTTPException(status_code=500, detail=intent["error"] or "Blockchain transaction failed.")
+    return _queued_response(intent["id"])
+
+def _record_function(request, amount_in_wei):
+    """
+    Contract call for a single sale. With the checkout router deployed, the sale
+    and its loyalty points land atomically in one transaction. A sale's payment
+    ref and receipt number are logged on-chain by that same call.
+    """
+    customer_address = Web3.to_checksum_address(request.customer_address)
+    retailer_address = Web3.to_checksum_address(request.retailer_address)
+
+    if sale_references(request) and transaction_matcher.anchoring_supported:
+        if cs.checkout_router_contract and transaction_matcher.checkout_anchoring_supported:
+            return cs.checkout_router_contract.functions.recordAndAwardReferenced(
+                referenced_sale(request, amount_in_wei), calculate_loyalty_points(amount_in_wei)
+            )
+        # Without the router the points follow as their own intent, as for recordTransaction
+        return cs.retail_transaction_contract.functions.recordReferencedTransactions([referenced_sale(request, amount_in_wei)])
+
+    if cs.checkout_router_contract:
+        return cs.checkout_router_contract.functions.recordAndAward(
+            customer_address,
+            retailer_address,
             amount_in_wei,
             request.product_id,
             request.quantity,
-            request.description
-        ).build_transaction({
-            "from": cs.deployer_account.address,
-            "gasPrice": cs.w3.eth.gas_price,
-            "nonce": nonce,
-            "chainId": cs.w3.eth.chain_id,
-            "gas": 6000000 # Ensure this is sufficient
-        })
+            request.description,
+            calculate_loyalty_points(amount_in_wei)
+        )
+
+    return cs.retail_transaction_contract.functions.recordTransaction(
+        customer_address,
+        retailer_address,
+        amount_in_wei,
+        request.product_id,
+        request.quantity,
+        request.description
+    )
+
+async def _build_record_intent(payload):
+    return _record_function(RecordTransactionRequest(**payload["request"]), payload["amount_wei"])
+
+async def _complete_record_intent(payload, tx_receipt):
+    response, follow_ups = await _complete_recorded_transaction(
+        tx_receipt, tx_receipt.transactionHash, RecordTransactionRequest(**payload["request"]), payload["amount_wei"]
+    )
+    return response.model_dump(), follow_ups
+
+async def _complete_recorded_transaction(tx_receipt, tx_hash, request, amount_in_wei):
+    """
+    Decodes a mined recordTransaction receipt and builds the response, along with
+    the intent awarding its loyalty points (the checkout router awards them itself).
+    """
+    if cs.checkout_router_contract and tx_receipt.to == cs.checkout_router_contract.address:
+        response = _complete_checkout(tx_receipt, tx_hash, request)
+        index_references(response.transaction_id, sale_references(request))
+        return response, []
+
+    # --- NEW FIX START: Extract transaction ID from event ---
+    transaction_id_from_event = None
+    # This assumes your contract has an event named 'TransactionRecorded'
+    # with 'transactionId' as one of its arguments.
+    # Process logs from the receipt to find the event (no extra filter RPC needed)
+    processed_receipt = cs.retail_transaction_contract.events.TransactionRecorded().process_receipt(tx_receipt, errors=DISCARD)
+
+    if processed_receipt:
+        # Assuming there's at least one TransactionRecorded event, get the first one
+        transaction_id_from_event = processed_receipt[0]['args']['transactionId']
+    else:
+        # Fallback or error if event not found (e.g., contract logic changed or no event emitted)
+        print("Warning: TransactionRecorded event not found in receipt. Cannot get transactionId from event.")
+        # You might need to query the contract directly if no event is found or handle this case
+        # For now, let's raise an error as we expect the event to be there.
+        raise HTTPException(status_code=500, detail="Transaction ID not found in blockchain event.")
+    
+    # Now use the ID obtained from the event
+    with stage("read_transaction"):
+        txn_details = await cs.retail_transaction_contract.functions.getTransaction(transaction_id_from_event).call()
+    # --- NEW FIX END ---
+
+    # Queued in the same commit that finishes the sale, so the points can't be lost
+    loyalty_points_awarded = calculate_loyalty_points(amount_in_wei)
+    follow_ups = [award_points_intent(request.customer_address, loyalty_points_awarded)] if loyalty_points_awarded > 0 else []
+
+    response = TransactionResponse(
+        transaction_id=txn_details[0],
+        customer_address=txn_details[1],
+        retailer_address=txn_details[2],
+        amount_INR=wei_to_INR(txn_details[3]),
+        amount_wei=txn_details[3],
+        product_id=txn_details[4],
+        quantity=txn_details[5],
+        timestamp=txn_details[6],
+        description=txn_details[7],
+        transaction_hash=tx_hash.hex(),
+        loyalty_points_awarded=loyalty_points_awarded
+    )
+
+    # Index it right away so reads don't wait for the log follower
+    event_indexer.record_local_transaction(response.model_dump(), tx_receipt, processed_receipt[0]['logIndex'])
+    index_references(response.transaction_id, sale_references(request))
+    return response, follow_ups
+
+def _complete_checkout(tx_receipt, tx_hash, request):
+    """
+    Builds the response for a mined recordAndAward receipt. Everything comes from
+    its events, so no further node calls or transactions are needed.
+    """
+    recorded_events = cs.retail_transaction_contract.events.TransactionRecorded().process_receipt(tx_receipt, errors=DISCARD)
+    if not recorded_events:
+        raise HTTPException(status_code=500, detail="Transaction ID not found in blockchain event.")
+    awarded_events = cs.loyalty_points_contract.events.PointsAwarded().process_receipt(tx_receipt, errors=DISCARD)
+
+    args = recorded_events[0]['args']
+    loyalty_points_awarded = sum(event['args']['amount'] for event in awarded_events)
+    if loyalty_points_awarded:
+        balance_cache.apply_local_change(args['customer'], loyalty_points_awarded, tx_receipt)
+
+    response = TransactionResponse(
+        transaction_id=args['transactionId'],
+        customer_address=args['customer'],
+        retailer_address=args['retailer'],
+        amount_INR=wei_to_INR(args['amountInWei']),
+        amount_wei=args['amountInWei'],
+        product_id=args['productId'],
+        quantity=args['quantity'],
+        timestamp=args['timestamp'],
+        description=request.description or "",
+        transaction_hash=tx_hash.hex(),
+        loyalty_points_awarded=loyalty_points_awarded
+    )
+
+    event_indexer.record_local_transaction(response.model_dump(), tx_receipt, recorded_events[0]['logIndex'])
+    return response
+
+@router.post("/record/batch", response_model=BatchTransactionResponse)
+async def record_retail_transactions_batch(
+    requests: List[RecordTransactionRequest], wait: bool = True, idempotency_key: Optional[str] = Header(None)
+):
+    if not cs.retail_transaction_contract or not cs.loyalty_points_contract or not cs.deployer_account:
+        raise HTTPException(status_code=500, detail="Contracts not initialized.")
+
+    if not requests:
+        raise HTTPException(status_code=400, detail="At least one transaction is required.")
+    if len(requests) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {MAX_BATCH_SIZE} transactions.")
 
-        signed_tx = cs.w3.eth.account.sign_transaction(tx, private_key=cs.deployer_account.key)
-        tx_hash = cs.w3.eth.send_raw_transaction(signed_tx.rawTransaction)
-        
-        tx_receipt = cs.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
-
-        if tx_receipt.status != 1:
-            raise HTTPException(status_code=500, detail="Blockchain transaction failed.")
-
-        # --- NEW FIX START: Extract transaction ID from event ---
-        transaction_id_from_event = None
-        # Get the event object from the contract instance
-        # This assumes your contract has an event named 'TransactionRecorded'
-        # with 'transactionId' as one of its arguments.
-        event_filter = cs.retail_transaction_contract.events.TransactionRecorded.create_filter(
-            fromBlock=tx_receipt.blockNumber,
-            toBlock=tx_receipt.blockNumber,
-            address=cs.retail_transaction_contract.address
+    if idempotency_key:
+        record = _begin_idempotent(
+            RECORD_BATCH_SCOPE, idempotency_key, [request.model_dump() for request in requests]
         )
-        # Process logs from the receipt to find the event
-        # (This is more robust than event_filter.get_all_entries() if the event is the only one in the tx)
-        processed_receipt = cs.retail_transaction_contract.events.TransactionRecorded().process_receipt(tx_receipt)
+        if record is not None:
+            return await _replay_intent(RECORD_BATCH_SCOPE, idempotency_key, record, wait, BatchTransactionResponse)
 
-        if processed_receipt:
-            # Assuming there's at least one TransactionRecorded event, get the first one
-            transaction_id_from_event = processed_receipt[0]['args']['transactionId']
-        else:
-            # Fallback or error if event not found (e.g., contract logic changed or no event emitted)
-            print("Warning: TransactionRecorded event not found in receipt. Cannot get transactionId from event.")
-            # You might need to query the contract directly if no event is found or handle this case
-            # For now, let's raise an error as we expect the event to be there.
-            raise HTTPException(status_code=500, detail="Transaction ID not found in blockchain event.")
-        
-        # Now use the ID obtained from the event
-        txn_details = cs.retail_transaction_contract.functions.getTransaction(transaction_id_from_event).call()
-        # --- NEW FIX END ---
-
-        loyalty_points_award_result = await award_loyalty_points(
-            request.customer_address,
+    try:
+        intent_id = await _enqueue_idempotent(RECORD_BATCH_SCOPE, idempotency_key, requests, "record_batch", lambda: {
+            "requests": [request.model_dump() for request in requests],
+            "amounts_wei": [INR_to_wei(request.amount_INR) for request in requests],
+        })
+
+        if not wait:
+            return _queued_response(intent_id)
+
+        with stage("outbox_wait"):
+            intent = await outbox.wait(intent_id, timeout=300)
+        return _intent_result(intent, BatchTransactionResponse)
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Error recording transactions: {e}")
+
+async def _build_batch_intent(payload):
+    # All sales go into a single recordTransactions call (one signature, one receipt wait).
+    # The gas model scales its cached estimate with the batch's calldata size.
+    sales = list(zip(payload["requests"], payload["amounts_wei"]))
+    if transaction_matcher.anchoring_supported and any(sale_references(request) for request in payload["requests"]):
+        # Logs the sales' references in the same transaction
+        return cs.retail_transaction_contract.functions.recordReferencedTransactions([
+            referenced_sale(request, amount_in_wei) for request, amount_in_wei in sales
+        ])
+    return cs.retail_transaction_contract.functions.recordTransactions([
+        (
+            Web3.to_checksum_address(request["customer_address"]),
+            Web3.to_checksum_address(request["retailer_address"]),
             amount_in_wei,
-            cs.deployer_account
+            request["product_id"],
+            request["quantity"],
+            request["description"] or ""
         )
-        loyalty_points_awarded = loyalty_points_award_result.get("points_awarded", 0)
+        for request, amount_in_wei in sales
+    ])
 
-        return TransactionResponse(
-            transaction_id=txn_details[0],
-            customer_address=txn_details[1],
-            retailer_address=txn_details[2],
-            amount_INR=wei_to_INR(txn_details[3]),
-            amount_wei=txn_details[3],
-            product_id=txn_details[4],
-            quantity=txn_details[5],
-            timestamp=txn_details[6],
-            description=txn_details[7],
+async def _complete_batch_intent(payload, tx_receipt):
+    # One TransactionRecorded event per sale, emitted in input order
+    recorded_events = cs.retail_transaction_contract.events.TransactionRecorded().process_receipt(tx_receipt, errors=DISCARD)
+    if len(recorded_events) != len(payload["requests"]):
+        raise ValueError("Transaction IDs not found in blockchain events.")
+
+    tx_hash = tx_receipt.transactionHash
+    transactions = []
+    follow_ups = []
+    for request, event in zip(payload["requests"], recorded_events):
+        args = event['args']
+        loyalty_points_awarded = calculate_loyalty_points(args['amountInWei'])
+        if loyalty_points_awarded > 0:
+            follow_ups.append(award_points_intent(request["customer_address"], loyalty_points_awarded))
+
+        transaction = TransactionResponse(
+            transaction_id=args['transactionId'],
+            customer_address=args['customer'],
+            retailer_address=args['retailer'],
+            amount_INR=wei_to_INR(args['amountInWei']),
+            amount_wei=args['amountInWei'],
+            product_id=args['productId'],
+            quantity=args['quantity'],
+            timestamp=args['timestamp'],
+            description=request["description"] or "",
             transaction_hash=tx_hash.hex(),
             loyalty_points_awarded=loyalty_points_awarded
         )
+        event_indexer.record_local_transaction(transaction.model_dump(), tx_receipt, event['logIndex'])
+        index_references(transaction.transaction_id, sale_references(request))
+        transactions.append(transaction)
+
+    return BatchTransactionResponse(transaction_hash=tx_hash.hex(), transactions=transactions).model_dump(), follow_ups
+
+outbox.register("record_transaction", _build_record_intent, _complete_record_intent)
+outbox.register("record_batch", _build_batch_intent, _complete_batch_intent)
+
+# ... (rest of the router functions remain the same) ...
 
+@router.get("/status/{tx_hash}", response_model=TransactionStatusResponse)
+async def get_submitted_transaction_status(tx_hash: str):
+    status = receipt_tracker.get_status(tx_hash)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Transaction hash is not tracked by this server.")
+    return TransactionStatusResponse(**status)
+
+@router.get("/by-customer/{customer_address}", response_model=TransactionHistoryPage)
+async def get_customer_transaction_history(
+    customer_address: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    return await _transaction_history_page("customer", customer_address, limit, cursor)
+
+@router.get("/by-retailer/{retailer_address}", response_model=TransactionHistoryPage)
+async def get_retailer_transaction_history(
+    retailer_address: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    return await _transaction_history_page("retailer", retailer_address, limit, cursor)
+
+async def _transaction_history_page(party, address, limit, cursor):
+    if not cs.retail_transaction_contract:
+        raise HTTPException(status_code=500, detail="Retail Transaction contract not initialized.")
+    if not Web3.is_address(address):
+        raise HTTPException(status_code=400, detail="Invalid address.")
+    if cursor is not None:
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+    try:
+        items, next_cursor = await get_transaction_history(cs.retail_transaction_contract, party, address, limit, cursor)
+        return TransactionHistoryPage(items=items, next_cursor=next_cursor)
     except Exception as e:
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Error recording transaction: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching transaction history: {e}")
 
-# ... (rest of the router functions remain the same) ...
+@router.get("/by-reference/{reference_type}/{external_ref}", response_model=TransactionMatch)
+async def match_off_chain_reference(reference_type: str, external_ref: str):
+    """
+    Finds the on-chain transaction recorded for a payment gateway ref or POS receipt number.
+    """
+    if reference_type not in REFERENCE_TYPES:
+        raise HTTPException(status_code=400, detail=f"Reference type must be one of: {', '.join(REFERENCE_TYPES)}.")
+    match = match_references([(reference_type, external_ref)]).get((reference_type, external_ref))
+    if match is None:
+        raise HTTPException(status_code=404, detail="No transaction recorded for this reference.")
+    return TransactionMatch(**match)
+
+@router.post("/match", response_model=TransactionMatchResponse)
+async def match_off_chain_references(request: TransactionMatchRequest):
+    """
+    Bulk version of `/by-reference`, for reconciliation jobs.
+    """
+    if len(request.references) > MAX_MATCH_REFERENCES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_MATCH_REFERENCES} references per request.")
+    if any(reference.reference_type not in REFERENCE_TYPES for reference in request.references):
+        raise HTTPException(status_code=400, detail=f"Reference type must be one of: {', '.join(REFERENCE_TYPES)}.")
+
+    found = match_references((reference.reference_type, reference.external_ref) for reference in request.references)
+    matches = []
+    unmatched = []
+    for reference in request.references:
+        match = found.get((reference.reference_type, reference.external_ref))
+        if match is None:
+            unmatched.append(reference)
+        else:
+            matches.append(TransactionMatch(**match))
+    return TransactionMatchResponse(matches=matches, unmatched=unmatched)
 
 @router.get("/{transaction_id}", response_model=TransactionResponse)
 async def get_retail_transaction(transaction_id: int):
@@ -103,32 +491,16 @@ async def get_retail_transaction(transaction_id: int):
         raise HTTPException(status_code=500, detail="Retail Transaction contract not initialized.")
 
     try:
-        txn_details = cs.retail_transaction_contract.functions.getTransaction(transaction_id).call()
+        # Served from the local event index, which also knows the tx hash and points awarded
+        indexed = event_indexer.get_transaction(transaction_id)
+        if indexed and indexed["description"] is not None:
+            return _transaction_response_from_index(indexed)
+
+        # Not indexed yet (e.g. the indexer is still catching up): read it from the chain
+        txn_details = await cs.retail_transaction_contract.functions.getTransaction(transaction_id).call()
         if txn_details[0] == 0: # Assuming 0 indicates not found
             raise HTTPException(status_code=404, detail="Transaction not found.")
 
-        # You need to determine how to get loyalty_points_awarded for an existing transaction.
-        # If it's stored in the smart contract's transaction details, use its index.
-        # If it needs to be calculated or retrieved from another source, add that logic here.
-        # For demonstration, let's assume it's the 8th element if your contract returns it.
-        # If not, you might need to query your loyalty contract or store it with the transaction.
-        # For now, I'll put a placeholder or a default value if it's not directly in txn_details.
-
-        # *** IMPORTANT: Replace `txn_details[8]` with the actual index if loyalty points are returned,
-        # or implement logic to fetch them if they're not part of getTransaction() directly. ***
-        # If your getTransaction does NOT return loyalty_points_awarded, you might have to query
-        # your loyalty contract for the customer's balance or rethink how this field is populated
-        # when fetching a historical transaction.
-        
-        # Placeholder for loyalty_points_awarded if not directly in txn_details, adjust as needed:
-        # For now, setting to 0 or a sensible default if it's not directly part of the fetched txn_details
-        # If your contract's getTransaction function truly does not return this, you'll need a different approach.
-        default_loyalty_points_awarded = 0 # Or fetch from loyalty contract if possible
-
-        # If txn_details has loyalty points awarded at a specific index, use that:
-        # For example, if it's txn_details[8] after description, use it:
-        # loyalty_points = txn_details[8] if len(txn_details) > 8 else default_loyalty_points_awarded
-
         return TransactionResponse(
             transaction_id=txn_details[0],
             customer_address=txn_details[1],
@@ -139,13 +511,28 @@ async def get_retail_transaction(transaction_id: int):
             quantity=txn_details[5],
             timestamp=txn_details[6],
             description=txn_details[7],
-            transaction_hash="", # This won't be available directly when fetching by ID
-            # --- FIX: Add loyalty_points_awarded here ---
-            loyalty_points_awarded=default_loyalty_points_awarded # Or the actual value from txn_details if available
-            # e.g., loyalty_points_awarded=txn_details[8] if your smart contract getTransaction returns it
+            transaction_hash=indexed["transaction_hash"] if indexed else "",
+            loyalty_points_awarded=indexed["loyalty_points_awarded"] if indexed else 0
         )
 
+    except HTTPException as e:
+        raise e
     except Exception as e:
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Error fetching transaction: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error fetching transaction: {e}")
+
+def _transaction_response_from_index(indexed):
+    return TransactionResponse(
+        transaction_id=indexed["transaction_id"],
+        customer_address=indexed["customer_address"],
+        retailer_address=indexed["retailer_address"],
+        amount_INR=wei_to_INR(indexed["amount_wei"]),
+        amount_wei=indexed["amount_wei"],
+        product_id=indexed["product_id"],
+        quantity=indexed["quantity"],
+        timestamp=indexed["timestamp"],
+        description=indexed["description"],
+        transaction_hash=indexed["transaction_hash"],
+        loyalty_points_awarded=indexed["loyalty_points_awarded"]
+    )
@@ -1,6 +1,16 @@
-from fastapi import FastAPI
-from app.api import transactions, loyalty, status
+import asyncio
+from fastapi import FastAPI, Request
+from app.api import transactions, loyalty, status, metrics, outbox, events
 from app.startup import contractsStartup
+from app.services.chainManager.chain_state import chain_state
+from app.services.chainManager.receipt_tracker import receipt_tracker
+from app.services.chainManager.signer_pool import signer_pool
+from app.services.chainManager.log_follower import log_follower
+from app.services.indexManager.event_indexer import event_indexer
+from app.services.loyaltyManager.balance_cache import balance_cache
+from app.services.subscriptionManager.event_broadcaster import event_broadcaster
+from app.services.outboxManager.outbox import outbox as outbox_queue
+from app.services.metricsManager.request_stages import start_span, finish_span
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import os
@@ -23,16 +33,87 @@ app.add_middleware(
     allow_origins=origins,
     allow_credentials=True,        
     allow_methods=["GET", "POST"],     
-    allow_headers=["Authorization", "Content-Type"],
+    allow_headers=["Authorization", "Content-Type", "Idempotency-Key", "Last-Event-ID"],
 )
 
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    # Stages (nonce, signing, sends, receipt waits, each RPC) are added to the span as the request runs
+    span = start_span()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        finish_span(span, request.method, route.path if route else "unmatched", status_code)
+
+# Background task bringing up contracts and chain services
+startup_task = None
+
 @app.on_event("startup")
 async def startup_event():
-    await contractsStartup.init_contracts()
+    # Don't block (or fail) server startup on the node; /ready reports when everything is up
+    global startup_task
+    startup_task = asyncio.create_task(start_services())
+
+async def start_services():
+    """
+    Brings up contracts and chain services. If any step fails (e.g. the node
+    blips right after the contracts loaded), whatever started is stopped again
+    and the whole sequence is retried with backoff, so the process never stays
+    half-started.
+    """
+    delay = contractsStartup.INIT_RETRY_DELAY
+    while True:
+        try:
+            await contractsStartup.init_contracts_with_retry()
+            await chain_state.start()
+            await receipt_tracker.start()
+            await signer_pool.start()
+            await log_follower.start()
+            await event_indexer.start(contractsStartup.retail_transaction_contract, contractsStartup.loyalty_points_contract)
+            await balance_cache.start(contractsStartup.loyalty_points_contract)
+            await event_broadcaster.start(contractsStartup.retail_transaction_contract, contractsStartup.loyalty_points_contract)
+            contractsStartup.startup_error = None
+            return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            contractsStartup.startup_error = str(e)
+            print(f"⚠️  Starting services failed, retrying in {delay}s: {e}")
+            await stop_services()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, contractsStartup.INIT_MAX_RETRY_DELAY)
+
+async def stop_services():
+    # The outbox goes first so nothing new is sent; whatever it had in flight is replayed on the next start
+    await outbox_queue.stop()
+    await event_broadcaster.stop()
+    await balance_cache.stop()
+    await event_indexer.stop()
+    await log_follower.stop()
+    await signer_pool.stop()
+    await chain_state.stop()
+    await receipt_tracker.stop()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if startup_task is not None and not startup_task.done():
+        startup_task.cancel()
+        try:
+            await startup_task
+        except asyncio.CancelledError:
+            pass
+    await stop_services()
 
 app.include_router(status.router)
+app.include_router(metrics.router)
 app.include_router(transactions.router)
 app.include_router(loyalty.router)
+app.include_router(outbox.router)
+app.include_router(events.router)
 
 @app.get("/")
 def read_root():
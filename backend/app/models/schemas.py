@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 class RecordTransactionRequest(BaseModel):
     customer_address: str
@@ -8,6 +8,8 @@ class RecordTransactionRequest(BaseModel):
     product_id: str
     quantity: int
     description: Optional[str] = ""
+    payment_ref: Optional[str] = None # Payment gateway reference, for matching payments to the sale
+    receipt_number: Optional[str] = None # POS receipt number
 
 class TransactionResponse(BaseModel):
     transaction_id: int
@@ -22,6 +24,52 @@ class TransactionResponse(BaseModel):
     transaction_hash: str
     loyalty_points_awarded: int
 
+class BatchTransactionResponse(BaseModel):
+    transaction_hash: str
+    transactions: List[TransactionResponse]
+
+class TransactionStatusResponse(BaseModel):
+    transaction_hash: str
+    kind: Optional[str] = None
+    status: str # "pending", "mined" or "failed"
+    replaced_by: Optional[str] = None # Hash of the re-priced transaction if the original got stuck
+    block_number: Optional[int] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+class TransactionReference(BaseModel):
+    reference_type: str # "payment_ref" or "receipt_number"
+    external_ref: str
+
+class TransactionMatchRequest(BaseModel):
+    references: List[TransactionReference]
+
+class TransactionMatch(TransactionReference):
+    transaction_id: int
+    transaction_hash: Optional[str] = None
+    block_number: Optional[int] = None
+
+class TransactionMatchResponse(BaseModel):
+    matches: List[TransactionMatch]
+    unmatched: List[TransactionReference]
+
+class TransactionHistoryItem(BaseModel):
+    transaction_id: int
+    customer_address: str
+    retailer_address: str
+    amount_INR: float
+    amount_wei: int
+    product_id: str
+    quantity: int
+    timestamp: int
+    transaction_hash: str
+    block_number: int
+    log_index: int
+
+class TransactionHistoryPage(BaseModel):
+    items: List[TransactionHistoryItem]
+    next_cursor: Optional[str] = None # Pass back as `cursor` to fetch the next (older) page
+
 class LoyaltyPointsActionRequest(BaseModel):
     customer_address: str
     points_amount: int
@@ -29,3 +77,19 @@ class LoyaltyPointsActionRequest(BaseModel):
 class LoyaltyBalanceResponse(BaseModel):
     customer_address: str
     balance: int
+
+class BulkLoyaltyBalanceRequest(BaseModel):
+    addresses: List[str]
+    block_number: Optional[int] = None # Defaults to the latest indexed block
+
+class OutboxIntentResponse(BaseModel):
+    id: int
+    kind: str # "record_transaction", "record_batch" or "award_points"
+    status: str # "queued", "sending", "signed", "done", "dead" or "failed"
+    attempts: int
+    payload: Dict[str, Any]
+    transaction_hash: Optional[str] = None # Set once signed; the mined one may be a re-priced replacement
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
@@ -0,0 +1,94 @@
+import asyncio
+from app.services.contractsManager.contract_config import async_w3, CHAIN_POLL_INTERVAL
+
+# Fallback tip when the node doesn't support eth_maxPriorityFeePerGas (same value deploy_utils uses)
+DEFAULT_PRIORITY_FEE_WEI = 2 * 10**9
+
+class ChainState:
+    """
+    Cached chain metadata and fee data for the write paths.
+
+    The chain id is fetched once. Fee data (legacy gas price plus the EIP-1559
+    base fee and priority fee) is refreshed by a background task whenever a new
+    block is seen, so building a transaction needs no extra RPCs.
+    """
+
+    def __init__(self, web3_instance, poll_interval=CHAIN_POLL_INTERVAL):
+        self.web3 = web3_instance
+        self.poll_interval = poll_interval
+        self.chain_id = None
+        self.block_number = None
+        self.gas_price = None
+        self.base_fee_per_gas = None
+        self.max_priority_fee_per_gas = None
+        self._refresh_lock = asyncio.Lock()
+        self._task = None
+
+    async def get_chain_id(self) -> int:
+        if self.chain_id is None:
+            self.chain_id = await self.web3.eth.chain_id
+        return self.chain_id
+
+    async def get_gas_price(self) -> int:
+        if self.gas_price is None:
+            await self.refresh()
+        return self.gas_price
+
+    async def get_fee_params(self) -> dict:
+        """
+        Fee fields for a new transaction: EIP-1559 `maxFeePerGas` (room for the
+        base fee to double) and `maxPriorityFeePerGas` where the chain supports
+        them, otherwise a legacy `gasPrice`.
+        """
+        if self.gas_price is None:
+            await self.refresh()
+        if self.base_fee_per_gas is None:
+            return {"gasPrice": self.gas_price}
+        return {
+            "maxFeePerGas": 2 * self.base_fee_per_gas + self.max_priority_fee_per_gas,
+            "maxPriorityFeePerGas": self.max_priority_fee_per_gas,
+        }
+
+    async def refresh(self, block_identifier="latest"):
+        async with self._refresh_lock:
+            block = await self.web3.eth.get_block(block_identifier)
+            self.gas_price = await self.web3.eth.gas_price
+
+            # Pre-London chains (and some dev nodes) have no base fee
+            self.base_fee_per_gas = block.get("baseFeePerGas")
+            if self.base_fee_per_gas is not None:
+                try:
+                    self.max_priority_fee_per_gas = await self.web3.eth.max_priority_fee
+                except Exception:
+                    self.max_priority_fee_per_gas = DEFAULT_PRIORITY_FEE_WEI
+
+            self.block_number = block["number"]
+
+    async def start(self):
+        if self._task is None:
+            await self.get_chain_id()
+            self._task = asyncio.create_task(self._follow_blocks())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _follow_blocks(self):
+        while True:
+            try:
+                block_number = await self.web3.eth.block_number
+                if block_number != self.block_number:
+                    await self.refresh(block_number)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Chain state refresh failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+# Shared cache read by the transaction sender
+chain_state = ChainState(async_w3)
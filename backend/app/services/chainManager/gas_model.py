@@ -0,0 +1,88 @@
+from app.services.contractsManager.contract_config import async_w3
+from .receipt_tracker import receipt_tracker
+
+# Headroom added on top of a cached estimate: a percentage plus one storage slot
+# going from zero to non-zero, since e.g. the first award to a new customer costs
+# ~20k gas more than the award the estimate may have been taken for
+GAS_MARGIN_PERCENT = 20
+GAS_MARGIN_FIXED = 25000
+
+# Fragments nodes use when a transaction's gas limit is below its intrinsic cost
+GAS_LIMIT_ERROR_MARKERS = (
+    "intrinsic gas too low",
+    "insufficient gas",
+    "gas too low",
+)
+
+def is_gas_limit_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(marker in message for marker in GAS_LIMIT_ERROR_MARKERS)
+
+def size_class(data) -> int:
+    """
+    Buckets calldata by length in 32-byte words, in powers of two.
+    """
+    words = max(1, (len(data) - 2) // 64)
+    return words.bit_length()
+
+class GasModel:
+    """
+    Gas limits for contract calls, estimated once per (contract, function,
+    calldata size class) instead of reserving a fixed 6,000,000 per transaction.
+
+    The highest estimate seen for a key is cached, scaled up for longer
+    calldata within the class and padded with a margin. When a transaction
+    with a cached limit runs out of gas, the key is dropped so the next call
+    estimates again.
+    """
+
+    def __init__(self, web3_instance, margin_percent=GAS_MARGIN_PERCENT, margin_fixed=GAS_MARGIN_FIXED):
+        self.web3 = web3_instance
+        self.margin_percent = margin_percent
+        self.margin_fixed = margin_fixed
+        self._estimates = {}
+
+    def key_for(self, contract_function, data=None):
+        data = data or contract_function._encode_transaction_data()
+        return (contract_function.address, contract_function.fn_name, size_class(data))
+
+    async def gas_limit(self, contract_function, sender) -> int:
+        data = contract_function._encode_transaction_data()
+        key = self.key_for(contract_function, data)
+        cached = self._estimates.get(key)
+        if cached is None:
+            estimate = await contract_function.estimate_gas({"from": sender})
+            # Concurrent first calls may both estimate; keep the higher one
+            cached = self._estimates.get(key)
+            if cached is None or estimate > cached[0]:
+                cached = self._estimates[key] = (estimate, len(data))
+
+        # Larger calldata within a class (longer strings, more batch items) is scaled up linearly
+        estimate, estimated_length = cached
+        estimate = estimate * max(len(data), estimated_length) // estimated_length
+        return estimate + estimate * self.margin_percent // 100 + self.margin_fixed
+
+    def watch(self, contract_function, tx_hash, gas_limit):
+        """
+        Re-estimates the function next time if `tx_hash` fails having used all of `gas_limit`.
+        """
+        key = self.key_for(contract_function)
+
+        def check(future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            receipt = future.result()
+            if receipt.status != 1 and receipt.gasUsed >= gas_limit:
+                print(f"⚠️  {key[1]} ran out of gas at {gas_limit}, re-estimating next time.")
+                self._estimates.pop(key, None)
+
+        receipt_tracker.track(tx_hash)["future"].add_done_callback(check)
+
+    def forget(self, contract_function):
+        self._estimates.pop(self.key_for(contract_function), None)
+
+    def invalidate(self):
+        self._estimates.clear()
+
+# Shared model used by the transaction sender
+gas_model = GasModel(async_w3)
@@ -0,0 +1,132 @@
+import asyncio
+from web3.exceptions import BlockNotFound
+from app.services.contractsManager.contract_config import async_w3, CHAIN_POLL_INTERVAL
+
+# Blocks a reorg can reach back; changes deeper than this are treated as final
+CONFIRMATION_DEPTH = 12
+# Largest block range requested in a single eth_getLogs call while catching up
+MAX_BLOCKS_PER_POLL = 2000
+
+class LogFollower:
+    """
+    Shared follower for the logs of our contracts.
+
+    One background loop polls for new blocks, fetches the logs of every
+    watched address with a single eth_getLogs per poll and hands them to all
+    subscribers, so features that react to contract events don't each poll
+    the node. The hashes of recently processed blocks are remembered; if one
+    of them changes, subscribers are told which block the reorg starts at and
+    the affected range is fetched again.
+    """
+
+    def __init__(self, web3_instance, poll_interval=CHAIN_POLL_INTERVAL, confirmation_depth=CONFIRMATION_DEPTH):
+        self.web3 = web3_instance
+        self.poll_interval = poll_interval
+        self.confirmation_depth = confirmation_depth
+        self.addresses = set()
+        self.next_block = None
+        self._subscribers = []
+        self._block_hashes = {}
+        self._task = None
+
+    def watch(self, *addresses):
+        self.addresses.update(addresses)
+
+    def subscribe(self, on_logs, on_reorg=None):
+        """
+        Registers coroutine callbacks: `on_logs(logs, from_block, to_block)` for every
+        polled block range and `on_reorg(block_number)` with the first block that was replaced.
+        """
+        self._subscribers.append((on_logs, on_reorg))
+
+    def unsubscribe(self, on_logs):
+        self._subscribers = [s for s in self._subscribers if s[0] is not on_logs]
+
+    async def start(self):
+        if self._task is not None:
+            return
+        head = await self.web3.eth.block_number
+        self.next_block = head + 1
+        # Remember the recent canonical chain so a reorg right after startup is noticed
+        await self._remember_blocks(range(max(0, head - self.confirmation_depth + 1), head + 1))
+        self._task = asyncio.create_task(self._follow())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _follow(self):
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Log follower poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def poll(self):
+        fork_block = await self._find_fork()
+        if fork_block is not None:
+            print(f"⚠️  Chain reorg detected from block {fork_block}")
+            for block_number in [n for n in self._block_hashes if n >= fork_block]:
+                del self._block_hashes[block_number]
+            self.next_block = fork_block
+            for _, on_reorg in self._subscribers:
+                if on_reorg is not None:
+                    await on_reorg(fork_block)
+
+        head = await self.web3.eth.block_number
+        if head < self.next_block:
+            return
+
+        to_block = min(head, self.next_block + MAX_BLOCKS_PER_POLL - 1)
+        logs = []
+        if self.addresses:
+            logs = await self.web3.eth.get_logs({
+                "fromBlock": self.next_block,
+                "toBlock": to_block,
+                "address": sorted(self.addresses),
+            })
+
+        await self._remember_blocks([to_block])
+        for log in logs:
+            self._block_hashes.setdefault(log["blockNumber"], log["blockHash"])
+
+        for on_logs, _ in self._subscribers:
+            await on_logs(logs, self.next_block, to_block)
+
+        self.next_block = to_block + 1
+        oldest_kept = to_block - self.confirmation_depth
+        for block_number in [n for n in self._block_hashes if n <= oldest_kept]:
+            del self._block_hashes[block_number]
+
+    async def _remember_blocks(self, block_numbers):
+        blocks = await asyncio.gather(*(self.web3.eth.get_block(n) for n in block_numbers))
+        for block in blocks:
+            self._block_hashes[block["number"]] = block["hash"]
+
+    async def _find_fork(self):
+        """
+        Returns the first block whose remembered hash is no longer canonical, or None.
+        """
+        fork_block = None
+        for block_number in sorted(self._block_hashes, reverse=True):
+            try:
+                block = await self.web3.eth.get_block(block_number)
+            except BlockNotFound:
+                # The new canonical chain is shorter than the one we followed
+                fork_block = block_number
+                continue
+            if block["hash"] == self._block_hashes[block_number]:
+                break
+            fork_block = block_number
+        return fork_block
+
+# Shared follower; the event indexer and other log consumers subscribe to it
+log_follower = LogFollower(async_w3)
@@ -0,0 +1,68 @@
+import asyncio
+import heapq
+
+# Substrings node clients (geth, Ganache, Hardhat/Anvil) use when a nonce is out of sync
+NONCE_ERROR_MARKERS = (
+    "nonce too low",
+    "nonce too high",
+    "correct nonce",
+    "replacement transaction underpriced",
+)
+
+def is_nonce_error(error: Exception) -> bool:
+    """
+    Returns True if the node rejected a transaction because of its nonce.
+    """
+    message = str(error).lower()
+    return any(marker in message for marker in NONCE_ERROR_MARKERS)
+
+class NonceManager:
+    """
+    Hands out nonces for locally controlled accounts.
+
+    Each account is seeded once from the node's pending transaction count and
+    nonces are then allocated in-process, so concurrent writes never share a nonce
+    and no `get_transaction_count` round trip is needed per transaction.
+    Nonces whose transaction never reached the node are released back and reused
+    first, so a failed send doesn't leave a gap that blocks every later transaction.
+    """
+
+    def __init__(self, web3_instance):
+        self.web3 = web3_instance
+        self._lock = asyncio.Lock()
+        self._next_nonce = {}
+        self._released = {}
+
+    async def allocate(self, address) -> int:
+        async with self._lock:
+            if address not in self._next_nonce:
+                await self._seed(address)
+
+            released = self._released[address]
+            if released:
+                return heapq.heappop(released)
+
+            nonce = self._next_nonce[address]
+            self._next_nonce[address] += 1
+            return nonce
+
+    async def release(self, address, nonce: int):
+        """
+        Gives back a nonce whose transaction was never accepted by the node.
+        """
+        async with self._lock:
+            if address not in self._next_nonce or nonce >= self._next_nonce[address]:
+                return
+            if nonce not in self._released[address]:
+                heapq.heappush(self._released[address], nonce)
+
+    async def resync(self, address):
+        """
+        Re-seeds an account from the node, e.g. after a "nonce too low/high" error.
+        """
+        async with self._lock:
+            await self._seed(address)
+
+    async def _seed(self, address):
+        self._next_nonce[address] = await self.web3.eth.get_transaction_count(address, "pending")
+        self._released[address] = []
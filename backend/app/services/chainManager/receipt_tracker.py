@@ -0,0 +1,197 @@
+import asyncio
+import time
+from collections import OrderedDict
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+from app.services.contractsManager.contract_config import async_w3, CHAIN_POLL_INTERVAL
+from app.services.metricsManager.request_stages import stage
+
+# How many finished transactions are kept around for status lookups
+MAX_FINISHED_ENTRIES = 10000
+
+def normalize_tx_hash(tx_hash) -> str:
+    """
+    Returns the lower-case 0x-prefixed hex form used as the tracker key.
+    """
+    if isinstance(tx_hash, str):
+        tx_hash = tx_hash.lower()
+        return tx_hash if tx_hash.startswith("0x") else f"0x{tx_hash}"
+    return Web3.to_hex(tx_hash).lower()
+
+class ReceiptTracker:
+    """
+    Waits for transaction receipts on behalf of every request.
+
+    A single background loop checks for a new block and then fetches the
+    receipts of all pending hashes together, instead of each request running
+    its own `wait_for_transaction_receipt` poll loop. Callers either await
+    `wait()` or register an `on_mined` callback and return immediately; the
+    decoded callback result is kept for `get_status()`.
+    A transaction re-sent under a new hash (same nonce, higher fee) stays
+    tracked under its original hash and finishes with whichever gets mined.
+    """
+
+    def __init__(self, web3_instance, poll_interval=CHAIN_POLL_INTERVAL, max_finished=MAX_FINISHED_ENTRIES):
+        self.web3 = web3_instance
+        self.poll_interval = poll_interval
+        self.max_finished = max_finished
+        self._pending = {}
+        self._finished = OrderedDict()
+        self._aliases = {}  # replacement hash -> original hash
+        self._last_block = None
+        self._task = None
+        self._callback_tasks = set()
+
+    def track(self, tx_hash, kind=None, on_mined=None):
+        """
+        Starts tracking `tx_hash` and returns the entry for it.
+        `on_mined` is an optional coroutine function called with the receipt of a
+        successful transaction; its return value becomes the entry's `result`.
+        """
+        entry = self._lookup(tx_hash)
+        if entry is not None:
+            if on_mined is not None and entry["on_mined"] is None:
+                entry["on_mined"] = on_mined
+            if kind is not None and entry["kind"] is None:
+                entry["kind"] = kind
+            return entry
+
+        key = normalize_tx_hash(tx_hash)
+        entry = {
+            "transaction_hash": key,
+            "replaced_by": None,
+            "kind": kind,
+            "status": "pending",
+            "submitted_at": time.time(),
+            "block_number": None,
+            "result": None,
+            "error": None,
+            "on_mined": on_mined,
+            "future": asyncio.get_running_loop().create_future(),
+        }
+        self._pending[key] = entry
+        self._ensure_running()
+        return entry
+
+    def replace(self, tx_hash, new_tx_hash):
+        """
+        Records that a pending `tx_hash` was re-sent as `new_tx_hash`.
+        """
+        entry = self._lookup(tx_hash)
+        if entry is None or entry["status"] != "pending":
+            return
+        new_key = normalize_tx_hash(new_tx_hash)
+        self._aliases[new_key] = entry["transaction_hash"]
+        entry["replaced_by"] = new_key
+
+    async def wait(self, tx_hash, timeout=120):
+        """
+        Waits until `tx_hash` is mined and returns its receipt.
+        """
+        entry = self.track(tx_hash)
+        with stage("receipt_wait"):
+            return await asyncio.wait_for(asyncio.shield(entry["future"]), timeout)
+
+    def get_status(self, tx_hash):
+        entry = self._lookup(tx_hash)
+        if entry is None:
+            return None
+        return {
+            "transaction_hash": entry["transaction_hash"],
+            "kind": entry["kind"],
+            "status": entry["status"],
+            "replaced_by": entry["replaced_by"],
+            "block_number": entry["block_number"],
+            "result": entry["result"],
+            "error": entry["error"],
+        }
+
+    def _lookup(self, tx_hash):
+        key = normalize_tx_hash(tx_hash)
+        key = self._aliases.get(key, key)
+        return self._pending.get(key) or self._finished.get(key)
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    async def start(self):
+        self._ensure_running()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._poll_receipts())
+
+    async def _poll_receipts(self):
+        while True:
+            try:
+                if self._pending:
+                    block_number = await self.web3.eth.block_number
+                    # Receipts can only appear with a new block
+                    if block_number != self._last_block:
+                        self._last_block = block_number
+                        await self._check_pending()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Receipt polling failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _check_pending(self):
+        # Replaced transactions are checked under every hash they were sent with
+        lookups = [(key, key) for key in self._pending]
+        lookups += [(key, alias) for alias, key in self._aliases.items() if key in self._pending]
+        receipts = await asyncio.gather(
+            *(self.web3.eth.get_transaction_receipt(tx_hash) for _, tx_hash in lookups),
+            return_exceptions=True
+        )
+
+        for (key, tx_hash), receipt in zip(lookups, receipts):
+            if isinstance(receipt, TransactionNotFound):
+                continue
+            if isinstance(receipt, Exception):
+                print(f"⚠️  Could not fetch receipt for {tx_hash}: {receipt}")
+                continue
+            if key not in self._pending:
+                continue
+
+            entry = self._pending.pop(key)
+            entry["block_number"] = receipt.blockNumber
+            self._remember(entry)
+
+            # Callbacks may themselves wait on receipts, so never run them inside the poll loop
+            task = asyncio.create_task(self._finish(entry, receipt))
+            self._callback_tasks.add(task)
+            task.add_done_callback(self._callback_tasks.discard)
+
+    async def _finish(self, entry, receipt):
+        if receipt.status == 1 and entry["on_mined"] is not None:
+            try:
+                entry["result"] = await entry["on_mined"](receipt)
+            except Exception as e:
+                entry["error"] = str(e)
+        elif receipt.status != 1:
+            entry["error"] = "Blockchain transaction failed."
+
+        entry["status"] = "mined" if receipt.status == 1 and entry["error"] is None else "failed"
+        entry["on_mined"] = None
+        if not entry["future"].done():
+            entry["future"].set_result(receipt)
+
+    def _remember(self, entry):
+        self._finished[entry["transaction_hash"]] = entry
+        while len(self._finished) > self.max_finished:
+            key, _ = self._finished.popitem(last=False)
+            for alias in [alias for alias, original in self._aliases.items() if original == key]:
+                del self._aliases[alias]
+
+# Shared tracker used by the API routes and loyalty services
+receipt_tracker = ReceiptTracker(async_w3)
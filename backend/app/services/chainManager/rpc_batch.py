@@ -0,0 +1,76 @@
+import asyncio
+import itertools
+import time
+import aiohttp
+from web3 import Web3
+from web3.providers.async_rpc import AsyncHTTPProvider
+from app.services.metricsManager.rpc_metrics import record_rpc
+
+# Requests per JSON-RPC batch; most nodes cap batches somewhere between 100 and 1000
+RPC_BATCH_SIZE = 100
+RPC_BATCH_TIMEOUT = 30
+
+_request_ids = itertools.count(1)
+
+async def _request_one(web3_instance, method, params):
+    """
+    Single request through web3's own middleware stack, with the result put
+    back into its JSON-RPC hex form.
+    """
+    try:
+        result = await web3_instance.manager.coro_request(method, params)
+    except Exception as e:
+        return {"error": {"code": -32603, "message": str(e)}}
+    if isinstance(result, (bytes, int)) and not isinstance(result, bool):
+        result = Web3.to_hex(result)
+    return {"result": result}
+
+async def _request_each(web3_instance, calls):
+    return await asyncio.gather(*(_request_one(web3_instance, method, params) for method, params in calls))
+
+async def send_batch(web3_instance, calls, session=None):
+    """
+    Sends `calls` ([(method, params), ...]) as one JSON-RPC batch and returns the
+    responses in the same order, each either {"result": ...} or {"error": ...}.
+
+    web3.py has no async batch support, so HTTP providers get a raw batch POST
+    on `session`; any other provider, or a node that refuses the batch as a
+    whole (batching disabled, batch too large), gets one request per call.
+    """
+    provider = web3_instance.provider
+    if not isinstance(provider, AsyncHTTPProvider):
+        return await _request_each(web3_instance, calls)
+
+    payload = [
+        {"jsonrpc": "2.0", "id": next(_request_ids), "method": method, "params": params}
+        for method, params in calls
+    ]
+    owns_session = session is None
+    if owns_session:
+        session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=RPC_BATCH_TIMEOUT))
+    # The raw POST bypasses web3's middleware, so it's timed here, as one "batch" call
+    started_at = time.perf_counter()
+    failed = True
+    try:
+        async with session.post(provider.endpoint_uri, json=payload) as response:
+            if 400 <= response.status < 500:
+                # e.g. 413 for a batch over the node's limit, or batching switched off
+                body = {"error": f"HTTP {response.status}"}
+            else:
+                response.raise_for_status()
+                body = await response.json(content_type=None)
+        failed = not isinstance(body, list)
+    finally:
+        record_rpc("batch", time.perf_counter() - started_at, failed)
+        if owns_session:
+            await session.close()
+
+    # A node that rejects the whole batch answers with a 4xx or a single error object
+    if not isinstance(body, list):
+        reason = body.get("error", body) if isinstance(body, dict) else body
+        print(f"⚠️  Batch of {len(calls)} request(s) rejected ({reason}), sending them one by one")
+        return await _request_each(web3_instance, calls)
+
+    by_id = {item.get("id"): item for item in body}
+    missing = {"error": {"code": -32603, "message": "No response for request in batch"}}
+    return [by_id.get(request["id"], missing) for request in payload]
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import time
+from eth_account import Account
+from app.services.contractsManager.contract_config import async_w3, SIGNER_PRIVATE_KEYS, CHAIN_POLL_INTERVAL
+from .chain_state import chain_state
+from .receipt_tracker import receipt_tracker
+
+# Seconds a transaction may stay unmined before it is re-sent with a higher fee
+STUCK_TX_TIMEOUT = float(os.getenv("STUCK_TX_TIMEOUT", "60"))
+# Nodes only accept a replacement that raises every fee field by at least 10%
+FEE_BUMP_PERCENT = 12
+# Replacements per transaction before giving up on it
+MAX_REPRICES = 5
+FEE_FIELDS = ("gasPrice", "maxFeePerGas", "maxPriorityFeePerGas")
+
+def bump_fee(fee: int) -> int:
+    return fee * (100 + FEE_BUMP_PERCENT) // 100 + 1
+
+class SignerPool:
+    """
+    Accounts that sign writes, configured with SIGNER_PRIVATE_KEYS.
+
+    Each write goes to the signer with the fewest unmined transactions, so
+    every signer has its own nonce stream and one slow transaction only holds
+    up its own signer. A background task re-sends transactions that stay
+    unmined for STUCK_TX_TIMEOUT with the same nonce and bumped fees; the
+    receipt tracker then waits on both hashes.
+    """
+
+    def __init__(self, web3_instance, private_keys, poll_interval=CHAIN_POLL_INTERVAL, stuck_timeout=STUCK_TX_TIMEOUT):
+        self.web3 = web3_instance
+        self.accounts = [Account.from_key(key) for key in private_keys]
+        self.poll_interval = poll_interval
+        self.stuck_timeout = stuck_timeout
+        self._in_flight = {account.address: {} for account in self.accounts}  # address -> {nonce: record}
+        self._reserved = {account.address: 0 for account in self.accounts}
+        self._task = None
+
+    def acquire(self):
+        """
+        Picks and reserves the least busy signer. Counting transactions still
+        being built keeps concurrent callers from all picking the same one.
+        """
+        account = min(self.accounts, key=lambda a: len(self._in_flight[a.address]) + self._reserved[a.address])
+        self.reserve(account)
+        return account
+
+    def reserve(self, account):
+        self._reserved[account.address] = self._reserved.get(account.address, 0) + 1
+
+    def release(self, account):
+        """
+        Ends a reservation from `acquire()`/`reserve()`, whether or not the send succeeded.
+        """
+        if self._reserved.get(account.address):
+            self._reserved[account.address] -= 1
+
+    def sent(self, account, tx, tx_hash):
+        """
+        Registers a sent transaction (signed by any local account) for stuck detection.
+        """
+        in_flight = self._in_flight.setdefault(account.address, {})
+        record = {
+            "account": account,
+            "tx": tx,
+            "tx_hash": tx_hash,
+            "sent_at": time.monotonic(),
+            "reprices": 0,
+        }
+        in_flight[tx["nonce"]] = record
+
+        def forget(_):
+            if in_flight.get(tx["nonce"]) is record:
+                del in_flight[tx["nonce"]]
+
+        receipt_tracker.track(tx_hash)["future"].add_done_callback(forget)
+
+    def pending_count(self, address=None) -> int:
+        if address is not None:
+            return len(self._in_flight.get(address, {}))
+        return sum(len(in_flight) for in_flight in self._in_flight.values())
+
+    async def start(self):
+        print(f"🧾 Signing writes with {len(self.accounts)} account(s): {', '.join(a.address for a in self.accounts)}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch_stuck())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch_stuck(self):
+        while True:
+            try:
+                now = time.monotonic()
+                for in_flight in list(self._in_flight.values()):
+                    for record in list(in_flight.values()):
+                        if now - record["sent_at"] >= self.stuck_timeout and record["reprices"] < MAX_REPRICES:
+                            await self._reprice(record)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Stuck transaction check failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _reprice(self, record):
+        tx = dict(record["tx"])
+        current_fees = await chain_state.get_fee_params()
+        for field in FEE_FIELDS:
+            if field in tx:
+                tx[field] = max(bump_fee(tx[field]), current_fees.get(field, 0))
+
+        record["tx"] = tx
+        record["sent_at"] = time.monotonic()
+        record["reprices"] += 1
+
+        account = record["account"]
+        try:
+            signed_tx = self.web3.eth.account.sign_transaction(tx, private_key=account.key)
+            new_hash = await self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
+        except Exception as e:
+            # e.g. "nonce too low" once the original got mined; the receipt tracker settles it
+            print(f"⚠️  Could not re-price transaction {record['tx_hash'].hex()} (nonce {tx['nonce']}): {e}")
+            return
+
+        print(f"⛽ Re-priced stuck transaction {record['tx_hash'].hex()} from {account.address} as {new_hash.hex()}")
+        receipt_tracker.replace(record["tx_hash"], new_hash)
+        record["tx_hash"] = new_hash
+
+# Shared pool used by the transaction sender
+signer_pool = SignerPool(async_w3, SIGNER_PRIVATE_KEYS)
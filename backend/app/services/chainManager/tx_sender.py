@@ -0,0 +1,151 @@
+import asyncio
+import inspect
+import aiohttp
+from web3.exceptions import TransactionNotFound
+from app.services.contractsManager.contract_config import async_w3
+from .nonce_manager import NonceManager, is_nonce_error
+from .chain_state import chain_state
+from .signer_pool import signer_pool
+from .gas_model import gas_model, is_gas_limit_error
+from app.services.metricsManager.request_stages import stage
+
+# Seconds before a send that got no answer is looked up, to free its nonce if it never reached the node
+UNANSWERED_SEND_CHECK_DELAY = 10
+# Longest wait (seconds) between lookups while the node can't be reached
+UNANSWERED_SEND_MAX_CHECK_DELAY = 60
+
+# Shared allocator for every account that signs transactions in this process
+nonce_manager = NonceManager(async_w3)
+
+_nonce_checks = set()  # lookups of unanswered sends still holding their nonce
+
+async def send_transaction(contract_function, account=None, gas=None, max_retries=1, on_signed=None):
+    """
+    Builds, signs and sends a contract function call from `account`, or from
+    the least busy signer in the pool when no account is given.
+    The nonce comes from the in-process nonce manager instead of a per-call
+    `get_transaction_count`, chain id and fees come from the cached chain state
+    and the gas limit from the gas model's cached estimates, so usually no RPC
+    is spent before the send itself.
+    A send rejected for its nonce or gas limit is retried up to `max_retries` times.
+    A send that gets no answer keeps its nonce until a lookup shows the node never had it.
+    `on_signed`, if given, is called (or awaited, if it's a coroutine function)
+    with the transaction and its hash right before each send, so callers can
+    persist the hash first.
+    Returns the transaction hash; callers decide whether to wait for the receipt.
+    """
+    if account is None:
+        account = signer_pool.acquire()
+    else:
+        signer_pool.reserve(account)
+
+    try:
+        for attempt in range(max_retries + 1):
+            with stage("nonce"):
+                nonce = await nonce_manager.allocate(account.address)
+            signed_tx = None
+            try:
+                with stage("fees"):
+                    fee_params = await chain_state.get_fee_params()
+                    chain_id = await chain_state.get_chain_id()
+                with stage("gas"):
+                    gas_limit = gas or await gas_model.gas_limit(contract_function, account.address)
+                with stage("build"):
+                    tx = await contract_function.build_transaction({
+                        "from": account.address,
+                        **fee_params,
+                        "nonce": nonce,
+                        "chainId": chain_id,
+                        "gas": gas_limit
+                    })
+
+                with stage("sign"):
+                    signed_tx = async_w3.eth.account.sign_transaction(tx, private_key=account.key)
+                if on_signed is not None:
+                    signed = on_signed(tx, signed_tx.hash)
+                    if inspect.isawaitable(signed):
+                        await signed
+                with stage("send"):
+                    tx_hash = await async_w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+
+            except Exception as e:
+                if signed_tx is not None and send_outcome_unknown(e):
+                    # It may have reached the node, so the nonce stays taken until it's known it didn't
+                    _check_unanswered_send(account.address, nonce, signed_tx.hash)
+                    raise
+                if is_nonce_error(e):
+                    # Our view of the account drifted from the node (external sends, dropped txs)
+                    await nonce_manager.resync(account.address)
+                    if attempt < max_retries:
+                        continue
+                    raise
+
+                # The transaction never made it to the node, so its nonce can be reused
+                await nonce_manager.release(account.address, nonce)
+                if gas is None and is_gas_limit_error(e) and attempt < max_retries:
+                    # The cached estimate is stale; estimate again
+                    gas_model.forget(contract_function)
+                    continue
+                raise
+
+            # Watched by the pool so it can be re-priced if it gets stuck
+            signer_pool.sent(account, tx, tx_hash)
+            if gas is None:
+                gas_model.watch(contract_function, tx_hash, tx["gas"])
+            return tx_hash
+    finally:
+        signer_pool.release(account)
+
+def _check_unanswered_send(sender, nonce, tx_hash):
+    task = asyncio.create_task(_release_if_dropped(sender, nonce, tx_hash))
+    _nonce_checks.add(task)
+    task.add_done_callback(_nonce_checks.discard)
+
+async def _release_if_dropped(sender, nonce, tx_hash):
+    """
+    Gives a nonce back once its unanswered send is known never to have reached
+    the node; if the node has it (or the nonce went to another transaction) it stays used.
+    """
+    delay = UNANSWERED_SEND_CHECK_DELAY
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            state, _ = await locate_transaction(tx_hash, sender, nonce)
+        except Exception as e:
+            print(f"⚠️  Could not look up unanswered transaction {tx_hash.hex()}, retrying: {e}")
+            delay = min(delay * 2, UNANSWERED_SEND_MAX_CHECK_DELAY)
+            continue
+        if state == "dropped":
+            print(f"🔁 Transaction {tx_hash.hex()} never reached the node, nonce {nonce} of {sender} is free again.")
+            await nonce_manager.release(sender, nonce)
+        return
+
+async def locate_transaction(tx_hash, sender, nonce):
+    """
+    Works out what became of a transaction sent before a restart. Returns
+    ("mined", receipt), ("pending", None), ("dropped", None) when the node has
+    never seen it and `sender`'s nonce is still free, so it's safe to send again,
+    or ("unknown", None) when that nonce went to a transaction we have no hash
+    for, e.g. a fee-bumped replacement.
+    """
+    try:
+        return "mined", await async_w3.eth.get_transaction_receipt(tx_hash)
+    except TransactionNotFound:
+        pass
+    try:
+        await async_w3.eth.get_transaction(tx_hash)
+        return "pending", None
+    except TransactionNotFound:
+        pass
+
+    if await async_w3.eth.get_transaction_count(sender, "pending") > nonce:
+        return "unknown", None
+    return "dropped", None
+
+def send_outcome_unknown(error: Exception) -> bool:
+    """
+    True if a send failed without an answer from the node (a timeout or lost
+    connection), so the transaction may still have reached it. Any other error
+    means the node rejected it.
+    """
+    return isinstance(error, (asyncio.TimeoutError, OSError, aiohttp.ClientError))
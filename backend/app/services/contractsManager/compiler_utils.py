@@ -1,15 +1,56 @@
 import os
 import json
+import hashlib
+from packaging.version import Version
 from solcx import compile_standard, install_solc, get_installed_solc_versions
-from .contract_config import BASE_CONTRACTS_PATH, CONTRACT_BUILD_PATH
+from .contract_config import BASE_CONTRACTS_PATH, CONTRACT_BUILD_PATH, DEFAULT_CONTRACT_BUILD_PATH
 
 # Solidity version to use
 SOLC_VERSION = "0.8.0"
 
-# Install solc compiler if not already installed
-if SOLC_VERSION not in get_installed_solc_versions():
-    print(f"📦 Installing Solidity compiler {SOLC_VERSION}...")
-    install_solc(SOLC_VERSION)
+# Compiler output keyed by a hash of the exact compiler input and version.
+# Shared by every build directory, since the key already covers everything that matters.
+COMPILE_CACHE_PATH = os.getenv("COMPILE_CACHE_PATH", os.path.join(DEFAULT_CONTRACT_BUILD_PATH, ".compile_cache"))
+
+_solc_ready = False
+
+def _ensure_solc():
+    """
+    Installs the solc compiler if needed. Only called when something actually
+    has to be compiled, so importing this module never touches the network.
+    """
+    global _solc_ready
+    if _solc_ready:
+        return
+    if Version(SOLC_VERSION) not in get_installed_solc_versions():
+        print(f"📦 Installing Solidity compiler {SOLC_VERSION}...")
+        install_solc(SOLC_VERSION)
+    _solc_ready = True
+
+def _compile_cached(standard_input):
+    """
+    Runs `compile_standard`, reusing the stored output when the same sources
+    were already compiled with the same compiler version and settings.
+    """
+    cache_key = hashlib.sha256(
+        json.dumps({"solc_version": SOLC_VERSION, "input": standard_input}, sort_keys=True).encode()
+    ).hexdigest()
+    cache_path = os.path.join(COMPILE_CACHE_PATH, f"{cache_key}.json")
+
+    if os.path.exists(cache_path):
+        with open(cache_path, "r") as f:
+            return json.load(f)
+
+    _ensure_solc()
+    compiled = compile_standard(standard_input, solc_version=SOLC_VERSION)
+
+    os.makedirs(COMPILE_CACHE_PATH, exist_ok=True)
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(compiled, f)
+    os.replace(tmp_path, cache_path)
+
+    return compiled
 
 def compile_contract(contract_name: str, relative_contract_path: str):
     contract_full_path = os.path.join(BASE_CONTRACTS_PATH, relative_contract_path)
@@ -20,8 +61,8 @@ def compile_contract(contract_name: str, relative_contract_path: str):
     with open(contract_full_path, "r") as f:
         source_code = f.read()
 
-    # Compile the contract
-    compiled = compile_standard(
+    # Compile the contract (or reuse the cached output for identical source)
+    compiled = _compile_cached(
         {
             "language": "Solidity",
             "sources": {relative_contract_path: {"content": source_code}},
@@ -32,8 +73,7 @@ def compile_contract(contract_name: str, relative_contract_path: str):
                     }
                 }
             },
-        },
-        solc_version=SOLC_VERSION
+        }
     )
 
     # Extract ABI and Bytecode
@@ -1,6 +1,10 @@
 from dotenv import load_dotenv
+import atexit
 import os
-from web3 import Web3
+import shutil
+import tempfile
+from web3 import Web3, AsyncWeb3
+from app.services.metricsManager.rpc_metrics import rpc_metrics_middleware, async_rpc_metrics_middleware
 
 # Load .env file
 load_dotenv()
@@ -17,27 +21,69 @@ WEB3_PROVIDER = os.getenv("WEB3_PROVIDER")
 # then you would load it like this instead:
 # WEB3_PROVIDER = os.getenv("REACT_APP_WEB3_PROVIDER")
 
+if not WEB3_PROVIDER:
+    raise Exception("WEB3_PROVIDER not set in environment variables.")
+
+# WEB3_PROVIDER=tester:// runs a throwaway chain inside this process (eth-tester on
+# py-evm) instead of connecting to a node: no Ganache, and blocks mine instantly.
+TESTER_PROVIDER_SCHEME = "tester://"
+IN_PROCESS_CHAIN = WEB3_PROVIDER.startswith(TESTER_PROVIDER_SCHEME)
+
 PRIVATE_KEY = os.getenv("PRIVATE_KEY")
 
+if not PRIVATE_KEY and IN_PROCESS_CHAIN:
+    from .tester_chain import default_private_key
+    PRIVATE_KEY = default_private_key()
+
 if not PRIVATE_KEY:
     raise Exception("Private key not set in environment variables.")
 
-if not WEB3_PROVIDER:
-    raise Exception("WEB3_PROVIDER not set in environment variables.")
+# Optional comma-separated keys of the accounts that sign writes; defaults to PRIVATE_KEY alone
+SIGNER_PRIVATE_KEYS = [key.strip() for key in os.getenv("SIGNER_PRIVATE_KEYS", "").split(",") if key.strip()] or [PRIVATE_KEY]
 
 # -------------------------
 # Web3 Provider Setup
 # -------------------------
-w3 = Web3(Web3.HTTPProvider(WEB3_PROVIDER))
-
-if not w3.is_connected():
-    raise Exception(f"Failed to connect to Ethereum node at {WEB3_PROVIDER}. Make sure Server is running.")
+if IN_PROCESS_CHAIN:
+    # The deployer and every signer start out funded
+    from .tester_chain import create_tester_web3
+    w3, async_w3 = create_tester_web3([PRIVATE_KEY, *SIGNER_PRIVATE_KEYS])
 else:
-    print(f"Connected to Ethereum node at {WEB3_PROVIDER}")
+    w3 = Web3(Web3.HTTPProvider(WEB3_PROVIDER))
+
+    # Async provider used by the API routes and loyalty services, so waiting on the
+    # node (e.g. for a transaction receipt) never blocks the uvicorn event loop.
+    async_w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(WEB3_PROVIDER))
+
+# Per-method latency and error metrics for every RPC, served on /metrics
+w3.middleware_onion.add(rpc_metrics_middleware, "rpc_metrics")
+async_w3.middleware_onion.add(async_rpc_metrics_middleware, "rpc_metrics")
+
+# The node isn't contacted here: connections are made on first use, so importing
+# this module works (and the API can start) while the node is still coming up.
+
+# How often (seconds) background tasks poll the node for new blocks
+CHAIN_POLL_INTERVAL = float(os.getenv("CHAIN_POLL_INTERVAL", "0.05" if IN_PROCESS_CHAIN else "2"))
 
 # -------------------------
 # Contract Directories
 # -------------------------
 BASE_CONTRACTS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "..", "contracts"))
-CONTRACT_BUILD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "contract_build")
-os.makedirs(CONTRACT_BUILD_PATH, exist_ok=True)
\ No newline at end of file
+DEFAULT_CONTRACT_BUILD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "contract_build")
+
+# ABIs, bytecode and deployed addresses; override to keep e.g. a throwaway deployment separate.
+# An in-process chain starts empty every time, so its deployment goes to a temporary directory.
+CONTRACT_BUILD_PATH = os.getenv("CONTRACT_BUILD_PATH")
+if not CONTRACT_BUILD_PATH and IN_PROCESS_CHAIN:
+    CONTRACT_BUILD_PATH = tempfile.mkdtemp(prefix="contract_build-")
+    atexit.register(shutil.rmtree, CONTRACT_BUILD_PATH, True)
+CONTRACT_BUILD_PATH = CONTRACT_BUILD_PATH or DEFAULT_CONTRACT_BUILD_PATH
+os.makedirs(CONTRACT_BUILD_PATH, exist_ok=True)
+
+# SQLite file holding the local index of contract events
+EVENT_INDEX_PATH = os.getenv("EVENT_INDEX_PATH", os.path.join(CONTRACT_BUILD_PATH, "event_index.sqlite3"))
+
+# SQLite file holding the outbound transaction queue (write-ahead log of sales and awards)
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", os.path.join(CONTRACT_BUILD_PATH, "outbox.sqlite3"))
+# SQLite file holding Idempotency-Key records of write requests
+IDEMPOTENCY_PATH = os.getenv("IDEMPOTENCY_PATH", os.path.join(CONTRACT_BUILD_PATH, "idempotency.sqlite3"))
@@ -0,0 +1,90 @@
+import os
+import json
+import time
+from web3 import Web3
+from app.services.contractsManager.contract_config import w3, CONTRACT_BUILD_PATH
+
+class ContractRegistry:
+    """
+    Process-wide cache of deployed contracts.
+
+    The parsed ABI and checksum address are cached per contract name, and the
+    contract object per (contract name, web3 instance). The build artifacts are
+    re-read only when their mtime/size changes, and the files are stat'ed at
+    most once every `check_interval` seconds, so hot paths like balance lookups
+    do no disk I/O or ABI parsing.
+    """
+
+    def __init__(self, build_path=CONTRACT_BUILD_PATH, check_interval=1.0):
+        self.build_path = build_path
+        self.check_interval = check_interval
+        self._artifacts = {}   # name -> (signature, abi, address)
+        self._contracts = {}   # (name, web3 instance) -> (signature, contract)
+        self._checked_at = {}  # name -> (monotonic time, signature)
+
+    def get(self, contract_name, web3_instance=w3):
+        signature = self._signature(contract_name)
+
+        cached = self._contracts.get((contract_name, web3_instance))
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        abi, address = self._artifacts_for(contract_name, signature)
+        contract = web3_instance.eth.contract(address=address, abi=abi)
+        self._contracts[(contract_name, web3_instance)] = (signature, contract)
+        return contract
+
+    def invalidate(self, contract_name=None):
+        """
+        Drops cached entries, e.g. right after a (re)deployment in this process.
+        """
+        if contract_name is None:
+            self._artifacts.clear()
+            self._contracts.clear()
+            self._checked_at.clear()
+            return
+
+        self._artifacts.pop(contract_name, None)
+        self._checked_at.pop(contract_name, None)
+        for key in [key for key in self._contracts if key[0] == contract_name]:
+            del self._contracts[key]
+
+    def _paths(self, contract_name):
+        return (
+            os.path.join(self.build_path, f"{contract_name}.abi"),
+            os.path.join(self.build_path, f"{contract_name}.address"),
+        )
+
+    def _signature(self, contract_name):
+        now = time.monotonic()
+        checked = self._checked_at.get(contract_name)
+        if checked and now - checked[0] < self.check_interval:
+            return checked[1]
+
+        abi_path, address_path = self._paths(contract_name)
+        if not os.path.exists(abi_path) or not os.path.exists(address_path):
+            raise FileNotFoundError(f"ABI or address file for {contract_name} missing.")
+
+        abi_stat = os.stat(abi_path)
+        address_stat = os.stat(address_path)
+        signature = (abi_stat.st_mtime_ns, abi_stat.st_size, address_stat.st_mtime_ns, address_stat.st_size)
+        self._checked_at[contract_name] = (now, signature)
+        return signature
+
+    def _artifacts_for(self, contract_name, signature):
+        cached = self._artifacts.get(contract_name)
+        if cached and cached[0] == signature:
+            return cached[1], cached[2]
+
+        abi_path, address_path = self._paths(contract_name)
+        with open(abi_path, "r") as f:
+            abi = json.load(f)
+
+        with open(address_path, "r") as f:
+            address = Web3.to_checksum_address(f.read().strip())
+
+        self._artifacts[contract_name] = (signature, abi, address)
+        return abi, address
+
+# Shared registry used by load_contract()
+contract_registry = ContractRegistry()
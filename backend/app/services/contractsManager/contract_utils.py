@@ -1,40 +1,44 @@
 from web3 import Account
 from .contract_config import w3, PRIVATE_KEY
 from .compiler_utils import compile_contract
-from .deploy_utils import deploy_contract
+from .deploy_utils import deploy_contract, deploy_contracts
 from .load_utils import load_contract
 
+# Contracts deployed by `deploy_all`, in deployment order
+DEPLOYMENT_ORDER = (
+    ("RetailTransaction", "RetailTransaction.sol"),
+    ("LoyaltyPoints", "LoyaltyPoints.sol"),
+    ("CheckoutRouter", "CheckoutRouter.sol"),
+)
+
+def compile_deployments():
+    """
+    Compiles every contract and returns the list `deploy_contracts` expects,
+    with the CheckoutRouter wired to the other two.
+    """
+    deployments = []
+    for contract_name, contract_path in DEPLOYMENT_ORDER:
+        abi, bytecode = compile_contract(contract_name, contract_path)
+        deployments.append({"name": contract_name, "abi": abi, "bytecode": bytecode})
+
+    deployments[2]["constructor_args"] = lambda addresses: (addresses["RetailTransaction"], addresses["LoyaltyPoints"])
+    return deployments
+
 def deploy_all():
-    # Use the first account from node (Infura testnet doesn’t expose accounts though — note)
-    accounts = w3.eth.accounts
     deployer_account = Account.from_key(PRIVATE_KEY)
     print(f"Deployer account: {deployer_account.address}")
 
-    print(f"\nDeployer account: {deployer_account}")
-
-    # Compile and deploy RetailTransaction
-    retail_abi, retail_bytecode = compile_contract(
-        "RetailTransaction", "RetailTransaction.sol"
-    )
-    retail_contract_address = deploy_contract(
-        retail_abi, retail_bytecode, deployer_account, "RetailTransaction"
-    )
-    print(f"RetailTransaction contract deployed at {retail_contract_address}")
-
-    # Compile and deploy LoyaltyPoints
-    loyalty_abi, loyalty_bytecode = compile_contract(
-        "LoyaltyPoints", "LoyaltyPoints.sol"
-    )
-    loyalty_contract_address = deploy_contract(
-        loyalty_abi, loyalty_bytecode, deployer_account, "LoyaltyPoints"
-    )
-    print(f"LoyaltyPoints contract deployed at {loyalty_contract_address}")
+    # All three are sent back-to-back with consecutive nonces, then awaited together
+    addresses = deploy_contracts(compile_deployments(), deployer_account)
+    for contract_name, address in addresses.items():
+        print(f"{contract_name} contract deployed at {address}")
 
     # Load contracts to verify
     retail_contract = load_contract("RetailTransaction")
     loyalty_contract = load_contract("LoyaltyPoints")
+    router_contract = load_contract("CheckoutRouter")
 
-    print(f"\nContracts loaded successfully:\n- RetailTransaction: {retail_contract.address}\n- LoyaltyPoints: {loyalty_contract.address}")
+    print(f"\nContracts loaded successfully:\n- RetailTransaction: {retail_contract.address}\n- LoyaltyPoints: {loyalty_contract.address}\n- CheckoutRouter: {router_contract.address}")
 
 if __name__ == "__main__":
     deploy_all()
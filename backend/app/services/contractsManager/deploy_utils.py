@@ -1,29 +1,76 @@
 import os
 import json
+import rlp
+from web3 import Web3
 from app.services.contractsManager.contract_config import CONTRACT_BUILD_PATH, w3
+from app.services.contractsManager.contract_registry import contract_registry
 
-def deploy_contract(abi, bytecode, deployer_account, contract_name):
-    Contract = w3.eth.contract(abi=abi, bytecode=bytecode)
-    nonce = w3.eth.get_transaction_count(deployer_account.address)
+def predict_contract_address(deployer_address, nonce) -> str:
+    """
+    Address a contract created by `deployer_address` with `nonce` will get.
+    """
+    encoded = rlp.encode([Web3.to_bytes(hexstr=deployer_address), nonce])
+    return Web3.to_checksum_address(Web3.keccak(encoded)[12:])
 
-    gas_estimate = Contract.constructor().estimate_gas({'from': deployer_account.address})
+def deploy_contract(abi, bytecode, deployer_account, contract_name, constructor_args=()):
+    addresses = deploy_contracts(
+        [{"name": contract_name, "abi": abi, "bytecode": bytecode, "constructor_args": constructor_args}],
+        deployer_account
+    )
+    return addresses[contract_name]
 
-    tx = Contract.constructor().build_transaction({
-        'from': deployer_account.address,
-        'nonce': nonce,
-        'gas': gas_estimate + 50000,
-        'maxFeePerGas': w3.to_wei(20, 'gwei'),
-        'maxPriorityFeePerGas': w3.to_wei(2, 'gwei'),
-        'chainId': w3.eth.chain_id
-    })
+def deploy_contracts(deployments, deployer_account):
+    """
+    Deploys several contracts at once. Every deployment is signed with the next
+    consecutive nonce and sent before any receipt is awaited, so they usually
+    all land in the same block.
 
-    signed_tx = w3.eth.account.sign_transaction(tx, private_key=deployer_account.key)
-    tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
-    print(f"{contract_name} deployment transaction sent: {tx_hash.hex()}")
+    `deployments` is a list of {"name", "abi", "bytecode", "constructor_args"};
+    `constructor_args` may also be a function taking the addresses of the
+    deployments before it, which are known up front from the nonces.
+    Returns {name: address}.
+    """
+    nonce = w3.eth.get_transaction_count(deployer_account.address, "pending")
+    chain_id = w3.eth.chain_id
+    addresses = {}
+    sent = []
 
-    tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
-    print(f"{contract_name} contract deployed at {tx_receipt.contractAddress}")
+    for offset, deployment in enumerate(deployments):
+        constructor_args = deployment.get("constructor_args", ())
+        if callable(constructor_args):
+            constructor_args = constructor_args(dict(addresses))
 
+        Contract = w3.eth.contract(abi=deployment["abi"], bytecode=deployment["bytecode"])
+        gas_estimate = Contract.constructor(*constructor_args).estimate_gas({'from': deployer_account.address})
+
+        tx = Contract.constructor(*constructor_args).build_transaction({
+            'from': deployer_account.address,
+            'nonce': nonce + offset,
+            'gas': gas_estimate + 50000,
+            'maxFeePerGas': w3.to_wei(20, 'gwei'),
+            'maxPriorityFeePerGas': w3.to_wei(2, 'gwei'),
+            'chainId': chain_id
+        })
+
+        signed_tx = w3.eth.account.sign_transaction(tx, private_key=deployer_account.key)
+        tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+        print(f"{deployment['name']} deployment transaction sent: {tx_hash.hex()}")
+
+        addresses[deployment["name"]] = predict_contract_address(deployer_account.address, nonce + offset)
+        sent.append((deployment, tx_hash))
+
+    for deployment, tx_hash in sent:
+        tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
+        if tx_receipt.status != 1:
+            raise Exception(f"{deployment['name']} deployment failed in transaction {tx_hash.hex()}")
+        print(f"{deployment['name']} contract deployed at {tx_receipt.contractAddress}")
+
+        addresses[deployment["name"]] = tx_receipt.contractAddress
+        _save_deployment(deployment["name"], deployment["abi"], tx_receipt.contractAddress)
+
+    return addresses
+
+def _save_deployment(contract_name, abi, address):
     abi_path = os.path.join(CONTRACT_BUILD_PATH, f"{contract_name}.abi")
     address_path = os.path.join(CONTRACT_BUILD_PATH, f"{contract_name}.address")
 
@@ -31,6 +78,7 @@ def deploy_contract(abi, bytecode, deployer_account, contract_name):
         json.dump(abi, f)
 
     with open(address_path, "w") as f:
-        f.write(tx_receipt.contractAddress)
+        f.write(address)
 
-    return tx_receipt.contractAddress
+    # Make sure cached instances pick up the new address immediately
+    contract_registry.invalidate(contract_name)
@@ -0,0 +1,34 @@
+from eth_utils import event_abi_to_log_topic
+from web3 import Web3
+
+class EventDecoder:
+    """
+    Decodes raw logs emitted by our contracts into web3 event dicts.
+    Events are looked up by (contract address, topic0), so one decoder can
+    handle a mixed log stream from several contracts.
+    """
+
+    def __init__(self, contracts):
+        self._events = {}
+        for contract in contracts:
+            for event_class in contract.events:
+                event = event_class()
+                topic = Web3.to_hex(event_abi_to_log_topic(event.abi))
+                self._events[(contract.address, topic)] = event
+
+    def topic_for(self, contract, event_name) -> str:
+        for (address, topic), event in self._events.items():
+            if address == contract.address and event.event_name == event_name:
+                return topic
+        raise ValueError(f"Event {event_name} not found for contract at {contract.address}")
+
+    def decode(self, log):
+        """
+        Returns the decoded event, or None for logs this decoder doesn't know.
+        """
+        if not log["topics"]:
+            return None
+        event = self._events.get((Web3.to_checksum_address(log["address"]), Web3.to_hex(log["topics"][0])))
+        if event is None:
+            return None
+        return event.process_log(log)
@@ -0,0 +1,405 @@
+"""
+Bulk-loads historical sales (e.g. a POS export) onto the chain.
+
+    python -m app.services.contractsManager.ingest_utils sales.csv --window 64
+
+Rows are CSV (with a header) or JSONL records with the fields of
+RecordTransactionRequest. They stream through parse -> validate -> convert ->
+sign -> send, and at most `--window` sales are unmined at any time, so memory
+stays flat however large the file is. Every sale goes through the
+CheckoutRouter, so it and its loyalty points are one transaction.
+
+A row's payment_ref / receipt_number are claimed in the API's reference index
+before it is sent (a reference already recorded or claimed makes the row
+invalid), logged on-chain by the call recording it when the router supports
+that, and indexed once it's mined.
+
+Progress is appended to a checkpoint file (by default `<file>.checkpoint.jsonl`).
+A transaction's hash is written there before it is sent, so an import that
+crashed is resumed by running the same command again: finished rows are
+skipped and rows that were in flight are checked on-chain instead of being
+recorded twice. Rows are keyed by line number, so don't edit the file between runs.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import math
+import os
+import sys
+import time
+from itertools import islice
+from pydantic import ValidationError
+from web3 import Web3
+from web3.exceptions import ContractLogicError
+from web3.logs import DISCARD
+
+from app.models.schemas import RecordTransactionRequest
+from app.services.contractsManager.contract_config import async_w3
+from app.services.contractsManager.load_utils import load_contract
+from app.services.currencyManager.currency_converter import INR_to_wei_batch
+from app.services.loyaltyManager.points_calculator import calculate_loyalty_points_batch
+from app.services.chainManager.tx_sender import send_transaction, locate_transaction
+from app.services.chainManager.chain_state import chain_state
+from app.services.chainManager.signer_pool import signer_pool
+from app.services.chainManager.receipt_tracker import receipt_tracker
+from app.transactionManager import transaction_matcher
+from app.transactionManager.transaction_matcher import (
+    ReferenceClaimed, sale_references, referenced_sale, claim_references, release_references, index_references,
+    configure_reference_anchoring
+)
+
+# Sales sent but not yet mined at any time
+DEFAULT_WINDOW = 64
+# Seconds to wait for a sale to be mined before the import stops
+RECEIPT_TIMEOUT = 300
+# Print progress every this many finished rows
+PROGRESS_EVERY = 1000
+
+# Checkpoint statuses after which a row is never touched again
+SETTLED_STATUSES = {"done", "failed", "invalid", "uncertain"}
+
+ZERO_ADDRESS = "0x" + "0" * 40
+
+class Checkpoint:
+    """
+    Append-only JSONL log of row statuses.
+
+    Every line carries `done_below`, the first input line not yet settled.
+    Only records at or past it are kept in memory, which with a bounded window
+    is a handful of rows, both while importing and when loading the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done_below = 0
+        self.entries = {}  # line -> last record, for lines >= done_below
+        self._open = set()  # lines read in this run but not settled yet
+        self._next_line = 0
+        self._file = None
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for raw in f:
+                    try:
+                        record = json.loads(raw)
+                    except json.JSONDecodeError:
+                        continue  # a line cut short by the crash
+                    if "line" in record:
+                        self.entries[record["line"]] = record
+                    self._advance(record.get("done_below", 0))
+
+        # Rewrite it compactly so the file doesn't grow across resumed runs
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps({"done_below": self.done_below}) + "\n")
+            for record in self.entries.values():
+                f.write(json.dumps({**record, "done_below": self.done_below}) + "\n")
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "a")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def is_settled(self, line) -> bool:
+        if line < self.done_below:
+            return True
+        record = self.entries.get(line)
+        return record is not None and record["status"] in SETTLED_STATUSES
+
+    def owner(self, line):
+        """
+        Holder of a row's reference claims, the same across resumed runs.
+        """
+        return f"ingest:{os.path.abspath(self.path)}:{line}"
+
+    def in_flight(self):
+        return [record for record in self.entries.values() if record["status"] == "signed"]
+
+    def reach(self, line):
+        """
+        Marks `line` as read from the input; `done_below` can't pass it until it's settled.
+        """
+        self._next_line = line + 1
+        if not self.is_settled(line):
+            self._open.add(line)
+
+    def write(self, line, status, durable=False, **fields):
+        record = {"line": line, "status": status, **fields}
+        self.entries[line] = record
+        if status in SETTLED_STATUSES:
+            self._open.discard(line)
+            self._advance(min(self._open, default=self._next_line))
+
+        self._file.write(json.dumps({**record, "done_below": self.done_below}) + "\n")
+        self._file.flush()
+        if durable:
+            os.fsync(self._file.fileno())
+
+    def _advance(self, done_below):
+        if done_below <= self.done_below:
+            return
+        self.done_below = done_below
+        for line in [line for line in self.entries if line < done_below]:
+            del self.entries[line]
+
+# -------------------------
+# Pipeline stages
+# -------------------------
+# Each stage is a generator of (line, value, error) tuples; rows that fail a
+# stage keep flowing with `error` set so they can be checkpointed as invalid.
+
+def read_rows(path, file_format=None):
+    file_format = file_format or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, newline="") as f:
+        if file_format == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row, None
+        else:
+            for line, raw in enumerate(f, start=1):
+                if not raw.strip():
+                    continue
+                try:
+                    yield line, json.loads(raw), None
+                except json.JSONDecodeError as e:
+                    yield line, None, f"Invalid JSON: {e}"
+
+def validate_rows(rows):
+    for line, row, error in rows:
+        if error:
+            yield line, None, error
+            continue
+        try:
+            request = RecordTransactionRequest.model_validate(row)
+        except ValidationError as e:
+            yield line, None, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            continue
+
+        # The same checks the contract would revert on, without paying for the revert
+        for field in ("customer_address", "retailer_address"):
+            address = getattr(request, field)
+            if not Web3.is_address(address) or address.lower() == ZERO_ADDRESS:
+                error = f"{field}: invalid address {address!r}"
+                break
+        else:
+            if not math.isfinite(request.amount_INR):
+                # NaN or inf would fail the whole conversion chunk
+                error = "amount_INR: must be a finite number"
+            elif request.amount_INR <= 0:
+                error = "amount_INR: must be positive"
+            elif request.quantity <= 0:
+                error = "quantity: must be positive"
+        yield line, None if error else request, error
+
+def convert_rows(rows, chunk_size):
+    """
+    Adds the wei amount and loyalty points, converting `chunk_size` rows at a time.
+    Yields (line, (request, amount_in_wei, points), error).
+    """
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+
+        amounts_in_wei = INR_to_wei_batch([request.amount_INR for _, request, error in chunk if not error])
+        converted = zip(amounts_in_wei.tolist(), calculate_loyalty_points_batch(amounts_in_wei).tolist())
+
+        for line, request, error in chunk:
+            if error:
+                yield line, None, error
+                continue
+            amount_in_wei, points = next(converted)
+            if amount_in_wei == 0:
+                yield line, None, "amount_INR: rounds to zero"
+                continue
+            yield line, (request, int(amount_in_wei), int(points)), None
+
+# -------------------------
+# Sending
+# -------------------------
+
+def load_router():
+    router = load_contract("CheckoutRouter", async_w3)
+    retail_contract = load_contract("RetailTransaction", async_w3)
+    return router, retail_contract
+
+async def check_router(router, retail_contract):
+    if await router.functions.retailTransaction().call() != retail_contract.address:
+        raise Exception("❌ The deployed CheckoutRouter points at another RetailTransaction; start the API or run contract_utils to redeploy it.")
+
+def settle_receipt(checkpoint, line, retail_contract, tx_receipt, references=()) -> str:
+    tx_hash = Web3.to_hex(tx_receipt.transactionHash)
+    if tx_receipt.status != 1:
+        checkpoint.write(line, "failed", tx_hash=tx_hash, error="Blockchain transaction failed.")
+        release_references(checkpoint.owner(line))
+        return "failed"
+
+    recorded_events = retail_contract.events.TransactionRecorded().process_receipt(tx_receipt, errors=DISCARD)
+    transaction_id = recorded_events[0]["args"]["transactionId"] if recorded_events else None
+    if transaction_id is not None:
+        index_references(transaction_id, references)
+    checkpoint.write(line, "done", tx_hash=tx_hash, block_number=tx_receipt.blockNumber, transaction_id=transaction_id)
+    return "done"
+
+async def resume_in_flight(checkpoint, retail_contract, count):
+    """
+    Works out what happened to rows that were sent when the last run stopped.
+    Runs before anything new is sent, so the signers' nonces still tell whether
+    a transaction the node doesn't know about could have been mined.
+    """
+    for record in checkpoint.in_flight():
+        line, tx_hash = record["line"], record["tx_hash"]
+        state, tx_receipt = await locate_transaction(tx_hash, record["from"], record["nonce"])
+
+        if state == "pending":
+            print(f"⏳ Line {line}: waiting for {tx_hash} from the previous run...")
+            tx_receipt = await receipt_tracker.wait(tx_hash, timeout=RECEIPT_TIMEOUT)
+
+        if tx_receipt is not None:
+            references = [tuple(reference) for reference in record.get("references", [])]
+            count(settle_receipt(checkpoint, line, retail_contract, tx_receipt, references))
+        elif state == "unknown":
+            print(f"⚠️  Line {line}: {tx_hash} is unknown but nonce {record['nonce']} of {record['from']} was used; check it by hand.")
+            checkpoint.write(line, "uncertain", tx_hash=tx_hash, error="Nonce used by an unknown transaction.")
+            count("uncertain")
+        else:
+            print(f"🔁 Line {line}: {tx_hash} never reached the chain, sending it again.")
+            checkpoint.write(line, "pending")
+
+async def send_row(checkpoint, router, retail_contract, line, request, amount_in_wei, points) -> str:
+    references = sale_references(request)
+    if references:
+        try:
+            await asyncio.to_thread(claim_references, references, checkpoint.owner(line))
+        except ReferenceClaimed as e:
+            checkpoint.write(line, "invalid", error=str(e))
+            return "invalid"
+
+    if references and transaction_matcher.checkout_anchoring_supported:
+        record_function = router.functions.recordAndAwardReferenced(referenced_sale(request, amount_in_wei), points)
+    else:
+        record_function = router.functions.recordAndAward(
+            Web3.to_checksum_address(request.customer_address),
+            Web3.to_checksum_address(request.retailer_address),
+            amount_in_wei,
+            request.product_id,
+            request.quantity,
+            request.description or "",
+            points
+        )
+
+    def on_signed(tx, tx_hash):
+        # Durable before the send: after a crash this hash is how the row is found on-chain
+        checkpoint.write(
+            line, "signed", durable=True,
+            tx_hash=Web3.to_hex(tx_hash), nonce=tx["nonce"], references=references, **{"from": tx["from"]}
+        )
+
+    try:
+        tx_hash = await send_transaction(record_function, on_signed=on_signed)
+    except ContractLogicError as e:
+        # Reverted while estimating gas, so nothing was sent
+        checkpoint.write(line, "failed", error=str(e))
+        release_references(checkpoint.owner(line))
+        return "failed"
+
+    tx_receipt = await receipt_tracker.wait(tx_hash, timeout=RECEIPT_TIMEOUT)
+    return settle_receipt(checkpoint, line, retail_contract, tx_receipt, references)
+
+async def ingest(path, checkpoint_path=None, window=DEFAULT_WINDOW, file_format=None):
+    """
+    Imports every row of `path` not already settled in the checkpoint.
+    Stops sending at the first node or network error, leaving the checkpoint
+    ready to resume. Returns a summary dict.
+    """
+    if not await async_w3.is_connected():
+        raise Exception("❌ Cannot connect to the Ethereum node.")
+
+    router, retail_contract = load_router()
+    await check_router(router, retail_contract)
+    await configure_reference_anchoring(retail_contract, router)
+
+    checkpoint = Checkpoint(checkpoint_path or f"{path}.checkpoint.jsonl")
+    checkpoint.load()
+
+    await chain_state.start()
+    await signer_pool.start()
+
+    counts = {"done": 0, "failed": 0, "invalid": 0, "uncertain": 0}
+    error = None
+    started_at = time.monotonic()
+    semaphore = asyncio.Semaphore(window)
+    tasks = set()
+
+    def count(status):
+        counts[status] += 1
+        settled = sum(counts.values())
+        if settled % PROGRESS_EVERY == 0:
+            print(f"📦 {settled} rows settled ({settled / (time.monotonic() - started_at):.1f} rows/s)")
+
+    def finished(task):
+        nonlocal error
+        tasks.discard(task)
+        semaphore.release()
+        if task.cancelled():
+            return
+        task_error = task.exception()
+        if task_error is not None and error is None:
+            error = task_error
+            print(f"❌ Stopping the import: {error}")
+
+    async def run_row(line, converted):
+        count(await send_row(checkpoint, router, retail_contract, line, *converted))
+
+    def unsettled(rows):
+        for line, row, row_error in rows:
+            if not checkpoint.is_settled(line):
+                checkpoint.reach(line)
+                yield line, row, row_error
+
+    try:
+        await resume_in_flight(checkpoint, retail_contract, count)
+
+        rows = unsettled(read_rows(path, file_format))
+        for line, converted, row_error in convert_rows(validate_rows(rows), window):
+            if error is not None:
+                break
+            if row_error:
+                checkpoint.write(line, "invalid", error=row_error)
+                count("invalid")
+                continue
+
+            await semaphore.acquire()
+            task = asyncio.create_task(run_row(line, converted))
+            tasks.add(task)
+            task.add_done_callback(finished)
+
+        if tasks:
+            await asyncio.wait(tasks)
+    finally:
+        checkpoint.close()
+        await signer_pool.stop()
+        await chain_state.stop()
+        await receipt_tracker.stop()
+
+    summary = {**counts, "seconds": round(time.monotonic() - started_at, 1), "error": str(error) if error else None}
+    print(f"✅ Import finished: {summary}" if error is None else f"⚠️  Import stopped, run it again to resume: {summary}")
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record historical sales from a CSV or JSONL file on-chain.")
+    parser.add_argument("path", help="CSV (with header) or JSONL file of RecordTransactionRequest rows")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <path>.checkpoint.jsonl)")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="Sales in flight at once")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="Input format (default: from the file extension)")
+    args = parser.parse_args(argv)
+
+    summary = asyncio.run(ingest(args.path, args.checkpoint, max(1, args.window), args.format))
+    return 0 if summary["error"] is None else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
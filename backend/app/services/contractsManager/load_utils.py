@@ -1,20 +1,20 @@
-import os
-import json
 from web3 import Web3
-from app.services.contractsManager.contract_config import w3, CONTRACT_BUILD_PATH
+from app.services.contractsManager.contract_config import w3
+from app.services.contractsManager.contract_registry import contract_registry
 
-def load_contract(contract_name):
-    abi_path = os.path.join(CONTRACT_BUILD_PATH, f"{contract_name}.abi")
-    address_path = os.path.join(CONTRACT_BUILD_PATH, f"{contract_name}.address")
+def load_contract(contract_name, web3_instance=w3):
+    """
+    Returns the deployed contract described by its ABI and address files.
+    Pass `async_w3` as `web3_instance` to get an AsyncContract for use inside `async def` code.
+    Contracts come from the shared registry, so the build files are only re-read when they change.
+    """
+    return contract_registry.get(contract_name, web3_instance)
 
-    if not os.path.exists(abi_path) or not os.path.exists(address_path):
-        raise FileNotFoundError(f"ABI or address file for {contract_name} missing.")
-
-    with open(abi_path, "r") as f:
-        abi = json.load(f)
-
-    with open(address_path, "r") as f:
-        address = f.read().strip()
-
-    contract = w3.eth.contract(address=Web3.to_checksum_address(address), abi=abi)
-    return contract
+async def supports_function(contract, function_signature):
+    """
+    Tells whether the deployed code of an AsyncContract dispatches `function_signature`
+    (e.g. "awardPointsBatch(address[],uint256[])"), for functions added after
+    earlier deployments. Looks for the 4-byte selector in the bytecode.
+    """
+    selector = Web3.keccak(text=function_signature)[:4]
+    return selector in await contract.w3.eth.get_code(contract.address)
@@ -0,0 +1,55 @@
+import threading
+from eth_account import Account
+from web3 import Web3, AsyncWeb3
+
+# Ether given to every configured signer that has less on a fresh in-process chain
+TESTER_FUNDING_WEI = Web3.to_wei(1000, "ether")
+
+def default_private_key() -> str:
+    """
+    Key of the first account eth-tester pre-funds.
+    """
+    from eth_tester.backends.pyevm.main import get_default_account_keys
+    return get_default_account_keys(1)[0].to_hex()
+
+def create_tester_web3(private_keys):
+    """
+    Starts an in-process chain (eth-tester on py-evm) and returns (w3, async_w3),
+    both backed by it. Every block is mined as soon as a transaction arrives.
+    Accounts for `private_keys` are funded from eth-tester's pre-funded accounts.
+    """
+    # Imported here: eth-tester is only needed when WEB3_PROVIDER=tester://
+    from eth_tester import EthereumTester
+    from web3.providers.eth_tester import EthereumTesterProvider, AsyncEthereumTesterProvider
+
+    tester = EthereumTester()
+    funder = tester.get_accounts()[0]
+    for private_key in dict.fromkeys(private_keys):
+        address = Account.from_key(private_key).address
+        if tester.get_balance(address) < TESTER_FUNDING_WEI:
+            tester.send_transaction({"from": funder, "to": address, "value": TESTER_FUNDING_WEI, "gas": 21000})
+
+    provider = EthereumTesterProvider(tester)
+    async_provider = AsyncEthereumTesterProvider()
+    async_provider.ethereum_tester = tester
+
+    # py-evm isn't thread-safe, and deployments run in a worker thread next to the event loop
+    lock = threading.Lock()
+    _serialize(provider, lock, is_async=False)
+    _serialize(async_provider, lock, is_async=True)
+
+    return Web3(provider), AsyncWeb3(async_provider)
+
+def _serialize(provider, lock, is_async):
+    make_request = provider.make_request
+
+    if is_async:
+        async def locked(method, params):
+            with lock:
+                return await make_request(method, params)
+    else:
+        def locked(method, params):
+            with lock:
+                return make_request(method, params)
+
+    provider.make_request = locked
@@ -1,4 +1,8 @@
 # backend/app/currency_converter.py
+import json
+import math
+import os
+import numpy as np
 from web3 import Web3
 
 # For demonstration, we'll use a fixed exchange rate.
@@ -10,16 +14,59 @@ from web3 import Web3
 # 1 INR = 0.0005 * 10^18 Wei (since 1 ETH = 10^18 Wei)
 FIXED_INR_TO_WEI_RATE = int(0.0000045 * (10**18)) # Wei per INR
 
+# Wei per whole currency unit, by currency code. Extra currencies (or a different
+# INR rate) can be supplied as JSON, e.g. CURRENCY_RATE_TABLE='{"INR": 4500000000000}'
+RATE_TABLE = {"INR": FIXED_INR_TO_WEI_RATE, **json.loads(os.getenv("CURRENCY_RATE_TABLE", "{}"))}
+
+# Minor units (paise, cents) per currency unit; amounts are rounded to these
+MINOR_UNITS = 100
+
+# Largest value int64 arrays can hold; bigger batches fall back to exact Python ints
+INT64_MAX = np.iinfo(np.int64).max
+
+def get_rate(currency: str = "INR") -> int:
+    try:
+        return int(RATE_TABLE[currency])
+    except KeyError:
+        raise ValueError(f"No conversion rate configured for {currency}.")
+
+# -------------------------
+# Scalar conversions
+# -------------------------
+# All of these go through exact integer minor units, so they match the batch
+# versions below bit for bit.
+
+def to_minor_units(amount: float) -> int:
+    """
+    Rounds to the nearest minor unit, halves to even (as numpy's rint does).
+    """
+    if not math.isfinite(amount):
+        raise ValueError(f"Amount must be a finite number, got {amount}.")
+    return round(amount * MINOR_UNITS)
+
+def minor_units_to_wei(minor_units: int, rate: int) -> int:
+    whole, fraction = divmod(rate, MINOR_UNITS)
+    return minor_units * whole + minor_units * fraction // MINOR_UNITS
+
+def wei_to_minor_units(wei_amount: int, rate: int) -> int:
+    """
+    Rounds to the nearest minor unit (halves round up).
+    """
+    # `//` and `%` rather than divmod, which numpy doesn't support on object arrays
+    units, remainder = wei_amount // rate, wei_amount % rate
+    return units * MINOR_UNITS + (remainder * MINOR_UNITS + rate // 2) // rate
+
 def INR_to_wei(INR_amount: float) -> int:
     """
     Converts a INR amount to Wei (the smallest unit of Ether).
     This function uses a fixed conversion rate for demonstration purposes.
+    The amount is rounded to whole paise first, so fractions of a paisa
+    (e.g. 0.004 INR) no longer carry into the result.
     """
     if INR_amount < 0:
         raise ValueError("INR amount cannot be negative.")
-    # Calculate Wei amount using the fixed rate
-    wei_amount = int(INR_amount * FIXED_INR_TO_WEI_RATE)
-    return wei_amount
+    # Exact integer math on paise; a float product loses precision above 2^53 wei
+    return minor_units_to_wei(to_minor_units(INR_amount), get_rate("INR"))
 
 def wei_to_INR(wei_amount: int) -> float:
     """
@@ -28,9 +75,62 @@ def wei_to_INR(wei_amount: int) -> float:
     """
     if wei_amount < 0:
         raise ValueError("Wei amount cannot be negative.")
-    # Calculate INR amount from Wei
-    INR_amount = wei_amount / FIXED_INR_TO_WEI_RATE
-    return round(INR_amount, 2) # Round to 2 decimal places for currency
+    # Rounded to 2 decimal places (whole paise) for currency
+    return float(wei_to_minor_units(int(wei_amount), get_rate("INR"))) / MINOR_UNITS
+
+# -------------------------
+# Batch conversions
+# -------------------------
+
+def _exact_int_array(values, bound: int):
+    """
+    int64 array when `bound` (the largest intermediate value) fits, otherwise an
+    object array of Python ints so nothing overflows or gets rounded.
+    """
+    if bound <= INT64_MAX:
+        return np.asarray(values, dtype=np.int64)
+    return np.array([int(value) for value in np.asarray(values).ravel()], dtype=object).reshape(np.shape(values))
+
+def to_minor_units_batch(amounts) -> np.ndarray:
+    if not np.all(np.isfinite(amounts)):
+        raise ValueError("Amounts must be finite numbers.")
+    return np.rint(np.asarray(amounts, dtype=np.float64) * MINOR_UNITS).astype(np.int64)
+
+def to_wei_batch(amounts, currency: str = "INR") -> np.ndarray:
+    """
+    Converts an array of currency amounts to wei.
+    Returns int64, or Python ints (dtype=object) when results could exceed int64.
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    if np.any(amounts < 0):
+        raise ValueError(f"{currency} amount cannot be negative.")
+
+    rate = get_rate(currency)
+    minor_units = to_minor_units_batch(amounts)
+    largest = int(minor_units.max()) if minor_units.size else 0
+    minor_units = _exact_int_array(minor_units, largest * (rate // MINOR_UNITS + MINOR_UNITS))
+    return minor_units_to_wei(minor_units, rate)
+
+def from_wei_batch(wei_amounts, currency: str = "INR") -> np.ndarray:
+    """
+    Converts an array of wei amounts (ints, possibly above int64) to currency
+    amounts rounded to whole minor units, as float64.
+    """
+    wei_amounts = np.asarray(wei_amounts)
+    if wei_amounts.size and wei_amounts.min() < 0:
+        raise ValueError("Wei amount cannot be negative.")
+
+    rate = get_rate(currency)
+    largest = int(wei_amounts.max()) if wei_amounts.size else 0
+    wei_amounts = _exact_int_array(wei_amounts, max(largest, rate * (MINOR_UNITS + 1)))
+    minor_units = wei_to_minor_units(wei_amounts, rate)
+    return minor_units.astype(np.float64) / MINOR_UNITS
+
+def INR_to_wei_batch(INR_amounts) -> np.ndarray:
+    return to_wei_batch(INR_amounts, "INR")
+
+def wei_to_INR_batch(wei_amounts) -> np.ndarray:
+    return from_wei_batch(wei_amounts, "INR")
 
 # Example usage (for testing purposes)
 if __name__ == "__main__":
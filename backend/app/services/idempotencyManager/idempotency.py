@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from app.services.contractsManager.contract_config import IDEMPOTENCY_PATH
+from app.services.metricsManager.metrics import metrics
+from .idempotency_store import IdempotencyStore
+
+# How long (seconds) a key is remembered; retries after that count as new requests
+IDEMPOTENCY_RETENTION_SECONDS = float(os.getenv("IDEMPOTENCY_RETENTION_SECONDS", str(24 * 3600)))
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+idempotent_replays = metrics.counter(
+    "idempotent_replays_total", "Write requests answered from an earlier request with the same Idempotency-Key, by scope."
+)
+
+class IdempotencyKeyReused(Exception):
+    pass
+
+class Idempotency:
+    """
+    Idempotency-Key handling for write endpoints. The first request with a key
+    claims it; a retry with the same key and body attaches to what that request
+    started (its outbox intent or tx hash) or gets its stored response, so a
+    client retrying after a timeout never causes a second on-chain write.
+    """
+
+    def __init__(self, store, retention=IDEMPOTENCY_RETENTION_SECONDS):
+        self.store = store
+        self.retention = retention
+        self._running = {}  # (scope, key) -> future resolved when the request holding it here finishes
+        self._last_prune = 0
+
+    def begin(self, scope, key, body):
+        """
+        Claims `key` for a new request and returns None, or returns the record
+        of the earlier request holding it. Raises IdempotencyKeyReused if that
+        request had a different body.
+        """
+        if len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            raise ValueError(f"Idempotency-Key must be at most {MAX_IDEMPOTENCY_KEY_LENGTH} characters.")
+        self._prune()
+
+        request_hash = hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()
+        record = self.store.claim(scope, key, request_hash, self.retention)
+        if record is not None and record["request_hash"] != request_hash:
+            raise IdempotencyKeyReused(f"Idempotency-Key {key} was already used for a different request.")
+
+        if (
+            record is not None and record["status"] == "in_flight"
+            and record["intent_id"] is None and record["tx_hash"] is None
+            and (scope, key) not in self._running
+        ):
+            # Claimed by a request that stopped (e.g. a restart) before writing anything: take it over
+            record = None
+
+        if record is None:
+            self._running[(scope, key)] = asyncio.get_running_loop().create_future()
+        else:
+            idempotent_replays.inc(scope=scope)
+        return record
+
+    def attach(self, scope, key, intent_id=None, tx_hash=None, sender=None, nonce=None):
+        """
+        Records the write a request started, before it can be lost to a timeout.
+        A transaction is recorded with its sender and nonce, so a retry can tell
+        whether it ever reached the chain.
+        """
+        self.store.attach(scope, key, intent_id, tx_hash, sender, nonce)
+
+    def forget_tx(self, scope, key):
+        """
+        Drops the transaction attached to a key once it's known never to have reached the node.
+        """
+        self.store.clear_tx(scope, key)
+
+    def complete(self, scope, key, status_code, response):
+        self.store.complete(scope, key, status_code, response)
+        self._finish(scope, key)
+
+    def detach(self, scope, key):
+        """
+        Ends a request that returned before its write finished (e.g. a 202); retries follow its intent or tx hash.
+        """
+        self._finish(scope, key)
+
+    def abandon(self, scope, key):
+        """
+        Ends a request that raised. If it never started a write the key is freed so a
+        retry runs afresh; otherwise retries follow the intent or tx hash it started.
+        """
+        record = self.store.get(scope, key)
+        if record is not None and record["intent_id"] is None and record["tx_hash"] is None:
+            self.store.delete(scope, key)
+        self._finish(scope, key)
+
+    def get(self, scope, key):
+        return self.store.get(scope, key)
+
+    def running(self, scope, key) -> bool:
+        """
+        Whether the request holding `key` is still being handled in this process.
+        """
+        return (scope, key) in self._running
+
+    async def wait(self, scope, key, timeout):
+        """
+        Waits for the request holding `key` in this process to finish and returns the key's record.
+        """
+        future = self._running.get((scope, key))
+        if future is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.store.get(scope, key)
+
+    def _finish(self, scope, key):
+        future = self._running.pop((scope, key), None)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    def _prune(self):
+        if time.time() - self._last_prune < 3600:
+            return
+        self._last_prune = time.time()
+        self.store.prune_expired()
+
+# Shared by the write endpoints
+idempotency = Idempotency(IdempotencyStore(IDEMPOTENCY_PATH))
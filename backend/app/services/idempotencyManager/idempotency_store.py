@@ -0,0 +1,104 @@
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    request_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    intent_id INTEGER,
+    tx_hash TEXT,
+    sender TEXT,
+    nonce INTEGER,
+    status_code INTEGER,
+    response TEXT,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (scope, key)
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expiry ON idempotency_keys (expires_at);
+"""
+
+class IdempotencyStore:
+    """
+    SQLite store of Idempotency-Key records, keyed by (scope, key).
+    A record is "in_flight" until its response is known, then "done"; either
+    way it carries what a retry needs to attach to the original write (its
+    outbox intent or tx hash) and is dropped once it expires.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def claim(self, scope, key, request_hash, retention):
+        """
+        Records a new in-flight key and returns None, or returns the unexpired
+        record already held under it.
+        """
+        now = time.time()
+        with self._lock, self.connect() as conn:
+            conn.execute("DELETE FROM idempotency_keys WHERE scope = ? AND key = ? AND expires_at <= ?", (scope, key, now))
+            inserted = conn.execute(
+                "INSERT INTO idempotency_keys (scope, key, request_hash, status, created_at, expires_at) "
+                "VALUES (?, ?, ?, 'in_flight', ?, ?) ON CONFLICT (scope, key) DO NOTHING",
+                (scope, key, request_hash, now, now + retention)
+            ).rowcount
+            if inserted:
+                return None
+            row = conn.execute("SELECT * FROM idempotency_keys WHERE scope = ? AND key = ?", (scope, key)).fetchone()
+        return self._to_record(row)
+
+    def attach(self, scope, key, intent_id=None, tx_hash=None, sender=None, nonce=None):
+        with self._lock, self.connect() as conn:
+            conn.execute(
+                "UPDATE idempotency_keys SET intent_id = COALESCE(?, intent_id), tx_hash = COALESCE(?, tx_hash), "
+                "sender = COALESCE(?, sender), nonce = COALESCE(?, nonce) WHERE scope = ? AND key = ?",
+                (intent_id, tx_hash, sender, nonce, scope, key)
+            )
+
+    def clear_tx(self, scope, key):
+        with self._lock, self.connect() as conn:
+            conn.execute(
+                "UPDATE idempotency_keys SET tx_hash = NULL, sender = NULL, nonce = NULL WHERE scope = ? AND key = ?",
+                (scope, key)
+            )
+
+    def complete(self, scope, key, status_code, response):
+        with self._lock, self.connect() as conn:
+            conn.execute(
+                "UPDATE idempotency_keys SET status = 'done', status_code = ?, response = ? WHERE scope = ? AND key = ?",
+                (status_code, json.dumps(response), scope, key)
+            )
+
+    def delete(self, scope, key):
+        with self._lock, self.connect() as conn:
+            conn.execute("DELETE FROM idempotency_keys WHERE scope = ? AND key = ?", (scope, key))
+
+    def get(self, scope, key):
+        row = self.connect().execute(
+            "SELECT * FROM idempotency_keys WHERE scope = ? AND key = ? AND expires_at > ?", (scope, key, time.time())
+        ).fetchone()
+        return self._to_record(row) if row else None
+
+    def prune_expired(self):
+        with self._lock, self.connect() as conn:
+            return conn.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    @staticmethod
+    def _to_record(row):
+        record = dict(row)
+        record["response"] = json.loads(record["response"]) if record["response"] else None
+        return record
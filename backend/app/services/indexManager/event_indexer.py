@@ -0,0 +1,219 @@
+import asyncio
+import os
+from web3 import Web3
+from app.services.contractsManager.contract_config import async_w3, EVENT_INDEX_PATH
+from app.services.contractsManager.event_utils import EventDecoder
+from app.services.chainManager.log_follower import log_follower
+from .event_store import EventStore
+
+# Block range requested per eth_getLogs call during backfill
+LOG_CHUNK_SIZE = int(os.getenv("LOG_CHUNK_SIZE", "2000"))
+# First block to backfill from (the deployment block, if known)
+INDEXER_START_BLOCK = int(os.getenv("INDEXER_START_BLOCK", "0"))
+# Concurrent getTransaction calls used to fill in descriptions (not part of the event)
+DESCRIPTION_FETCH_CONCURRENCY = 10
+# First delay (seconds) before a failed backfill resumes, doubled up to the maximum
+BACKFILL_RETRY_DELAY = 1
+BACKFILL_MAX_RETRY_DELAY = 60
+
+class EventIndexer:
+    """
+    Keeps a local SQLite index of TransactionRecorded, TransactionReferenced,
+    PointsAwarded and PointsRedeemed logs.
+
+    On start, history is backfilled with chunked eth_getLogs calls in the
+    background while new blocks arrive through the shared log follower, which
+    also reports reorgs so the affected rows can be rolled back and re-indexed.
+    `indexed_to` tracks the highest block up to which the index is contiguous,
+    so a restart resumes where it left off, as does a backfill retried after
+    a failed eth_getLogs.
+    """
+
+    def __init__(self, store, follower, web3_instance, chunk_size=LOG_CHUNK_SIZE, start_block=INDEXER_START_BLOCK):
+        self.store = store
+        self.follower = follower
+        self.web3 = web3_instance
+        self.chunk_size = chunk_size
+        self.start_block = start_block
+        self.retail_contract = None
+        self.loyalty_contract = None
+        self.decoder = None
+        self.backfill_complete = False
+        self.backfill_error = None
+        self._task = None
+
+    async def start(self, retail_contract, loyalty_contract):
+        """
+        Starts indexing; call after the shared log follower has been started.
+        """
+        self.retail_contract = retail_contract
+        self.loyalty_contract = loyalty_contract
+        self.decoder = EventDecoder([retail_contract, loyalty_contract])
+
+        self.store.connect()
+        self.store.reset_for_deployment(f"{retail_contract.address},{loyalty_contract.address}")
+
+        self.follower.watch(retail_contract.address, loyalty_contract.address)
+        self.follower.subscribe(self._on_logs, self._on_reorg)
+
+        from_block = max(self.start_block, int(self.store.get_state("indexed_to", self.start_block - 1)) + 1)
+        self._task = asyncio.create_task(self._backfill(from_block, self.follower.next_block - 1))
+
+    async def stop(self):
+        self.follower.unsubscribe(self._on_logs)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_transaction(self, transaction_id):
+        return self.store.get_transaction(transaction_id)
+
+    def record_local_transaction(self, transaction, tx_receipt, log_index=None):
+        """
+        Writes a sale this process just recorded, including the fields the
+        chain logs don't carry (description, points awarded).
+        """
+        self.store.save_events([{
+            "transaction_id": transaction["transaction_id"],
+            "customer_address": transaction["customer_address"],
+            "retailer_address": transaction["retailer_address"],
+            "amount_wei": str(transaction["amount_wei"]),
+            "product_id": transaction["product_id"],
+            "quantity": transaction["quantity"],
+            "timestamp": transaction["timestamp"],
+            "description": transaction["description"],
+            "transaction_hash": transaction["transaction_hash"].lower(),
+            "block_number": tx_receipt.blockNumber,
+            "block_hash": Web3.to_hex(tx_receipt.blockHash),
+            "log_index": log_index,
+            "loyalty_points_awarded": transaction["loyalty_points_awarded"],
+        }], [])
+
+    def record_local_references(self, transaction_id, references):
+        """
+        Maps off-chain references, as (reference_type, external_ref) pairs, to a sale this process just recorded.
+        """
+        self.store.save_events([], [], [
+            {"reference_type": reference_type, "external_ref": external_ref, "transaction_id": transaction_id}
+            for reference_type, external_ref in references
+        ])
+
+    async def _backfill(self, from_block, to_block):
+        delay = BACKFILL_RETRY_DELAY
+        while True:
+            try:
+                for chunk_start in range(from_block, to_block + 1, self.chunk_size):
+                    chunk_end = min(chunk_start + self.chunk_size - 1, to_block)
+                    logs = await self.web3.eth.get_logs({
+                        "fromBlock": chunk_start,
+                        "toBlock": chunk_end,
+                        "address": [self.retail_contract.address, self.loyalty_contract.address],
+                    })
+                    await self.apply_logs(logs)
+                    self.store.set_state("indexed_to", chunk_end)
+
+                self.backfill_complete = True
+                self.backfill_error = None
+                print(f"✅ Event index backfilled up to block {to_block}.")
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.backfill_error = str(e)
+                print(f"⚠️  Event index backfill failed, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, BACKFILL_MAX_RETRY_DELAY)
+                # Resume after the last chunk that was stored
+                from_block = max(self.start_block, int(self.store.get_state("indexed_to", self.start_block - 1)) + 1)
+
+    async def _on_logs(self, logs, from_block, to_block):
+        await self.apply_logs(logs)
+        # Only advance the resume point once history below the follower is complete
+        if self.backfill_complete:
+            self.store.set_state("indexed_to", to_block)
+
+    async def _on_reorg(self, block_number):
+        self.store.delete_from_block(block_number)
+        if int(self.store.get_state("indexed_to", -1)) >= block_number:
+            self.store.set_state("indexed_to", block_number - 1)
+
+    async def apply_logs(self, logs):
+        transactions = []
+        loyalty_events = []
+        references = []
+
+        for log in logs:
+            event = self.decoder.decode(log)
+            if event is None:
+                continue
+
+            common = {
+                "transaction_hash": Web3.to_hex(event["transactionHash"]),
+                "block_number": event["blockNumber"],
+                "block_hash": Web3.to_hex(event["blockHash"]),
+                "log_index": event["logIndex"],
+            }
+            args = event["args"]
+
+            if event["event"] == "TransactionRecorded":
+                transactions.append({
+                    **common,
+                    "transaction_id": args["transactionId"],
+                    "customer_address": args["customer"],
+                    "retailer_address": args["retailer"],
+                    "amount_wei": str(args["amountInWei"]),
+                    "product_id": args["productId"],
+                    "quantity": args["quantity"],
+                    "timestamp": args["timestamp"],
+                    "description": None,
+                    "loyalty_points_awarded": 0,
+                })
+            elif event["event"] in ("PointsAwarded", "PointsRedeemed"):
+                loyalty_events.append({
+                    **common,
+                    "event": event["event"],
+                    "address": args["recipient"] if event["event"] == "PointsAwarded" else args["redeemer"],
+                    "amount": str(args["amount"]),
+                })
+            elif event["event"] == "TransactionReferenced":
+                references.append({
+                    "reference_type": args["referenceType"],
+                    "external_ref": args["externalRef"],
+                    "transaction_id": args["transactionId"],
+                })
+
+        if not transactions and not loyalty_events and not references:
+            return
+
+        self.store.save_events(transactions, loyalty_events, references)
+        await self._fill_descriptions([t["transaction_id"] for t in transactions])
+
+    async def _fill_descriptions(self, transaction_ids):
+        """
+        The description isn't part of TransactionRecorded, so it's read once at index time.
+        """
+        missing = [
+            transaction_id for transaction_id in transaction_ids
+            if (self.store.get_transaction(transaction_id) or {}).get("description") is None
+        ]
+        if not missing:
+            return
+
+        semaphore = asyncio.Semaphore(DESCRIPTION_FETCH_CONCURRENCY)
+
+        async def fetch(transaction_id):
+            async with semaphore:
+                details = await self.retail_contract.functions.getTransaction(transaction_id).call()
+                self.store.set_description(transaction_id, details[7])
+
+        results = await asyncio.gather(*(fetch(transaction_id) for transaction_id in missing), return_exceptions=True)
+        for transaction_id, result in zip(missing, results):
+            if isinstance(result, Exception):
+                print(f"⚠️  Could not fetch description for transaction {transaction_id}: {result}")
+
+# Shared index used by the API routes
+event_indexer = EventIndexer(EventStore(EVENT_INDEX_PATH), log_follower, async_w3)
@@ -0,0 +1,278 @@
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS retail_transactions (
+    transaction_id INTEGER PRIMARY KEY,
+    customer_address TEXT NOT NULL,
+    retailer_address TEXT NOT NULL,
+    amount_wei TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    description TEXT,
+    transaction_hash TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    block_hash TEXT,
+    log_index INTEGER,
+    loyalty_points_awarded INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_retail_transactions_hash ON retail_transactions (transaction_hash);
+CREATE INDEX IF NOT EXISTS idx_retail_transactions_block ON retail_transactions (block_number);
+
+CREATE TABLE IF NOT EXISTS loyalty_events (
+    transaction_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    address TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    block_hash TEXT NOT NULL,
+    PRIMARY KEY (transaction_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS idx_loyalty_events_address ON loyalty_events (address);
+CREATE INDEX IF NOT EXISTS idx_loyalty_events_block ON loyalty_events (block_number);
+
+CREATE TABLE IF NOT EXISTS transaction_references (
+    reference_type TEXT NOT NULL,
+    external_ref TEXT NOT NULL,
+    transaction_id INTEGER NOT NULL,
+    PRIMARY KEY (reference_type, external_ref)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_transaction_references_id ON transaction_references (transaction_id);
+
+-- References of sales queued but not recorded yet; the primary key makes a claim exclusive
+CREATE TABLE IF NOT EXISTS reference_claims (
+    reference_type TEXT NOT NULL,
+    external_ref TEXT NOT NULL,
+    claimed_by TEXT NOT NULL,
+    claimed_at REAL NOT NULL,
+    PRIMARY KEY (reference_type, external_ref)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_reference_claims_owner ON reference_claims (claimed_by);
+
+CREATE TABLE IF NOT EXISTS index_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Chain-derived columns are refreshed on conflict; a locally known description
+# or points value is never overwritten by an emptier row.
+UPSERT_TRANSACTION = """
+INSERT INTO retail_transactions (
+    transaction_id, customer_address, retailer_address, amount_wei, product_id, quantity,
+    timestamp, description, transaction_hash, block_number, block_hash, log_index, loyalty_points_awarded
+) VALUES (
+    :transaction_id, :customer_address, :retailer_address, :amount_wei, :product_id, :quantity,
+    :timestamp, :description, :transaction_hash, :block_number, :block_hash, :log_index, :loyalty_points_awarded
+)
+ON CONFLICT (transaction_id) DO UPDATE SET
+    customer_address = excluded.customer_address,
+    retailer_address = excluded.retailer_address,
+    amount_wei = excluded.amount_wei,
+    product_id = excluded.product_id,
+    quantity = excluded.quantity,
+    timestamp = excluded.timestamp,
+    transaction_hash = excluded.transaction_hash,
+    block_number = excluded.block_number,
+    block_hash = COALESCE(excluded.block_hash, retail_transactions.block_hash),
+    log_index = COALESCE(excluded.log_index, retail_transactions.log_index),
+    description = COALESCE(excluded.description, retail_transactions.description),
+    loyalty_points_awarded = MAX(excluded.loyalty_points_awarded, retail_transactions.loyalty_points_awarded)
+"""
+
+# Points awarded in the same chain transaction as a sale belong to that sale
+LINK_AWARDED_POINTS = """
+UPDATE retail_transactions SET loyalty_points_awarded = CAST((
+    SELECT le.amount FROM loyalty_events le
+    WHERE le.transaction_hash = retail_transactions.transaction_hash
+      AND le.event = 'PointsAwarded'
+      AND le.address = retail_transactions.customer_address
+    ORDER BY le.log_index LIMIT 1
+) AS INTEGER)
+WHERE loyalty_points_awarded = 0
+  AND transaction_hash = ?
+  AND EXISTS (
+    SELECT 1 FROM loyalty_events le
+    WHERE le.transaction_hash = retail_transactions.transaction_hash
+      AND le.event = 'PointsAwarded'
+      AND le.address = retail_transactions.customer_address
+  )
+"""
+
+# (reference_type, external_ref) pairs per lookup query, well under SQLite's bound-parameter limit
+REFERENCE_LOOKUP_CHUNK = 500
+
+class EventStore:
+    """
+    SQLite store behind the local event index.
+    Sales are keyed by transaction id and indexed by tx hash and block number;
+    loyalty events are keyed by (tx hash, log index). Reads are plain
+    primary-key lookups, so they don't touch the node at all.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def get_state(self, key, default=None):
+        row = self.connect().execute("SELECT value FROM index_state WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def set_state(self, key, value):
+        with self._lock, self.connect() as conn:
+            conn.execute(
+                "INSERT INTO index_state (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (key, str(value))
+            )
+
+    def reset_for_deployment(self, deployment_key):
+        """
+        Clears the index when the contract addresses changed (fresh deployment).
+        """
+        if self.get_state("deployment") == deployment_key:
+            return
+        with self._lock, self.connect() as conn:
+            conn.execute("DELETE FROM retail_transactions")
+            conn.execute("DELETE FROM loyalty_events")
+            conn.execute("DELETE FROM transaction_references")
+            conn.execute("DELETE FROM reference_claims")
+            conn.execute("DELETE FROM index_state")
+            conn.execute("INSERT INTO index_state (key, value) VALUES ('deployment', ?)", (deployment_key,))
+
+    def save_events(self, transactions, loyalty_events, references=()):
+        with self._lock, self.connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO transaction_references (reference_type, external_ref, transaction_id) "
+                "VALUES (:reference_type, :external_ref, :transaction_id)",
+                references
+            )
+            # A recorded reference no longer needs its claim
+            conn.executemany(
+                "DELETE FROM reference_claims WHERE reference_type = :reference_type AND external_ref = :external_ref",
+                references
+            )
+            conn.executemany(UPSERT_TRANSACTION, transactions)
+            conn.executemany(
+                "INSERT OR REPLACE INTO loyalty_events "
+                "(transaction_hash, log_index, event, address, amount, block_number, block_hash) "
+                "VALUES (:transaction_hash, :log_index, :event, :address, :amount, :block_number, :block_hash)",
+                loyalty_events
+            )
+            tx_hashes = {row["transaction_hash"] for row in transactions} | {row["transaction_hash"] for row in loyalty_events}
+            conn.executemany(LINK_AWARDED_POINTS, [(tx_hash,) for tx_hash in tx_hashes])
+
+    def claim_references(self, references, owner):
+        """
+        Reserves (reference_type, external_ref) pairs for `owner`, all or none.
+        Returns None once claimed, else the first pair already recorded or
+        claimed by another owner. IMMEDIATE takes SQLite's write lock before
+        the checks, so no other connection can claim or record in between.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self.connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for reference_type, external_ref in references:
+                    row = conn.execute(
+                        "SELECT transaction_id FROM transaction_references WHERE reference_type = ? AND external_ref = ?",
+                        (reference_type, external_ref)
+                    ).fetchone()
+                    conflict = {"reference_type": reference_type, "external_ref": external_ref, "transaction_id": row["transaction_id"]} if row else None
+                    if conflict is None:
+                        row = conn.execute(
+                            "SELECT claimed_by, claimed_at FROM reference_claims WHERE reference_type = ? AND external_ref = ?",
+                            (reference_type, external_ref)
+                        ).fetchone()
+                        if row and row["claimed_by"] != owner:
+                            conflict = {"reference_type": reference_type, "external_ref": external_ref, "transaction_id": None, **dict(row)}
+                    if conflict is not None:
+                        conn.rollback()
+                        return conflict
+                conn.executemany(
+                    "INSERT INTO reference_claims (reference_type, external_ref, claimed_by, claimed_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (reference_type, external_ref) DO UPDATE SET claimed_at = excluded.claimed_at",
+                    [(reference_type, external_ref, owner, now) for reference_type, external_ref in references]
+                )
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        return None
+
+    def transfer_references(self, owner, new_owner):
+        with self._lock, self.connect() as conn:
+            conn.execute("UPDATE reference_claims SET claimed_by = ? WHERE claimed_by = ?", (new_owner, owner))
+
+    def release_references(self, owner):
+        """
+        Drops `owner`'s claims, e.g. when its sales were never sent.
+        """
+        with self._lock, self.connect() as conn:
+            conn.execute("DELETE FROM reference_claims WHERE claimed_by = ?", (owner,))
+
+    def set_description(self, transaction_id, description):
+        with self._lock, self.connect() as conn:
+            conn.execute(
+                "UPDATE retail_transactions SET description = ? WHERE transaction_id = ?",
+                (description, transaction_id)
+            )
+
+    def delete_from_block(self, block_number):
+        """
+        Drops everything indexed at or after `block_number` (reorg rollback).
+        """
+        with self._lock, self.connect() as conn:
+            conn.execute("DELETE FROM retail_transactions WHERE block_number >= ?", (block_number,))
+            conn.execute("DELETE FROM loyalty_events WHERE block_number >= ?", (block_number,))
+
+    def get_transaction(self, transaction_id):
+        row = self.connect().execute(
+            "SELECT * FROM retail_transactions WHERE transaction_id = ?", (transaction_id,)
+        ).fetchone()
+        return self._to_transaction(row) if row else None
+
+    def get_transactions_by_hash(self, transaction_hash):
+        rows = self.connect().execute(
+            "SELECT * FROM retail_transactions WHERE transaction_hash = ? ORDER BY log_index",
+            (transaction_hash.lower(),)
+        ).fetchall()
+        return [self._to_transaction(row) for row in rows]
+
+    def get_references(self, references):
+        """
+        Looks up (reference_type, external_ref) pairs; returns the matches with
+        their transaction's hash and block, keyed by pair. References outlive a
+        reorg rollback of their sale, so those two may be None until it's re-indexed.
+        """
+        matches = {}
+        references = list(references)
+        for start in range(0, len(references), REFERENCE_LOOKUP_CHUNK):
+            chunk = references[start:start + REFERENCE_LOOKUP_CHUNK]
+            rows = self.connect().execute(
+                "SELECT r.reference_type, r.external_ref, r.transaction_id, t.transaction_hash, t.block_number "
+                "FROM transaction_references r LEFT JOIN retail_transactions t ON t.transaction_id = r.transaction_id "
+                f"WHERE (r.reference_type, r.external_ref) IN (VALUES {', '.join('(?, ?)' for _ in chunk)})",
+                [value for reference in chunk for value in reference]
+            ).fetchall()
+            matches.update({(row["reference_type"], row["external_ref"]): dict(row) for row in rows})
+        return matches
+
+    @staticmethod
+    def _to_transaction(row):
+        transaction = dict(row)
+        transaction["amount_wei"] = int(transaction["amount_wei"])
+        return transaction
@@ -0,0 +1,101 @@
+import asyncio
+from web3 import Web3
+from .event_indexer import LOG_CHUNK_SIZE, INDEXER_START_BLOCK
+
+# Error fragments nodes use when an eth_getLogs response would be too large
+RESULT_LIMIT_MARKERS = (
+    "query returned more than",
+    "limit exceeded",
+    "response size exceeded",
+    "too many results",
+    "block range",
+    "range is too large",
+    "-32005",
+)
+# Block ranges fetched concurrently per scan round
+SCAN_CONCURRENCY = 4
+# Upper bound for the scan window when topic-filtered ranges turn out to be sparse
+MAX_SCAN_WINDOW = 100000
+
+def is_result_limit_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(marker in message for marker in RESULT_LIMIT_MARKERS)
+
+def address_topic(address) -> str:
+    """
+    Returns an address left-padded to 32 bytes, as used for indexed event arguments.
+    """
+    return "0x" + "0" * 24 + Web3.to_checksum_address(address)[2:].lower()
+
+def encode_cursor(block_number, log_index) -> str:
+    return f"{block_number}:{log_index}"
+
+def decode_cursor(cursor):
+    block_number, log_index = cursor.split(":")
+    return int(block_number), int(log_index)
+
+async def get_logs_adaptive(web3_instance, filter_params, from_block, to_block):
+    """
+    eth_getLogs over [from_block, to_block]; if the node refuses because the
+    result is too large, the range is halved and both halves fetched concurrently.
+    """
+    try:
+        return await web3_instance.eth.get_logs({**filter_params, "fromBlock": from_block, "toBlock": to_block})
+    except Exception as e:
+        if from_block >= to_block or not is_result_limit_error(e):
+            raise
+        middle = (from_block + to_block) // 2
+        lower, upper = await asyncio.gather(
+            get_logs_adaptive(web3_instance, filter_params, from_block, middle),
+            get_logs_adaptive(web3_instance, filter_params, middle + 1, to_block),
+        )
+        return lower + upper
+
+async def scan_logs_backwards(web3_instance, filter_params, head_block, limit, cursor=None, lowest_block=INDEXER_START_BLOCK):
+    """
+    Collects up to `limit` logs matching `filter_params`, newest first, that
+    come strictly before `cursor` ((block, logIndex), or the chain head).
+
+    Ranges are scanned from the top down, SCAN_CONCURRENCY windows at a time.
+    The window doubles after an empty round, since topic-filtered history is
+    usually sparse. Returns (logs, next_cursor); next_cursor is None once the
+    scan reached `lowest_block`.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    upper = position[0] if position else head_block
+    window = LOG_CHUNK_SIZE
+    collected = []
+
+    while upper >= lowest_block and len(collected) < limit:
+        ranges = []
+        for _ in range(SCAN_CONCURRENCY):
+            if upper < lowest_block:
+                break
+            lower = max(lowest_block, upper - window + 1)
+            ranges.append((lower, upper))
+            upper = lower - 1
+
+        results = await asyncio.gather(*(
+            get_logs_adaptive(web3_instance, filter_params, lower, upper_block)
+            for lower, upper_block in ranges
+        ))
+
+        round_logs = [log for logs in results for log in logs]
+        if position:
+            round_logs = [log for log in round_logs if (log["blockNumber"], log["logIndex"]) < position]
+        round_logs.sort(key=lambda log: (log["blockNumber"], log["logIndex"]), reverse=True)
+        collected.extend(round_logs)
+
+        if not round_logs:
+            window = min(window * 2, MAX_SCAN_WINDOW)
+
+    if len(collected) > limit:
+        collected = collected[:limit]
+        last = collected[-1]
+        return collected, encode_cursor(last["blockNumber"], last["logIndex"])
+
+    if len(collected) == limit and upper >= lowest_block:
+        last = collected[-1]
+        return collected, encode_cursor(last["blockNumber"], last["logIndex"])
+
+    return collected, None
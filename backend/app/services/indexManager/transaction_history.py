@@ -0,0 +1,51 @@
+from eth_utils import event_abi_to_log_topic
+from web3 import Web3
+from app.services.contractsManager.contract_config import async_w3
+from app.services.chainManager.chain_state import chain_state
+from app.services.currencyManager.currency_converter import wei_to_INR
+from .log_scanner import scan_logs_backwards, address_topic
+
+# Position of each party among TransactionRecorded's topics (topic0 is the event signature)
+PARTY_TOPIC_POSITION = {"customer": 2, "retailer": 3}
+
+async def get_transaction_history(retail_contract, party, address, limit, cursor=None):
+    """
+    Lists a customer's or retailer's sales, newest first, straight from the
+    TransactionRecorded logs, using the indexed `customer` / `retailer` topic
+    as the eth_getLogs filter. Returns (items, next_cursor).
+    """
+    event = retail_contract.events.TransactionRecorded()
+    topics = [Web3.to_hex(event_abi_to_log_topic(event.abi)), None, None, None]
+    topics[PARTY_TOPIC_POSITION[party]] = address_topic(address)
+
+    head_block = chain_state.block_number
+    if head_block is None:
+        head_block = await async_w3.eth.block_number
+
+    logs, next_cursor = await scan_logs_backwards(
+        async_w3,
+        {"address": retail_contract.address, "topics": topics[:PARTY_TOPIC_POSITION[party] + 1]},
+        head_block,
+        limit,
+        cursor
+    )
+
+    items = []
+    for log in logs:
+        decoded = event.process_log(log)
+        args = decoded["args"]
+        items.append({
+            "transaction_id": args["transactionId"],
+            "customer_address": args["customer"],
+            "retailer_address": args["retailer"],
+            "amount_INR": wei_to_INR(args["amountInWei"]),
+            "amount_wei": args["amountInWei"],
+            "product_id": args["productId"],
+            "quantity": args["quantity"],
+            "timestamp": args["timestamp"],
+            "transaction_hash": Web3.to_hex(decoded["transactionHash"]),
+            "block_number": decoded["blockNumber"],
+            "log_index": decoded["logIndex"],
+        })
+
+    return items, next_cursor
@@ -0,0 +1,142 @@
+import os
+import time
+from collections import OrderedDict
+from web3 import Web3
+from app.services.contractsManager.event_utils import EventDecoder
+from app.services.chainManager.log_follower import log_follower
+
+BALANCE_CACHE_SIZE = int(os.getenv("BALANCE_CACHE_SIZE", "10000"))
+# Safety net only; entries are normally invalidated by PointsAwarded/PointsRedeemed logs
+BALANCE_CACHE_TTL = float(os.getenv("BALANCE_CACHE_TTL", "60"))
+# Local writes remembered so the follower doesn't invalidate a balance we already updated
+MAX_APPLIED_TX_HASHES = 10000
+# Addresses whose last balance change is remembered, to reject reads that started before it
+MAX_CHANGE_MARKERS = 10000
+
+class BalanceCache:
+    """
+    Bounded LRU/TTL cache of loyalty balances.
+
+    Every entry remembers the block it was read at. Balances are read at the
+    last block the shared log follower has processed, so any later
+    PointsAwarded/PointsRedeemed for the address reaches `_on_logs` and
+    invalidates the entry. Awards and redemptions sent by this process update
+    the entry in place instead.
+
+    A read is awaited while the follower keeps running, so a change can be
+    processed before the read is cached. The block of each address's last
+    change is remembered, and `set` drops reads taken before it, as well as
+    reads from a block range a reorg has since replaced.
+    """
+
+    def __init__(self, follower, max_entries=BALANCE_CACHE_SIZE, ttl=BALANCE_CACHE_TTL):
+        self.follower = follower
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.decoder = None
+        self._entries = OrderedDict()  # address -> (balance, block_number, expires_at)
+        self._applied_tx_hashes = OrderedDict()
+        self._changed_at = OrderedDict()  # address -> block of its latest known balance change
+        self._replaced_blocks = None  # (first, last) block of the chain view the last reorg replaced
+        self._followed_to = None  # last block the follower has handed to `_on_logs`
+
+    async def start(self, loyalty_contract):
+        """
+        Subscribes to the loyalty contract's logs; call after the log follower has started.
+        """
+        self.decoder = EventDecoder([loyalty_contract])
+        self.follower.watch(loyalty_contract.address)
+        self.follower.subscribe(self._on_logs, self._on_reorg)
+
+    async def stop(self):
+        self.follower.unsubscribe(self._on_logs)
+        self.decoder = None
+        self._entries.clear()
+
+    def read_block(self):
+        """
+        Block to read balances at so they can be cached, or None when no log
+        subscription is active (then balances must not be cached).
+        """
+        if self.decoder is None or self.follower.next_block is None:
+            return None
+        return self.follower.next_block - 1
+
+    def get(self, address):
+        entry = self._entries.get(address)
+        if entry is None:
+            return None
+        if entry[2] < time.monotonic():
+            del self._entries[address]
+            return None
+        self._entries.move_to_end(address)
+        return entry[0]
+
+    def set(self, address, balance, block_number):
+        """
+        Caches a balance read at `block_number`, unless the address changed after
+        that block or the block was replaced by a reorg while the read was in flight.
+        """
+        if self._changed_at.get(address, -1) > block_number:
+            return
+        if self._replaced_blocks is not None and self._replaced_blocks[0] <= block_number <= self._replaced_blocks[1]:
+            return
+        self._store(address, balance, block_number)
+
+    def _store(self, address, balance, block_number):
+        self._entries[address] = (balance, block_number, time.monotonic() + self.ttl)
+        self._entries.move_to_end(address)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, address=None):
+        if address is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(address, None)
+
+    def apply_local_change(self, address, delta, tx_receipt):
+        """
+        Updates a cached balance after an award (+) or redemption (-) sent by this process.
+        """
+        tx_hash = Web3.to_hex(tx_receipt.transactionHash)
+        self._applied_tx_hashes[tx_hash] = True
+        while len(self._applied_tx_hashes) > MAX_APPLIED_TX_HASHES:
+            self._applied_tx_hashes.popitem(last=False)
+
+        address = Web3.to_checksum_address(address)
+        self._mark_changed(address, tx_receipt.blockNumber)
+        entry = self._entries.get(address)
+        # An entry read at or after the mined block already includes the change
+        if entry is not None and entry[1] < tx_receipt.blockNumber:
+            self._store(address, entry[0] + delta, entry[1])
+
+    async def _on_logs(self, logs, from_block, to_block):
+        self._followed_to = to_block
+        if self.decoder is None:
+            return
+        for log in logs:
+            event = self.decoder.decode(log)
+            if event is None or event["event"] not in ("PointsAwarded", "PointsRedeemed"):
+                continue
+            address = event["args"]["recipient"] if event["event"] == "PointsAwarded" else event["args"]["redeemer"]
+            self._mark_changed(address, event["blockNumber"])
+            if Web3.to_hex(event["transactionHash"]) in self._applied_tx_hashes:
+                continue
+
+            entry = self._entries.get(address)
+            if entry is not None and entry[1] < event["blockNumber"]:
+                del self._entries[address]
+
+    async def _on_reorg(self, block_number):
+        self._replaced_blocks = (block_number, max(block_number, self._followed_to or block_number))
+        self.invalidate()
+
+    def _mark_changed(self, address, block_number):
+        self._changed_at[address] = max(block_number, self._changed_at.get(address, -1))
+        self._changed_at.move_to_end(address)
+        while len(self._changed_at) > MAX_CHANGE_MARKERS:
+            self._changed_at.popitem(last=False)
+
+# Shared cache used by the loyalty manager
+balance_cache = BalanceCache(log_follower)
@@ -1,7 +1,20 @@
 from web3 import Web3
 from app.services.contractsManager.load_utils import load_contract
+from app.services.contractsManager.contract_config import async_w3
+from .balance_cache import balance_cache
 
 async def get_loyalty_balance(customer_address):
-    contract = load_contract("LoyaltyPoints")
-    balance = contract.functions.getBalance(Web3.to_checksum_address(customer_address)).call()
+    address = Web3.to_checksum_address(customer_address)
+    cached = balance_cache.get(address)
+    if cached is not None:
+        return cached
+
+    contract = load_contract("LoyaltyPoints", async_w3)
+    # Read at the block the log follower has reached so later changes are sure to invalidate it
+    read_block = balance_cache.read_block()
+    balance = await contract.functions.getBalance(address).call(
+        block_identifier=read_block if read_block is not None else "latest"
+    )
+    if read_block is not None:
+        balance_cache.set(address, balance, read_block)
     return balance
@@ -0,0 +1,82 @@
+import asyncio
+import aiohttp
+from eth_abi import decode
+from web3 import Web3
+from app.services.contractsManager.load_utils import load_contract
+from app.services.contractsManager.contract_config import async_w3
+from app.services.chainManager.rpc_batch import send_batch, RPC_BATCH_SIZE, RPC_BATCH_TIMEOUT
+from .balance_cache import balance_cache
+
+# Batches in flight at once for a single bulk lookup
+BULK_BALANCE_CONCURRENCY = 4
+
+async def resolve_block(block_number=None):
+    """
+    Picks the block a bulk lookup is pinned to. Without an explicit block the
+    log follower's position is used, which is also the block cached balances
+    are valid at, so cache hits and fresh reads form one consistent snapshot.
+    """
+    if block_number is not None:
+        return block_number
+    read_block = balance_cache.read_block()
+    if read_block is not None:
+        return read_block
+    return await async_w3.eth.block_number
+
+async def stream_loyalty_balances(addresses, block_number):
+    """
+    Yields {"customer_address", "balance" | "error", "block_number"} per address,
+    as each JSON-RPC batch of `getBalance` calls completes.
+    """
+    contract = load_contract("LoyaltyPoints", async_w3)
+    use_cache = block_number == balance_cache.read_block()
+    block_param = hex(block_number)
+
+    to_fetch = []
+    for address in addresses:
+        if not Web3.is_address(address):
+            yield {"customer_address": address, "error": "Invalid address", "block_number": block_number}
+            continue
+        checksum = Web3.to_checksum_address(address)
+        cached = balance_cache.get(checksum) if use_cache else None
+        if cached is not None:
+            yield {"customer_address": address, "balance": cached, "block_number": block_number}
+        else:
+            to_fetch.append((address, checksum))
+
+    if not to_fetch:
+        return
+
+    semaphore = asyncio.Semaphore(BULK_BALANCE_CONCURRENCY)
+    chunks = [to_fetch[i:i + RPC_BATCH_SIZE] for i in range(0, len(to_fetch), RPC_BATCH_SIZE)]
+
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=RPC_BATCH_TIMEOUT)) as session:
+        async def fetch_chunk(chunk):
+            calls = [
+                ("eth_call", [{"to": contract.address, "data": contract.encode_abi(fn_name="getBalance", args=[checksum])}, block_param])
+                for _, checksum in chunk
+            ]
+            async with semaphore:
+                try:
+                    responses = await send_batch(async_w3, calls, session)
+                except Exception as e:
+                    return [{"customer_address": address, "error": str(e), "block_number": block_number} for address, _ in chunk]
+
+            results = []
+            for (address, checksum), response in zip(chunk, responses):
+                if "error" in response:
+                    results.append({"customer_address": address, "error": str(response["error"]), "block_number": block_number})
+                    continue
+                try:
+                    balance = decode(["uint256"], Web3.to_bytes(hexstr=response["result"]))[0]
+                except Exception as e:
+                    results.append({"customer_address": address, "error": f"Could not decode balance: {e}", "block_number": block_number})
+                    continue
+                if use_cache:
+                    balance_cache.set(checksum, balance, block_number)
+                results.append({"customer_address": address, "balance": balance, "block_number": block_number})
+            return results
+
+        for finished in asyncio.as_completed([fetch_chunk(chunk) for chunk in chunks]):
+            for result in await finished:
+                yield result
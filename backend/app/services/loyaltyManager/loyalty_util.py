@@ -1,11 +1,12 @@
 from .points_calculator import calculate_loyalty_points
-from .points_awarder import award_loyalty_points
+from .points_awarder import award_loyalty_points, award_points_intent
 from .points_redeemer import redeem_loyalty_points
 from .balance_checker import get_loyalty_balance
 
 __all__ = [
     "calculate_loyalty_points",
     "award_loyalty_points",
+    "award_points_intent",
     "redeem_loyalty_points",
     "get_loyalty_balance"
 ]
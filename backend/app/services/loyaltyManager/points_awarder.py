@@ -1,43 +1,74 @@
+import os
 from web3 import Web3
-from app.services.contractsManager.load_utils import load_contract
+from app.services.contractsManager.load_utils import load_contract, supports_function
 from .points_calculator import calculate_loyalty_points
-from app.services.contractsManager.contract_config import w3 # Only w3 is needed from config here
-from web3 import Account # Needed if you pass an Account object to this function
+from .balance_cache import balance_cache
+from app.services.contractsManager.contract_config import async_w3 # Only async_w3 is needed from config here
+from app.services.metricsManager.request_stages import stage
+from app.services.outboxManager.outbox import outbox
 
-async def award_loyalty_points(customer_address, amount_in_wei, retailer_account_object):
-    contract = load_contract("LoyaltyPoints")
+# Awards sent together in one awardPointsBatch transaction, at most
+AWARD_BATCH_SIZE = int(os.getenv("AWARD_BATCH_SIZE", "100"))
+# How long (seconds) an award waits for others to share its transaction
+AWARD_BATCH_WINDOW = float(os.getenv("AWARD_BATCH_WINDOW", "0.2"))
+
+async def award_loyalty_points(customer_address, amount_in_wei, timeout=300):
+    """
+    Awards the points for a sale. The award is queued in the outbox and
+    batched with others; this returns once its batch is mined.
+    """
     points = calculate_loyalty_points(amount_in_wei)
 
     if points <= 0:
         return {"success": True, "points_awarded": 0, "message": "No points awarded"}
 
-    # --- FIX START ---
-    # Use the address attribute for getting nonce
-    nonce = w3.eth.get_transaction_count(retailer_account_object.address)
-
-    # Build the transaction using the address attribute
-    tx = contract.functions.awardPoints(
-        Web3.to_checksum_address(customer_address),
-        points
-    ).build_transaction({
-        "from": retailer_account_object.address, # Corrected: Use .address
-        "gasPrice": w3.eth.gas_price,
-        "nonce": nonce,
-        "chainId": w3.eth.chain_id,
-        "gas": 6000000 # Added a generous gas limit for testing on Ganache
-    })
-
-    # Sign the transaction using the private key from the account object
-    signed_tx = w3.eth.account.sign_transaction(tx, private_key=retailer_account_object.key)
-    
-    # Send the raw, signed transaction
-    tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
-    # --- FIX END ---
-    
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    intent_id = await outbox.enqueue(*award_points_intent(customer_address, points))
+    with stage("outbox_wait"):
+        intent = await outbox.wait(intent_id, timeout)
+
+    if intent["status"] == "done":
+        return intent["result"]
+    return {
+        "success": False,
+        "points_awarded": 0,
+        "message": intent["error"] or "Award not mined yet",
+        "intent_id": intent_id
+    }
+
+def award_points_intent(customer_address, points):
+    """
+    Outbox intent awarding `points` to a customer, queued once their sale is mined.
+    """
+    return "award_points", {"customer_address": Web3.to_checksum_address(customer_address), "points": points}
 
+async def _build_award_batch(payloads):
+    contract = load_contract("LoyaltyPoints", async_w3)
+    if len(payloads) == 1:
+        return contract.functions.awardPoints(payloads[0]["customer_address"], payloads[0]["points"])
+
+    # Several awards to the same customer become one entry
+    points_by_customer = {}
+    for payload in payloads:
+        points_by_customer[payload["customer_address"]] = points_by_customer.get(payload["customer_address"], 0) + payload["points"]
+    return contract.functions.awardPointsBatch(list(points_by_customer), list(points_by_customer.values()))
+
+async def _complete_award_intent(payload, tx_receipt):
+    balance_cache.apply_local_change(payload["customer_address"], payload["points"], tx_receipt)
     return {
-        "success": receipt.status == 1,
-        "points_awarded": points,
-        "transaction_hash": tx_hash.hex()
-    }
\ No newline at end of file
+        "success": True,
+        "points_awarded": payload["points"],
+        "transaction_hash": tx_receipt.transactionHash.hex()
+    }, []
+
+async def configure_award_batching(loyalty_points_contract):
+    """
+    Batches awards only when the deployed LoyaltyPoints has awardPointsBatch;
+    contracts deployed before it existed get one transaction per award.
+    """
+    if await supports_function(loyalty_points_contract, "awardPointsBatch(address[],uint256[])"):
+        outbox.set_batch_size("award_points", AWARD_BATCH_SIZE)
+    else:
+        print("⚠️  LoyaltyPoints has no awardPointsBatch, awarding points one transaction at a time.")
+        outbox.set_batch_size("award_points", 1)
+
+outbox.register("award_points", _build_award_batch, _complete_award_intent, AWARD_BATCH_SIZE, AWARD_BATCH_WINDOW)
@@ -1,4 +1,7 @@
-from app.services.currencyManager.currency_converter import wei_to_INR
+import numpy as np
+from app.services.currencyManager.currency_converter import (
+    MINOR_UNITS, get_rate, wei_to_minor_units, from_wei_batch, _exact_int_array
+)
 
 POINTS_PER_INR = 1
 MIN_INR_FOR_POINTS = 1
@@ -7,9 +10,26 @@ def calculate_loyalty_points(amount_in_wei: int) -> int:
     if amount_in_wei < 0:
         raise ValueError("Transaction amount cannot be negative.")
 
-    amount_in_INR = wei_to_INR(amount_in_wei)
-    if amount_in_INR < MIN_INR_FOR_POINTS:
+    # Whole paise, so the result matches calculate_loyalty_points_batch exactly
+    amount_in_paise = wei_to_minor_units(int(amount_in_wei), get_rate("INR"))
+    if amount_in_paise < MIN_INR_FOR_POINTS * MINOR_UNITS:
         return 0
 
-    points = int(amount_in_INR * POINTS_PER_INR)
+    points = amount_in_paise * POINTS_PER_INR // MINOR_UNITS
     return points
+
+def calculate_loyalty_points_batch(amounts_in_wei) -> np.ndarray:
+    """
+    Vectorized calculate_loyalty_points over an array of wei amounts.
+    """
+    amounts_in_wei = np.asarray(amounts_in_wei)
+    if amounts_in_wei.size and amounts_in_wei.min() < 0:
+        raise ValueError("Transaction amount cannot be negative.")
+
+    rate = get_rate("INR")
+    largest = int(amounts_in_wei.max()) if amounts_in_wei.size else 0
+    amounts_in_wei = _exact_int_array(amounts_in_wei, max(largest, rate * (MINOR_UNITS + 1)) * POINTS_PER_INR)
+    amount_in_paise = wei_to_minor_units(amounts_in_wei, rate)
+
+    points = amount_in_paise * POINTS_PER_INR // MINOR_UNITS
+    return np.where(amount_in_paise < MIN_INR_FOR_POINTS * MINOR_UNITS, 0, points)
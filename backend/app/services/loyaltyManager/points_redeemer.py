@@ -1,11 +1,20 @@
 from web3 import Web3
 from app.services.contractsManager.load_utils import load_contract
 from .balance_checker import get_loyalty_balance
-from app.services.contractsManager.contract_config import w3 # Only w3 is needed from config here
+from .balance_cache import balance_cache
+from app.services.contractsManager.contract_config import async_w3 # Only async_w3 is needed from config here
+from app.services.chainManager.tx_sender import send_transaction
+from app.services.chainManager.receipt_tracker import receipt_tracker
 from web3 import Account # Needed if you pass an Account object to this function
 
-async def redeem_loyalty_points(customer_address, points, retailer_account_object): # Renamed for clarity
-    contract = load_contract("LoyaltyPoints")
+async def redeem_loyalty_points(customer_address, points, retailer_account_object=None, wait_for_receipt=True, on_signed=None): # Renamed for clarity
+    """
+    Redeems points for a customer.
+    With `wait_for_receipt=False` this returns as soon as the transaction is sent;
+    the receipt tracker then records the decoded PointsRedeemed result once mined.
+    `on_signed` is passed on to the sender, to persist the tx hash before the send.
+    """
+    contract = load_contract("LoyaltyPoints", async_w3)
     if points <= 0:
         return {"success": False, "message": "Points must be positive."}
 
@@ -13,31 +22,50 @@ async def redeem_loyalty_points(customer_address, points, retailer_account_objec
     if balance < points:
         return {"success": False, "message": f"Insufficient points. Balance: {balance}, requested: {points}"}
 
-    # --- FIX START ---
-    # Use the address attribute for getting nonce
-    nonce = w3.eth.get_transaction_count(retailer_account_object.address)
-    tx = contract.functions.redeemPoints(
-        Web3.to_checksum_address(customer_address),
-        points
-    ).build_transaction({
-        "from": retailer_account_object.address, # Corrected: Use .address
-        "gasPrice": w3.eth.gas_price,
-        "nonce": nonce,
-        "chainId": w3.eth.chain_id,
-        "gas": 6000000 # Added a generous gas limit for testing on Ganache
-    })
-
-    # Sign the transaction using the private key from the account object
-    signed_tx = w3.eth.account.sign_transaction(tx, private_key=retailer_account_object.key)
-    
-    # Send the raw, signed transaction
-    tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
-    # --- FIX END ---
-
-    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    # Nonce, signing and sending are handled by the shared sender
+    tx_hash = await send_transaction(
+        contract.functions.redeemPoints(
+            Web3.to_checksum_address(customer_address),
+            points
+        ),
+        retailer_account_object,
+        on_signed=on_signed
+    )
+
+    if not wait_for_receipt:
+        async def on_mined(receipt):
+            balance_cache.apply_local_change(customer_address, -points, receipt)
+            return decode_points_redeemed(contract, receipt)
+
+        receipt_tracker.track(tx_hash, kind="PointsRedeemed", on_mined=on_mined)
+        return {
+            "success": True,
+            "pending": True,
+            "points_redeemed": points,
+            "transaction_hash": tx_hash.hex()
+        }
+
+    receipt = await receipt_tracker.wait(tx_hash)
+    if receipt.status == 1:
+        balance_cache.apply_local_change(customer_address, -points, receipt)
 
     return {
         "success": receipt.status == 1,
         "points_redeemed": points,
         "transaction_hash": tx_hash.hex()
-    }
\ No newline at end of file
+    }
+
+def decode_points_redeemed(contract, receipt):
+    """
+    Returns the PointsRedeemed event of a mined redeem transaction as a plain dict.
+    """
+    events = contract.events.PointsRedeemed().process_receipt(receipt)
+    if not events:
+        raise ValueError("PointsRedeemed event not found in receipt.")
+
+    args = events[0]['args']
+    return {
+        "customer_address": args['redeemer'],
+        "points_redeemed": args['amount'],
+        "transaction_hash": receipt.transactionHash.hex()
+    }
@@ -0,0 +1,101 @@
+import math
+import threading
+
+# Histogram bucket upper bounds (seconds); receipt waits can take minutes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels, extra=None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in items) + "}"
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """
+    A counter, gauge or histogram, with one series per distinct set of labels.
+    """
+
+    def __init__(self, name, help_text, kind, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._series = {}
+        self._lock = threading.Lock()  # sync web3 calls also run in worker threads
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = value
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for labels, value in sorted(self._series.items()):
+                if self.kind != "histogram":
+                    lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                for bound, count in zip(self.buckets, value["buckets"]):
+                    lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', _format_value(bound)))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {value['count']}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def counter(self, name, help_text):
+        return self._register(Metric(name, help_text, "counter"))
+
+    def gauge(self, name, help_text):
+        return self._register(Metric(name, help_text, "gauge"))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self._register(Metric(name, help_text, "histogram", buckets))
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Shared registry served on /metrics
+metrics = MetricsRegistry()
+
+rpc_duration = metrics.histogram("rpc_request_duration_seconds", "JSON-RPC request latency by method.")
+rpc_errors = metrics.counter("rpc_request_errors_total", "JSON-RPC requests that failed or returned an error, by method.")
+http_duration = metrics.histogram("http_request_duration_seconds", "API request latency by route.")
+http_stage_duration = metrics.histogram("http_request_stage_duration_seconds", "Time API requests spent in each stage, by route.")
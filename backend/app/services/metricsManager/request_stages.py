@@ -0,0 +1,83 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from .metrics import http_duration, http_stage_duration
+
+# Requests taking longer than this (seconds) are logged with their stage breakdown
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1"))
+
+# Stage timings of the API request being handled, shared with the tasks it starts
+_current_span = contextvars.ContextVar("request_span", default=None)
+
+class RequestSpan:
+    """
+    Cumulative time one API request spent per stage. Stages timed concurrently
+    (e.g. gathered sends) add up, so the total can exceed the request's duration.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages = {}
+        self.closed = False
+
+    def add(self, stage_name, seconds):
+        # Tasks started during the request (and still running) keep the span in their context
+        if not self.closed:
+            self.stages[stage_name] = self.stages.get(stage_name, 0.0) + seconds
+
+def start_span() -> RequestSpan:
+    span = RequestSpan()
+    _current_span.set(span)
+    return span
+
+def current_span():
+    """
+    The span of the API request being handled, or None outside a request.
+    """
+    return _current_span.get()
+
+@contextmanager
+def use_span(span):
+    """
+    Times stages inside the block into `span`, e.g. work queued by a request and done by a background task.
+    """
+    token = _current_span.set(span)
+    try:
+        yield
+    finally:
+        _current_span.reset(token)
+
+def add_stage_time(stage_name, seconds):
+    span = _current_span.get()
+    if span is not None:
+        span.add(stage_name, seconds)
+
+@contextmanager
+def stage(stage_name):
+    """
+    Times the block as `stage_name` of the current request, if there is one.
+    Works around `await`s too, since it only measures wall time.
+    """
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_stage_time(stage_name, time.perf_counter() - started_at)
+
+def finish_span(span, method, route, status_code):
+    """
+    Records a finished request's duration and stages, logging it if it was slow.
+    """
+    span.closed = True
+    duration = time.perf_counter() - span.started_at
+
+    http_duration.observe(duration, method=method, route=route)
+    for stage_name, seconds in span.stages.items():
+        http_stage_duration.observe(seconds, method=method, route=route, stage=stage_name)
+
+    if duration >= SLOW_REQUEST_SECONDS:
+        breakdown = ", ".join(
+            f"{stage_name}={seconds:.3f}s" for stage_name, seconds in sorted(span.stages.items(), key=lambda item: -item[1])
+        )
+        print(f"🐢 Slow request: {method} {route} -> {status_code} in {duration:.3f}s ({breakdown or 'no stages recorded'})")
@@ -0,0 +1,44 @@
+import time
+from .metrics import rpc_duration, rpc_errors
+from .request_stages import add_stage_time
+
+def record_rpc(method, seconds, failed):
+    """
+    Records one JSON-RPC call, also as an `rpc.<method>` stage of the current API request.
+    """
+    rpc_duration.observe(seconds, method=method)
+    if failed:
+        rpc_errors.inc(method=method)
+    add_stage_time(f"rpc.{method}", seconds)
+
+def rpc_metrics_middleware(make_request, w3):
+    """
+    Web3 middleware timing every request made through a synchronous `Web3`.
+    """
+    def middleware(method, params):
+        started_at = time.perf_counter()
+        failed = True
+        try:
+            response = make_request(method, params)
+            failed = "error" in response
+            return response
+        finally:
+            record_rpc(method, time.perf_counter() - started_at, failed)
+
+    return middleware
+
+async def async_rpc_metrics_middleware(make_request, async_w3):
+    """
+    Web3 middleware timing every request made through an `AsyncWeb3`.
+    """
+    async def middleware(method, params):
+        started_at = time.perf_counter()
+        failed = True
+        try:
+            response = await make_request(method, params)
+            failed = "error" in response
+            return response
+        finally:
+            record_rpc(method, time.perf_counter() - started_at, failed)
+
+    return middleware
@@ -0,0 +1,467 @@
+import asyncio
+import os
+import time
+from web3 import Web3
+from web3.exceptions import ContractLogicError
+from app.services.contractsManager.contract_config import OUTBOX_PATH
+from app.services.chainManager.tx_sender import send_transaction, locate_transaction, send_outcome_unknown
+from app.services.chainManager.receipt_tracker import receipt_tracker
+from app.services.metricsManager.metrics import metrics
+from app.services.metricsManager.request_stages import current_span, use_span
+from .outbox_store import OutboxStore, ACTIVE_STATUSES, DEAD_LETTER_STATUSES
+
+# Intents (or batches) being built, signed and sent at once; waiting for them to be mined doesn't hold a worker
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "8"))
+# Unfinished intents allowed before new ones are refused (backpressure)
+OUTBOX_MAX_PENDING = int(os.getenv("OUTBOX_MAX_PENDING", "10000"))
+# Retry-After (seconds) sent to clients turned away while the queue is full
+OUTBOX_RETRY_AFTER = 5
+# Send attempts before an intent goes to the dead-letter store
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+# First retry delay (seconds), doubled for every further attempt
+OUTBOX_RETRY_DELAY = 2
+# Longest delay (seconds) between attempts to process a mined transaction whose completion failed
+OUTBOX_MAX_RETRY_DELAY = 300
+# Seconds between checks on a transaction that isn't mined yet
+OUTBOX_RECEIPT_TIMEOUT = 300
+# How often idle workers look for intents whose retry delay has passed
+OUTBOX_POLL_INTERVAL = 1
+# Finished intents are deleted after this many seconds
+OUTBOX_RETENTION_SECONDS = float(os.getenv("OUTBOX_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+outbox_intents = metrics.gauge("outbox_intents", "Outbound intents waiting to be sent or mined, by status.")
+outbox_enqueued = metrics.counter("outbox_enqueued_total", "Intents accepted into the outbound queue, by kind.")
+outbox_rejected = metrics.counter("outbox_rejected_total", "Intents refused because the outbound queue was full, by kind.")
+outbox_finished = metrics.counter("outbox_finished_total", "Intents finished, by kind and final status.")
+outbox_queue_wait = metrics.histogram("outbox_queue_wait_seconds", "Time from enqueueing an intent to its first send attempt, by kind.")
+outbox_completion = metrics.histogram("outbox_completion_seconds", "Time from enqueueing an intent to it being mined and processed, by kind.")
+
+class OutboxFull(Exception):
+    pass
+
+class Outbox:
+    """
+    Durable outbound transaction queue.
+
+    The API enqueues intents (record this sale, award these points) and they
+    are committed to SQLite before anything is signed. A fixed number of
+    worker tasks drain the queue, so sales are accepted at whatever rate they
+    arrive and reach the chain at the rate the node sustains. A worker is free
+    again as soon as the node has accepted its transaction; receipts are waited
+    on by separate completion tasks, so sends keep pipelining nonces across the
+    signer pool while earlier ones are being mined. Each intent's tx
+    hash is committed before it is sent; on startup, intents that were in flight
+    are looked up on-chain and finished rather than sent twice. Intents that
+    can't be sent after OUTBOX_MAX_ATTEMPTS go to the dead-letter store; a
+    mined intent whose completion fails stays signed and is processed again.
+    Every commit is fsynced, so store writes run on a worker thread rather
+    than on the event loop.
+    """
+
+    def __init__(self, store, workers=OUTBOX_WORKERS, max_pending=OUTBOX_MAX_PENDING):
+        self.store = store
+        self.workers = workers
+        self.max_pending = max_pending
+        self._handlers = {}
+        self._counts = None  # status -> intents, loaded from the store on first use
+        self._waiters = {}  # intent id -> futures of callers waiting for it
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self._background = set()  # batch sends and completion tasks
+        self._spans = {}  # intent id -> span of the API request that queued it
+        self._slots = None  # bounds intents (or batches) being sent at once to `workers`
+        self._last_prune = 0
+
+    def register(self, kind, build, complete, batch_size=None, batch_window=0):
+        """
+        Sets how intents of `kind` are handled:
+        `await build(payload)` returns the contract function call to send, and
+        `await complete(payload, tx_receipt)` turns its successful receipt into
+        (result, follow_ups), `follow_ups` being (kind, payload) intents to queue
+        in the same commit that finishes this one.
+
+        With `batch_size`, intents of `kind` are sent together instead: queued ones
+        are collected for up to `batch_window` seconds (or until there are
+        `batch_size`) and `build` gets the list of their payloads.
+        """
+        self._handlers[kind] = {"build": build, "complete": complete, "batch_size": batch_size, "batch_window": batch_window}
+
+    def set_batch_size(self, kind, batch_size):
+        self._handlers[kind]["batch_size"] = batch_size
+
+    async def enqueue(self, kind, payload) -> int:
+        if kind not in self._handlers:
+            raise ValueError(f"No outbox handler for {kind} intents.")
+        pending = self.pending_count()
+        if pending >= self.max_pending:
+            outbox_rejected.inc(kind=kind)
+            raise OutboxFull(f"Outbound queue is full ({pending} intents pending), try again shortly.")
+
+        # Counted before the commit so concurrent requests can't overshoot max_pending
+        self._count(None, "queued")
+        try:
+            intent_id = await asyncio.to_thread(self.store.insert, kind, payload)
+        except Exception:
+            self._count("queued", None)
+            raise
+        span = current_span()
+        if span is not None and not span.closed:
+            # Its nonce, gas, signing and send stages are timed into the request that queued it
+            self._spans[intent_id] = span
+        outbox_enqueued.inc(kind=kind)
+        self._wakeup.set()
+        return intent_id
+
+    async def wait(self, intent_id, timeout):
+        """
+        Waits until the intent is done, failed or dead and returns it, or returns
+        it unfinished when `timeout` runs out first.
+        """
+        intent = self.store.get(intent_id)
+        if intent is None or intent["status"] not in ACTIVE_STATUSES:
+            return intent
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(intent_id, []).append(future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return self.store.get(intent_id)
+        finally:
+            waiters = self._waiters.get(intent_id, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self._waiters.pop(intent_id, None)
+
+    def get(self, intent_id):
+        return self.store.get(intent_id)
+
+    def dead_letters(self, limit=100, offset=0):
+        return self.store.list_by_status(DEAD_LETTER_STATUSES, limit, offset)
+
+    async def retry(self, intent_id) -> bool:
+        """
+        Sends a dead intent again. Failed ones may already be on-chain, so they never are.
+        """
+        intent = self.store.get(intent_id)
+        if intent is None or intent["status"] != "dead":
+            return False
+        await asyncio.to_thread(self.store.requeue, intent_id, 0, None, True)
+        self._count("dead", "queued")
+        self._wakeup.set()
+        return True
+
+    def pending_count(self) -> int:
+        counts = self._load_counts()
+        return sum(counts.get(status, 0) for status in ACTIVE_STATUSES)
+
+    def stats(self):
+        counts = self._load_counts()
+        return {
+            **{status: counts.get(status, 0) for status in (*ACTIVE_STATUSES, *DEAD_LETTER_STATUSES)},
+            "pending": self.pending_count(),
+            "max_pending": self.max_pending,
+            "workers": self.workers if self._tasks else 0,
+        }
+
+    async def start(self):
+        """
+        Replays whatever the last run left unfinished, then starts the workers.
+        """
+        if self._tasks:
+            return
+
+        self._wakeup = asyncio.Event()
+        requeued = await asyncio.to_thread(self.store.requeue_interrupted)
+        self._counts = None
+        in_flight = await asyncio.to_thread(self.store.list_by_status, ("signed",), -1)
+        print(f"📮 Outbox: {self.pending_count() - len(in_flight)} intent(s) queued ({requeued} interrupted), "
+              f"{len(in_flight)} sent before the restart, {self.workers} workers.")
+
+        self._slots = asyncio.Semaphore(self.workers)
+        # Intents batched into one transaction share its hash and are resumed together
+        by_hash = {}
+        for intent in in_flight:
+            by_hash.setdefault(intent["tx_hash"], []).append(intent)
+        for intents in by_hash.values():
+            self._in_background(self._resume(intents))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks += [
+            asyncio.create_task(self._batch_worker(kind))
+            for kind, handler in self._handlers.items() if handler["batch_size"] is not None
+        ]
+
+    async def stop(self):
+        # Anything interrupted here is picked up again by the next start()
+        tasks = self._tasks + list(self._background)
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._tasks = []
+        self._spans.clear()
+
+    async def _worker(self):
+        while True:
+            try:
+                batched_kinds = [kind for kind, handler in self._handlers.items() if handler["batch_size"] is not None]
+                intent = await asyncio.to_thread(self.store.claim, batched_kinds)
+                if intent is None:
+                    await self._prune()
+                    await self._idle()
+                    continue
+
+                self._claimed([intent])
+                async with self._slots:
+                    await self._process([intent])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Outbox worker error: {e}")
+                await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+
+    async def _batch_worker(self, kind):
+        """
+        Collects queued intents of a batched kind into batches and sends each in
+        the background, so a batch waiting to be mined doesn't hold up the next.
+        """
+        while True:
+            try:
+                handler = self._handlers[kind]
+                intents = await asyncio.to_thread(self.store.claim_batch, kind, handler["batch_size"])
+                if not intents:
+                    await self._idle()
+                    continue
+
+                # Let intents arriving right behind these join the batch
+                linger = intents[0]["created_at"] + handler["batch_window"] - time.time()
+                if len(intents) < handler["batch_size"] and linger > 0:
+                    await asyncio.sleep(linger)
+                    intents += await asyncio.to_thread(self.store.claim_batch, kind, handler["batch_size"] - len(intents))
+
+                self._claimed(intents)
+                await self._slots.acquire()
+                self._in_background(self._process_batch(intents))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Outbox batch worker error: {e}")
+                await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+
+    async def _process_batch(self, intents):
+        try:
+            await self._process(intents)
+        except Exception as e:
+            print(f"⚠️  Outbox batch error: {e}")
+        finally:
+            self._slots.release()
+
+    def _in_background(self, coroutine):
+        task = asyncio.create_task(self._guarded(coroutine))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    @staticmethod
+    async def _guarded(coroutine):
+        try:
+            await coroutine
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️  Outbox task error: {e}")
+
+    async def _idle(self):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), OUTBOX_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+    def _claimed(self, intents):
+        for intent in intents:
+            self._count("queued", "sending")
+            intent["status"] = "sending"
+            if intent["attempts"] == 1:
+                outbox_queue_wait.observe(time.time() - intent["created_at"], kind=intent["kind"])
+
+    async def _process(self, intents):
+        """
+        Sends one transaction for `intents`: a single intent, or a batch of one batched kind.
+        Returns once the node has it; a completion task finishes the intents when it's mined.
+        """
+        handler = self._handlers.get(intents[0]["kind"])
+        span = next((self._spans[intent["id"]] for intent in intents if intent["id"] in self._spans), None)
+
+        async def on_signed(tx, tx_hash):
+            # Committed before the send: after a crash the intents are looked up on-chain, not re-sent
+            await asyncio.to_thread(
+                self.store.mark_signed, [intent["id"] for intent in intents], Web3.to_hex(tx_hash), tx["from"], tx["nonce"]
+            )
+            for intent in intents:
+                if intent["status"] != "signed":
+                    self._count(intent["status"], "signed")
+                intent.update(status="signed", tx_hash=Web3.to_hex(tx_hash), sender=tx["from"], nonce=tx["nonce"])
+
+        try:
+            if handler is None:
+                raise ValueError(f"No outbox handler for {intents[0]['kind']} intents.")
+            with use_span(span):
+                if handler["batch_size"] is None:
+                    contract_function = await handler["build"](intents[0]["payload"])
+                else:
+                    contract_function = await handler["build"]([intent["payload"] for intent in intents])
+                tx_hash = await send_transaction(contract_function, on_signed=on_signed)
+        except ContractLogicError as e:
+            if len(intents) > 1:
+                # One bad entry reverts the whole batch; send them one by one to find it
+                for intent in intents:
+                    await self._process([intent])
+                return
+            # Reverted while estimating gas, so nothing was sent and sending again won't help
+            await self._finish(intents[0], "dead", f"Rejected by the contract: {e}")
+            return
+        except Exception as e:
+            if intents[0]["status"] == "signed" and send_outcome_unknown(e):
+                # The send got no answer, so it may or may not have reached the node
+                with use_span(span):
+                    self._in_background(self._resume(intents))
+            else:
+                # Never sent, or rejected by the node: requeueing clears the signed hash and nonce
+                for intent in intents:
+                    await self._retry(intent, str(e))
+            return
+
+        with use_span(span):
+            self._in_background(self._complete(intents, tx_hash))
+
+    async def _resume(self, intents):
+        """
+        Finishes intents whose (shared) transaction was signed, whatever became of it.
+        """
+        tx_hash, sender, nonce = intents[0]["tx_hash"], intents[0]["sender"], intents[0]["nonce"]
+        state, _ = await locate_transaction(tx_hash, sender, nonce)
+        if state in ("mined", "pending"):
+            await self._complete(intents, tx_hash)
+        elif state == "dropped":
+            for intent in intents:
+                await self._retry(intent, f"Transaction {tx_hash} never reached the chain.")
+        else:
+            for intent in intents:
+                await self._finish(intent, "failed", (
+                    f"Transaction {tx_hash} is unknown but nonce {nonce} of {sender} was used; check it by hand."
+                ))
+
+    async def _complete(self, intents, tx_hash):
+        while True:
+            try:
+                tx_receipt = await receipt_tracker.wait(tx_hash, timeout=OUTBOX_RECEIPT_TIMEOUT)
+                break
+            except asyncio.TimeoutError:
+                # Stuck ones are re-priced by the signer pool; only a dropped one needs sending again
+                state, _ = await locate_transaction(tx_hash, intents[0]["sender"], intents[0]["nonce"])
+                if state == "dropped":
+                    for intent in intents:
+                        await self._retry(intent, f"Transaction {Web3.to_hex(tx_hash)} was dropped.")
+                    return
+
+        if tx_receipt.status != 1:
+            for intent in intents:
+                await self._finish(intent, "failed", "Blockchain transaction failed.")
+            return
+
+        # The transaction is on-chain, so the intents must not fail now: one whose
+        # completion raises (e.g. the node dropped the connection while it was being
+        # decoded) stays signed and is processed again, here or after a restart
+        delay = OUTBOX_RETRY_DELAY
+        while True:
+            intents = await self._process_receipt(intents, tx_receipt)
+            if not intents:
+                return
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, OUTBOX_MAX_RETRY_DELAY)
+
+    async def _process_receipt(self, intents, tx_receipt):
+        """
+        Finishes the intents of a successful receipt and queues their follow-ups;
+        returns the ones whose completion failed.
+        """
+        finished = []
+        unprocessed = []
+        for intent in intents:
+            try:
+                result, follow_ups = await self._handlers[intent["kind"]]["complete"](intent["payload"], tx_receipt)
+                finished.append((intent, result, follow_ups))
+            except Exception as e:
+                error = f"Mined in {Web3.to_hex(tx_receipt.transactionHash)} but could not be processed yet: {e}"
+                print(f"⚠️  Outbox intent {intent['id']} ({intent['kind']}): {error}")
+                await asyncio.to_thread(self.store.set_error, intent["id"], error)
+                unprocessed.append(intent)
+
+        if finished:
+            await asyncio.to_thread(self.store.mark_done, [(intent["id"], result, follow_ups) for intent, result, follow_ups in finished])
+        for intent, _, follow_ups in finished:
+            for _ in follow_ups:
+                self._count(None, "queued")
+            if follow_ups:
+                self._wakeup.set()
+            await self._finish(intent, "done")
+        return unprocessed
+
+    async def _retry(self, intent, error):
+        if intent["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+            await self._finish(intent, "dead", error)
+            return
+        delay = OUTBOX_RETRY_DELAY * 2 ** (intent["attempts"] - 1)
+        print(f"⚠️  Outbox intent {intent['id']} ({intent['kind']}) failed, retrying in {delay}s: {error}")
+        await asyncio.to_thread(self.store.requeue, intent["id"], delay, error)
+        self._count(intent["status"], "queued")
+        intent["status"] = "queued"
+
+    async def _finish(self, intent, status, error=None):
+        self._spans.pop(intent["id"], None)
+        if status != "done":
+            await asyncio.to_thread(self.store.mark_failed, intent["id"], status, error)
+            print(f"❌ Outbox intent {intent['id']} ({intent['kind']}) is {status}: {error}")
+        else:
+            outbox_completion.observe(time.time() - intent["created_at"], kind=intent["kind"])
+        self._count(intent["status"], status)
+        intent["status"] = status
+        outbox_finished.inc(kind=intent["kind"], status=status)
+
+        waiters = self._waiters.pop(intent["id"], [])
+        if waiters:
+            finished = self.store.get(intent["id"])
+            for future in waiters:
+                if not future.done():
+                    future.set_result(finished)
+
+    def _load_counts(self):
+        if self._counts is None:
+            self._counts = self.store.counts()
+            for status in ACTIVE_STATUSES:
+                outbox_intents.set(self._counts.get(status, 0), status=status)
+        return self._counts
+
+    def _count(self, from_status, to_status):
+        counts = self._load_counts()
+        for status, change in ((from_status, -1), (to_status, 1)):
+            if status is not None:
+                counts[status] = counts.get(status, 0) + change
+                if status in ACTIVE_STATUSES:
+                    outbox_intents.set(counts[status], status=status)
+
+    async def _prune(self):
+        if time.time() - self._last_prune < 3600:
+            return
+        self._last_prune = time.time()
+        pruned = await asyncio.to_thread(self.store.prune_done, time.time() - OUTBOX_RETENTION_SECONDS)
+        if pruned:
+            self._counts = None
+            print(f"🧹 Pruned {pruned} finished outbox intent(s).")
+
+# Shared queue for sales and loyalty awards
+outbox = Outbox(OutboxStore(OUTBOX_PATH))
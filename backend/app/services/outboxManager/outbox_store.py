@@ -0,0 +1,183 @@
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    tx_hash TEXT,
+    sender TEXT,
+    nonce INTEGER,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox (status, next_attempt_at, id);
+"""
+
+# Intents still to be sent or mined
+ACTIVE_STATUSES = ("queued", "sending", "signed")
+# The dead-letter store: "dead" never reached the chain (and may be retried),
+# "failed" reverted on-chain or has an outcome that needs checking by hand
+DEAD_LETTER_STATUSES = ("dead", "failed")
+
+class OutboxStore:
+    """
+    SQLite write-ahead log of outbound transactions. Each intent (a sale, an
+    award) is committed before anything is signed, and its tx hash before it
+    is sent, so nothing in flight is lost if the process dies.
+
+    queued -> sending -> signed -> done, with failures going back to queued
+    (retry), to dead (gave up before reaching the chain) or to failed.
+    Methods block until the commit is on disk; the Outbox calls them from a thread.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # Every commit reaches the disk: an accepted sale must survive a power cut too
+            self._conn.execute("PRAGMA synchronous=FULL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def insert(self, kind, payload) -> int:
+        now = time.time()
+        with self._lock, self.connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO outbox (kind, payload, status, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?)",
+                (kind, json.dumps(payload), now, now)
+            )
+            return cursor.lastrowid
+
+    def claim(self, exclude_kinds=()):
+        """
+        Moves the oldest due queued intent to "sending" and returns it, or None.
+        """
+        placeholders = ", ".join("?" for _ in exclude_kinds)
+        now = time.time()
+        with self._lock, self.connect() as conn:
+            row = conn.execute(
+                "UPDATE outbox SET status = 'sending', attempts = attempts + 1, updated_at = ? "
+                "WHERE id = (SELECT id FROM outbox WHERE status = 'queued' AND next_attempt_at <= ? "
+                f"AND kind NOT IN ({placeholders}) ORDER BY id LIMIT 1) "
+                "RETURNING *",
+                (now, now, *exclude_kinds)
+            ).fetchone()
+        return self._to_intent(row) if row else None
+
+    def claim_batch(self, kind, limit):
+        """
+        Moves up to `limit` of the oldest due queued intents of `kind` to "sending" and returns them.
+        """
+        now = time.time()
+        with self._lock, self.connect() as conn:
+            rows = conn.execute(
+                "UPDATE outbox SET status = 'sending', attempts = attempts + 1, updated_at = ? "
+                "WHERE id IN (SELECT id FROM outbox WHERE status = 'queued' AND kind = ? AND next_attempt_at <= ? "
+                "ORDER BY id LIMIT ?) "
+                "RETURNING *",
+                (now, kind, now, limit)
+            ).fetchall()
+        return sorted((self._to_intent(row) for row in rows), key=lambda intent: intent["id"])
+
+    def mark_signed(self, intent_ids, tx_hash, sender, nonce):
+        """
+        Records the transaction carrying the intents (several when they were batched).
+        """
+        now = time.time()
+        with self._lock, self.connect() as conn:
+            conn.executemany(
+                "UPDATE outbox SET status = 'signed', tx_hash = ?, sender = ?, nonce = ?, updated_at = ? WHERE id = ?",
+                [(tx_hash, sender, nonce, now, intent_id) for intent_id in intent_ids]
+            )
+
+    def mark_done(self, finished):
+        """
+        Finishes intents, given as (intent_id, result, follow_ups), and queues
+        their follow-up intents in the same commit, so a crash can neither lose
+        nor duplicate them.
+        """
+        now = time.time()
+        with self._lock, self.connect() as conn:
+            conn.executemany(
+                "UPDATE outbox SET status = 'done', result = ?, error = NULL, updated_at = ? WHERE id = ?",
+                [(json.dumps(result), now, intent_id) for intent_id, result, _ in finished]
+            )
+            conn.executemany(
+                "INSERT INTO outbox (kind, payload, status, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?)",
+                [(kind, json.dumps(payload), now, now) for _, _, follow_ups in finished for kind, payload in follow_ups]
+            )
+
+    def mark_failed(self, intent_id, status, error):
+        self._update(intent_id, status=status, error=error)
+
+    def set_error(self, intent_id, error):
+        """
+        Notes why an intent is being retried, without changing its status.
+        """
+        self._update(intent_id, error=error)
+
+    def requeue(self, intent_id, delay=0, error=None, reset_attempts=False):
+        fields = {"status": "queued", "next_attempt_at": time.time() + delay, "error": error,
+                  "tx_hash": None, "sender": None, "nonce": None}
+        if reset_attempts:
+            fields["attempts"] = 0
+        self._update(intent_id, **fields)
+
+    def requeue_interrupted(self) -> int:
+        """
+        Intents claimed but never signed when the process stopped are safe to send again.
+        """
+        with self._lock, self.connect() as conn:
+            return conn.execute(
+                "UPDATE outbox SET status = 'queued', updated_at = ? WHERE status = 'sending'", (time.time(),)
+            ).rowcount
+
+    def get(self, intent_id):
+        row = self.connect().execute("SELECT * FROM outbox WHERE id = ?", (intent_id,)).fetchone()
+        return self._to_intent(row) if row else None
+
+    def list_by_status(self, statuses, limit=100, offset=0):
+        placeholders = ", ".join("?" for _ in statuses)
+        rows = self.connect().execute(
+            f"SELECT * FROM outbox WHERE status IN ({placeholders}) ORDER BY id LIMIT ? OFFSET ?",
+            (*statuses, limit, offset)
+        ).fetchall()
+        return [self._to_intent(row) for row in rows]
+
+    def counts(self):
+        rows = self.connect().execute("SELECT status, COUNT(*) AS n FROM outbox GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def prune_done(self, older_than):
+        with self._lock, self.connect() as conn:
+            return conn.execute(
+                "DELETE FROM outbox WHERE status = 'done' AND updated_at < ?", (older_than,)
+            ).rowcount
+
+    def _update(self, intent_id, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self.connect() as conn:
+            conn.execute(f"UPDATE outbox SET {assignments} WHERE id = ?", (*fields.values(), intent_id))
+
+    @staticmethod
+    def _to_intent(row):
+        intent = dict(row)
+        intent["payload"] = json.loads(intent["payload"])
+        intent["result"] = json.loads(intent["result"]) if intent["result"] else None
+        return intent
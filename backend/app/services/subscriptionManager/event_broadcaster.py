@@ -0,0 +1,245 @@
+import asyncio
+import os
+from collections import deque
+from web3 import Web3
+from app.services.contractsManager.event_utils import EventDecoder
+from app.services.chainManager.log_follower import log_follower
+from app.services.metricsManager.metrics import metrics
+
+# Events pushed to subscribers
+EVENT_TYPES = ("TransactionRecorded", "PointsAwarded", "PointsRedeemed")
+# Open subscriptions allowed at once
+MAX_EVENT_SUBSCRIBERS = int(os.getenv("MAX_EVENT_SUBSCRIBERS", "1000"))
+# Undelivered events a subscriber may fall behind by before it is dropped
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("SUBSCRIBER_QUEUE_SIZE", "1000"))
+# Recent events kept so a client subscribing just after sending (or reconnecting) doesn't miss any
+EVENT_REPLAY_BUFFER = int(os.getenv("EVENT_REPLAY_BUFFER", "5000"))
+
+# Reason given to subscribers closed because their queue overflowed
+SLOW_SUBSCRIBER = "too slow, events were dropped"
+# Log index in a reorg message's id, above any real one so the id sorts just before the replaced block
+REORG_LOG_INDEX = 2**63 - 1
+
+event_subscribers = metrics.gauge("event_subscribers", "Open event stream subscriptions.")
+events_published = metrics.counter("events_published_total", "Contract events pushed to event stream subscribers, by event.")
+
+class TooManySubscribers(Exception):
+    pass
+
+class Subscription:
+    """
+    One client's filtered view of the event stream. Events matching any of its
+    addresses or tx hashes (or every event, without filters) are queued until
+    the client reads them.
+    """
+
+    def __init__(self, addresses=(), tx_hashes=(), events=None, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.addresses = {Web3.to_checksum_address(address) for address in addresses}
+        self.tx_hashes = {tx_hash.lower() for tx_hash in tx_hashes}
+        self.events = set(events) if events else set(EVENT_TYPES)
+        self.queue_size = queue_size
+        self.closed = None  # reason, once the subscription has ended
+        self._messages = deque()
+        self._ready = asyncio.Event()
+
+    def matches(self, event):
+        if event["event"] not in self.events:
+            return False
+        if not self.addresses and not self.tx_hashes:
+            return True
+        return event["transaction_hash"] in self.tx_hashes or not self.addresses.isdisjoint(event_addresses(event))
+
+    def push(self, message):
+        """
+        Queues a message; returns False if the subscriber has fallen too far behind.
+        """
+        if len(self._messages) >= self.queue_size:
+            return False
+        self._messages.append(message)
+        self._ready.set()
+        return True
+
+    def close(self, reason):
+        self.closed = reason
+        self._ready.set()
+
+    async def get(self, timeout):
+        """
+        Next message, or None if none arrived within `timeout` or the subscription is closed.
+        """
+        if not self._messages and self.closed is None:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self._messages.popleft() if self._messages else None
+
+class EventBroadcaster:
+    """
+    Fans TransactionRecorded, PointsAwarded and PointsRedeemed logs out to
+    event stream subscribers. Every subscriber is fed from the shared log
+    follower, so the number of open streams doesn't change how often the node
+    is queried. Subscribers are indexed by address and tx hash, so each event
+    only visits the subscribers it concerns.
+
+    Events are pushed as soon as their block is seen; a reorg is announced
+    with the first replaced block, after which the events of the new chain
+    follow. Event ids ("block-logIndex") order events across restarts, so a
+    client can resume from the last id it saw. A reorg message's id sorts just
+    before the first replaced block, so resuming after it replays the new chain.
+    """
+
+    def __init__(
+        self, follower, max_subscribers=MAX_EVENT_SUBSCRIBERS, replay_buffer=EVENT_REPLAY_BUFFER,
+        queue_size=SUBSCRIBER_QUEUE_SIZE
+    ):
+        self.follower = follower
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.decoder = None
+        self._recent = deque(maxlen=replay_buffer)
+        self._unfiltered = set()
+        self._by_address = {}
+        self._by_tx_hash = {}
+        self._subscriptions = set()
+
+    async def start(self, retail_contract, loyalty_contract):
+        """
+        Subscribes to the contracts' logs; call after the log follower has started.
+        """
+        self.decoder = EventDecoder([retail_contract, loyalty_contract])
+        self.follower.watch(retail_contract.address, loyalty_contract.address)
+        self.follower.subscribe(self._on_logs, self._on_reorg)
+
+    async def stop(self):
+        self.follower.unsubscribe(self._on_logs)
+        self.decoder = None
+        for subscription in list(self._subscriptions):
+            self.unsubscribe(subscription, "shutdown")
+
+    def subscribe(self, addresses=(), tx_hashes=(), events=None, after=None):
+        """
+        Opens a subscription. Recent events after the event id `after`, and recent
+        events of the given tx hashes, are queued on it straight away.
+        """
+        if len(self._subscriptions) >= self.max_subscribers:
+            raise TooManySubscribers(f"The event stream already has {self.max_subscribers} subscribers.")
+
+        subscription = Subscription(addresses, tx_hashes, events, self.queue_size)
+        after = parse_event_id(after) if after else None
+        for event in self._recent:
+            replay = after is not None and event_position(event) > after
+            replay = replay or (event["transaction_hash"] in subscription.tx_hashes and after is None)
+            if replay and subscription.matches(event) and not subscription.push(event):
+                # More to replay than the subscriber can hold: it reconnects after the last id it received
+                subscription.close(SLOW_SUBSCRIBER)
+                return subscription
+
+        self._subscriptions.add(subscription)
+        if not subscription.addresses and not subscription.tx_hashes:
+            self._unfiltered.add(subscription)
+        for address in subscription.addresses:
+            self._by_address.setdefault(address, set()).add(subscription)
+        for tx_hash in subscription.tx_hashes:
+            self._by_tx_hash.setdefault(tx_hash, set()).add(subscription)
+        event_subscribers.set(len(self._subscriptions))
+        return subscription
+
+    def unsubscribe(self, subscription, reason="unsubscribed"):
+        if subscription not in self._subscriptions:
+            return
+        self._subscriptions.discard(subscription)
+        self._unfiltered.discard(subscription)
+        for index, keys in ((self._by_address, subscription.addresses), (self._by_tx_hash, subscription.tx_hashes)):
+            for key in keys:
+                subscribers = index.get(key)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del index[key]
+        subscription.close(reason)
+        event_subscribers.set(len(self._subscriptions))
+
+    def publish(self, event):
+        self._recent.append(event)
+        subscribers = set(self._unfiltered)
+        subscribers.update(self._by_tx_hash.get(event["transaction_hash"], ()))
+        for address in event_addresses(event):
+            subscribers.update(self._by_address.get(address, ()))
+
+        for subscription in subscribers:
+            if not subscription.matches(event):
+                continue
+            if not subscription.push(event):
+                # A stalled client must not hold events back from the others
+                self.unsubscribe(subscription, SLOW_SUBSCRIBER)
+        events_published.inc(event=event["event"])
+
+    async def _on_logs(self, logs, from_block, to_block):
+        if self.decoder is None:
+            return
+        for log in logs:
+            decoded = self.decoder.decode(log)
+            if decoded is not None and decoded["event"] in EVENT_TYPES:
+                self.publish(to_event(decoded))
+
+    async def _on_reorg(self, block_number):
+        while self._recent and self._recent[-1]["block_number"] >= block_number:
+            self._recent.pop()
+        for subscription in list(self._subscriptions):
+            if not subscription.push(reorg_message(block_number)):
+                self.unsubscribe(subscription, SLOW_SUBSCRIBER)
+
+def reorg_message(block_number):
+    return {"id": f"{max(block_number - 1, 0)}-{REORG_LOG_INDEX}", "event": "reorg", "from_block": block_number}
+
+def to_event(decoded):
+    """
+    Plain dict of a decoded TransactionRecorded, PointsAwarded or PointsRedeemed log.
+    """
+    args = decoded["args"]
+    event = {
+        "id": f"{decoded['blockNumber']}-{decoded['logIndex']}",
+        "event": decoded["event"],
+        "transaction_hash": Web3.to_hex(decoded["transactionHash"]),
+        "block_number": decoded["blockNumber"],
+        "log_index": decoded["logIndex"],
+    }
+    if decoded["event"] == "TransactionRecorded":
+        event.update({
+            "transaction_id": args["transactionId"],
+            "customer_address": args["customer"],
+            "retailer_address": args["retailer"],
+            "amount_wei": str(args["amountInWei"]),
+            "product_id": args["productId"],
+            "quantity": args["quantity"],
+            "timestamp": args["timestamp"],
+        })
+    else:
+        event.update({
+            "address": args["recipient"] if decoded["event"] == "PointsAwarded" else args["redeemer"],
+            "amount": str(args["amount"]),
+        })
+    return event
+
+def event_addresses(event):
+    if event["event"] == "TransactionRecorded":
+        return (event["customer_address"], event["retailer_address"])
+    return (event["address"],)
+
+def event_position(event):
+    return (event["block_number"], event["log_index"])
+
+def parse_event_id(event_id):
+    """
+    (block number, log index) of an event id such as "1204-3".
+    """
+    try:
+        block_number, log_index = event_id.split("-")
+        return int(block_number), int(log_index)
+    except ValueError:
+        raise ValueError(f"Invalid event id: {event_id}")
+
+# Shared broadcaster behind the event stream endpoint
+event_broadcaster = EventBroadcaster(log_follower)
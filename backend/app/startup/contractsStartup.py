@@ -1,48 +1,60 @@
+import asyncio
 from app.services.contractsManager.contract_utils import (
-    w3, load_contract, compile_contract, deploy_contract, PRIVATE_KEY
+    load_contract, compile_contract, deploy_contract, compile_deployments, deploy_contracts, PRIVATE_KEY
 )
+from app.services.contractsManager.contract_config import async_w3, WEB3_PROVIDER
+from app.services.outboxManager.outbox import outbox
+from app.services.loyaltyManager.points_awarder import configure_award_batching
+from app.transactionManager.transaction_matcher import configure_reference_anchoring
 from eth_account import Account
 
 # Global contract and deployer variables
+# Contracts are bound to `async_w3` so the API routes can await every node call.
 retail_transaction_contract = None
 loyalty_points_contract = None
+checkout_router_contract = None # Optional; sales fall back to separate record/award transactions without it
 deployer_account = None
 
+# Last reason startup couldn't complete, reported by the readiness endpoint
+startup_error = None
+
+# Backoff between startup attempts while the node is unreachable (seconds)
+INIT_RETRY_DELAY = 1
+INIT_MAX_RETRY_DELAY = 30
+
 async def init_contracts():
     """
     Initializes contract instances on app startup.
     Attempts to load deployed contract ABIs and addresses.
     If not found, compiles and deploys the contracts, then loads them.
     """
-    global retail_transaction_contract, loyalty_points_contract, deployer_account
+    global retail_transaction_contract, loyalty_points_contract, checkout_router_contract, deployer_account
 
     print("🚀 Application starting up...")
 
-    if not w3.is_connected():
-        raise Exception("❌ Cannot connect to Ethereum node.")
+    if not await async_w3.is_connected():
+        raise Exception(f"❌ Cannot connect to Ethereum node at {WEB3_PROVIDER}.")
 
     deployer_account = Account.from_key(PRIVATE_KEY)
     print(f"🧾 Using deployer account: {deployer_account.address}")
 
     try:
         # Try loading existing deployed contracts
-        retail_transaction_contract = load_contract("RetailTransaction")
-        loyalty_points_contract = load_contract("LoyaltyPoints")
+        retail_transaction_contract = load_contract("RetailTransaction", async_w3)
+        loyalty_points_contract = load_contract("LoyaltyPoints", async_w3)
         print("✅ Existing contracts loaded successfully.")
 
     except (FileNotFoundError, ValueError) as e:
         print(f"⚠️  Contracts not found or deployed: {e}\nAttempting to compile and deploy new contracts...")
 
         try:
-            # Compile and deploy RetailTransaction
-            retail_abi, retail_bytecode = compile_contract("RetailTransaction", "RetailTransaction.sol")
-            deploy_contract(retail_abi, retail_bytecode, deployer_account)
-            retail_transaction_contract = load_contract("RetailTransaction")
+            # Compile everything, then send all deployments back-to-back and wait for them together.
+            # Deployment is synchronous web3 code, so it runs off the event loop.
+            deployments = await asyncio.to_thread(compile_deployments)
+            await asyncio.to_thread(deploy_contracts, deployments, deployer_account)
 
-            # Compile and deploy LoyaltyPoints
-            loyalty_abi, loyalty_bytecode = compile_contract("LoyaltyPoints", "LoyaltyPoints.sol")
-            deploy_contract(loyalty_abi, loyalty_bytecode, deployer_account)
-            loyalty_points_contract = load_contract("LoyaltyPoints")
+            retail_transaction_contract = load_contract("RetailTransaction", async_w3)
+            loyalty_points_contract = load_contract("LoyaltyPoints", async_w3)
 
             print("✅ Contracts compiled, deployed and loaded successfully.")
 
@@ -52,4 +64,60 @@ async def init_contracts():
     if not retail_transaction_contract or not loyalty_points_contract:
         raise Exception("❌ Contracts could not be loaded or deployed during startup.")
 
+    checkout_router_contract = await load_checkout_router()
+
+    await configure_award_batching(loyalty_points_contract)
+    await configure_reference_anchoring(retail_transaction_contract, checkout_router_contract)
+
+    # Replay sales and awards left unfinished by the last run, then start draining the queue
+    await outbox.start()
+
     print("✅ Application startup complete. Contracts are ready.")
+
+async def init_contracts_with_retry():
+    """
+    Runs `init_contracts` until it succeeds, backing off while the node is
+    down, so the API process stays up instead of crash-looping.
+    """
+    global startup_error
+
+    delay = INIT_RETRY_DELAY
+    while True:
+        try:
+            await init_contracts()
+            startup_error = None
+            return
+        except Exception as e:
+            startup_error = str(e)
+            print(f"⚠️  Startup failed, retrying in {delay}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, INIT_MAX_RETRY_DELAY)
+
+async def load_checkout_router():
+    """
+    Loads the CheckoutRouter, deploying it when it's missing or still wired to
+    contracts from an earlier deployment. Returns None if that fails.
+    """
+    try:
+        router = load_contract("CheckoutRouter", async_w3)
+        if (
+            await router.functions.retailTransaction().call() == retail_transaction_contract.address
+            and await router.functions.loyaltyPoints().call() == loyalty_points_contract.address
+        ):
+            print("✅ Checkout router loaded successfully.")
+            return router
+        print("⚠️  Checkout router points at other contracts, redeploying it...")
+    except Exception as e:
+        print(f"⚠️  Checkout router not found or deployed: {e}\nAttempting to compile and deploy it...")
+
+    try:
+        router_abi, router_bytecode = await asyncio.to_thread(compile_contract, "CheckoutRouter", "CheckoutRouter.sol")
+        await asyncio.to_thread(
+            deploy_contract, router_abi, router_bytecode, deployer_account, "CheckoutRouter",
+            (retail_transaction_contract.address, loyalty_points_contract.address)
+        )
+        print("✅ Checkout router compiled, deployed and loaded successfully.")
+        return load_contract("CheckoutRouter", async_w3)
+    except Exception as e:
+        print(f"⚠️  Could not deploy checkout router, sales will use separate record/award transactions: {e}")
+        return None
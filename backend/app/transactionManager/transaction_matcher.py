@@ -1,43 +1,202 @@
 # backend/app/transactionManager/transaction_matcher.py
+import argparse
+import asyncio
+import json
+import os
+import time
+from web3 import Web3
+from app.services.contractsManager.contract_config import async_w3
+from app.services.contractsManager.load_utils import load_contract, supports_function
+from app.services.contractsManager.event_utils import EventDecoder
+from app.services.indexManager.event_indexer import event_indexer, LOG_CHUNK_SIZE, INDEXER_START_BLOCK
+from app.services.outboxManager.outbox import outbox
 
-def match_transaction_id(off_chain_id: str) -> int:
+# Off-chain references a sale can carry, named after their RecordTransactionRequest fields
+REFERENCE_TYPES = ("payment_ref", "receipt_number")
+# ABI type of RetailTransaction.ReferencedSaleInput
+REFERENCED_SALE_TYPE = "(address,address,uint256,string,uint256,string,string,string)"
+# Seconds after which a request's claim that never got handed to an outbox intent is taken over
+REFERENCE_CLAIM_TIMEOUT = float(os.getenv("REFERENCE_CLAIM_TIMEOUT", "600"))
+
+# Whether the deployed RetailTransaction / CheckoutRouter take a sale's references
+# in the call recording it (recordReferencedTransactions / recordAndAwardReferenced); set at startup
+anchoring_supported = False
+checkout_anchoring_supported = False
+
+def sale_references(sale):
+    """
+    The (reference_type, external_ref) pairs a sale carries; `sale` is a request model or its dict.
+    """
+    if not isinstance(sale, dict):
+        sale = sale.model_dump()
+    return [(reference_type, sale[reference_type]) for reference_type in REFERENCE_TYPES if sale.get(reference_type)]
+
+def match_transaction_id(off_chain_id: str, reference_type=None) -> int:
+    """
+    Matches an off-chain reference (payment gateway ref, POS receipt number)
+    to the on-chain transaction ID recorded for it. Without `reference_type`,
+    every reference type is tried in turn.
+    """
+    reference_types = [reference_type] if reference_type else REFERENCE_TYPES
+    matches = match_references((reference_type, off_chain_id) for reference_type in reference_types)
+    for reference_type in reference_types:
+        match = matches.get((reference_type, off_chain_id))
+        if match is not None:
+            return match["transaction_id"]
+    raise ValueError(f"No transaction recorded for off-chain ID: {off_chain_id}")
+
+def match_references(references):
+    """
+    Bulk lookup of (reference_type, external_ref) pairs. Returns the matches,
+    keyed by pair, with the on-chain transaction ID, tx hash and block.
+    """
+    return event_indexer.store.get_references(references)
+
+class ReferenceClaimed(Exception):
+    """
+    A reference is already recorded, or claimed by a sale still on its way.
+    """
+
+    def __init__(self, conflict):
+        self.conflict = conflict
+        if conflict["transaction_id"] is not None:
+            message = f"{conflict['reference_type']} {conflict['external_ref']} is already recorded as transaction {conflict['transaction_id']}."
+        else:
+            message = f"{conflict['reference_type']} {conflict['external_ref']} belongs to a sale that is still being recorded."
+        super().__init__(message)
+
+def claim_references(references, owner):
+    """
+    Reserves a sale's references for `owner` (e.g. "intent:12") before it is
+    sent, so two sales can't both be recorded under one reference. Claims left
+    by sales that never made it to the chain are taken over. Raises
+    ReferenceClaimed otherwise.
+    """
+    references = list(references)
+    if not references:
+        return
+    conflict = event_indexer.store.claim_references(references, owner)
+    if conflict is not None and conflict["transaction_id"] is None and _claim_abandoned(conflict):
+        event_indexer.store.release_references(conflict["claimed_by"])
+        conflict = event_indexer.store.claim_references(references, owner)
+    if conflict is not None:
+        raise ReferenceClaimed(conflict)
+
+def _claim_abandoned(conflict):
+    holder, _, key = conflict["claimed_by"].partition(":")
+    if holder == "intent":
+        intent = outbox.get(int(key))
+        return intent is None or intent["status"] == "dead"
+    if holder == "request":
+        return time.time() - conflict["claimed_at"] > REFERENCE_CLAIM_TIMEOUT
+    # Other holders (the bulk ingest) release their claims themselves
+    return False
+
+def transfer_references(owner, new_owner):
+    event_indexer.store.transfer_references(owner, new_owner)
+
+def release_references(owner):
+    event_indexer.store.release_references(owner)
+
+def referenced_sale(sale, amount_in_wei):
+    """
+    ReferencedSaleInput tuple of a sale (a request model or its dict), with
+    empty strings for the references it doesn't carry.
     """
-    Placeholder function to match an off-chain transaction ID
-    to an on-chain transaction ID.
+    if not isinstance(sale, dict):
+        sale = sale.model_dump()
+    return (
+        Web3.to_checksum_address(sale["customer_address"]),
+        Web3.to_checksum_address(sale["retailer_address"]),
+        amount_in_wei,
+        sale["product_id"],
+        sale["quantity"],
+        sale["description"] or "",
+        sale.get("payment_ref") or "",
+        sale.get("receipt_number") or "",
+    )
 
-    In a real system, this would involve a database lookup,
-    or a more complex logic to verify and link off-chain payment
-    references (e.g., from a payment gateway) to the blockchain
-    transaction records.
+def index_references(transaction_id, references):
+    """
+    Indexes the references of a sale this process just recorded, which also
+    drops their claim. When the contracts support it they were logged on-chain
+    by the same transaction (TransactionReferenced), so the index can be rebuilt.
+    """
+    if references:
+        event_indexer.record_local_references(transaction_id, references)
 
-    For this demonstration, we assume a direct mapping or that
-    the off-chain system somehow provides the on-chain ID.
-    If the off-chain system doesn't provide it, you might need
-    to query the blockchain for recent transactions by a specific
-    customer/retailer and amount.
+async def configure_reference_anchoring(retail_transaction_contract, checkout_router_contract=None):
     """
-    # For simplicity, let's assume the off-chain ID is directly the
-    # on-chain transaction ID as a string, which we convert to an int.
-    # In a real scenario, this would involve a database or event listening.
-    try:
-        on_chain_id = int(off_chain_id)
-        return on_chain_id
-    except ValueError:
-        raise ValueError(f"Invalid off-chain ID format: {off_chain_id}. Expected an integer-like string.")
+    Sends sales carrying references through the referenced record functions
+    when the deployed contracts have them; with older deployments the
+    references are only indexed locally.
+    """
+    global anchoring_supported, checkout_anchoring_supported
+    anchoring_supported = await supports_function(
+        retail_transaction_contract, f"recordReferencedTransactions({REFERENCED_SALE_TYPE}[])"
+    )
+    checkout_anchoring_supported = checkout_router_contract is not None and await supports_function(
+        checkout_router_contract, f"recordAndAwardReferenced({REFERENCED_SALE_TYPE},uint256)"
+    )
+    if not anchoring_supported:
+        print("⚠️  RetailTransaction has no recordReferencedTransactions, off-chain references are only kept in the local index.")
+
+async def rebuild_references(from_block=INDEXER_START_BLOCK, to_block=None):
+    """
+    Re-reads every TransactionReferenced log into the index, e.g. after the
+    index file was lost. Returns the number of references restored.
+    """
+    contract = load_contract("RetailTransaction", async_w3)
+    decoder = EventDecoder([contract])
+    topic = decoder.topic_for(contract, "TransactionReferenced")
+    if to_block is None:
+        to_block = await async_w3.eth.block_number
+
+    restored = 0
+    for chunk_start in range(from_block, to_block + 1, LOG_CHUNK_SIZE):
+        chunk_end = min(chunk_start + LOG_CHUNK_SIZE - 1, to_block)
+        logs = await async_w3.eth.get_logs({
+            "fromBlock": chunk_start,
+            "toBlock": chunk_end,
+            "address": contract.address,
+            "topics": [topic],
+        })
+        references = []
+        for log in logs:
+            args = decoder.decode(log)["args"]
+            references.append({
+                "reference_type": args["referenceType"],
+                "external_ref": args["externalRef"],
+                "transaction_id": args["transactionId"],
+            })
+        event_indexer.store.save_events([], [], references)
+        restored += len(references)
+    return restored
+
+def main():
+    parser = argparse.ArgumentParser(description="Match off-chain references to on-chain retail transactions.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    lookup = commands.add_parser("lookup", help="Print the transactions recorded for off-chain references")
+    lookup.add_argument("references", nargs="+", help="Off-chain references to match")
+    lookup.add_argument("--type", choices=REFERENCE_TYPES, help="Reference type (default: try every type)")
+
+    rebuild = commands.add_parser("rebuild", help="Rebuild the reference index from TransactionReferenced logs")
+    rebuild.add_argument("--from-block", type=int, default=INDEXER_START_BLOCK, help="First block to scan")
+
+    args = parser.parse_args()
+
+    if args.command == "lookup":
+        reference_types = [args.type] if args.type else REFERENCE_TYPES
+        matches = match_references(
+            (reference_type, reference) for reference in args.references for reference_type in reference_types
+        )
+        for reference in args.references:
+            found = [matches[(t, reference)] for t in reference_types if (t, reference) in matches]
+            print(json.dumps(found[0] if found else {"external_ref": reference, "transaction_id": None}))
+    else:
+        restored = asyncio.run(rebuild_references(args.from_block))
+        print(f"✅ Restored {restored} off-chain reference(s) from the chain.")
 
-# Example usage (for testing purposes)
 if __name__ == "__main__":
-    # Simulate an off-chain ID
-    off_chain_ref_id = "12345"
-    try:
-        on_chain_txn_id = match_transaction_id(off_chain_ref_id)
-        print(f"Off-chain ID '{off_chain_ref_id}' matched to on-chain ID: {on_chain_txn_id}")
-    except ValueError as e:
-        print(f"Error matching transaction: {e}")
-
-    invalid_off_chain_ref_id = "abc"
-    try:
-        on_chain_txn_id = match_transaction_id(invalid_off_chain_ref_id)
-        print(f"Off-chain ID '{invalid_off_chain_ref_id}' matched to on-chain ID: {on_chain_txn_id}")
-    except ValueError as e:
-        print(f"Error matching transaction: {e}")
+    main()
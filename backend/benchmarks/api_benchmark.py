@@ -0,0 +1,253 @@
+"""
+Load test for the API against an in-process chain (eth-tester on py-evm).
+
+    cd backend
+    python -m benchmarks.api_benchmark --requests 200 --concurrency 16
+    python -m benchmarks.api_benchmark --compare benchmarks/results/<earlier run>.json
+
+The app runs in this process with its background services, behind httpx's
+ASGI transport, on the in-process chain (WEB3_PROVIDER=tester://), so no
+node, server or network is involved. Contracts are compiled (cached as
+usual) and deployed to the fresh chain at startup. Each phase sends `--requests` requests with `--concurrency`
+in flight and reports throughput, latency percentiles and JSON-RPC calls per
+request. RPC counts include the app's background polling during the phase.
+Results are written as JSON so runs on different commits can be compared.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+import numpy as np
+
+BACKEND_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_PATH = os.path.join(BACKEND_PATH, "benchmarks", "results")
+
+PHASES = ("record", "balance", "redeem")
+# Seconds to wait for contracts to be compiled and deployed
+STARTUP_TIMEOUT = 300
+
+class RPCCounter:
+    """
+    Counts JSON-RPC calls by method by wrapping a provider's `make_request`.
+    """
+
+    def __init__(self):
+        self.calls = Counter()
+
+    def wrap(self, provider, is_async):
+        make_request = provider.make_request
+
+        if is_async:
+            async def counted(method, params):
+                self.calls[method] += 1
+                return await make_request(method, params)
+        else:
+            def counted(method, params):
+                self.calls[method] += 1
+                return make_request(method, params)
+
+        provider.make_request = counted
+
+    def snapshot(self):
+        return Counter(self.calls)
+
+def setup_chain(signers):
+    """
+    Points the app at a fresh in-process chain (WEB3_PROVIDER=tester://).
+    Must run before any `app` module is imported.
+    Returns the RPC counter wrapped around both providers.
+    """
+    from eth_tester.backends.pyevm.main import get_default_account_keys
+
+    os.environ["WEB3_PROVIDER"] = "tester://"
+    # A fresh build directory for the throwaway deployment, removed on exit
+    os.environ.pop("CONTRACT_BUILD_PATH", None)
+    os.environ["SIGNER_PRIVATE_KEYS"] = ",".join(key.to_hex() for key in get_default_account_keys(max(1, signers)))
+
+    from app.services.contractsManager import contract_config
+
+    counter = RPCCounter()
+    counter.wrap(contract_config.w3.provider, is_async=False)
+    counter.wrap(contract_config.async_w3.provider, is_async=True)
+    return counter
+
+def latency_stats(latencies):
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None, "max_ms": None}
+    latencies_ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "mean_ms": round(float(latencies_ms.mean()), 2),
+        "max_ms": round(float(latencies_ms.max()), 2),
+    }
+
+async def run_phase(client, counter, name, make_request, total, concurrency):
+    """
+    Sends `total` requests built by `make_request(i)` -> (method, url, json),
+    `concurrency` at a time.
+    """
+    latencies = []
+    errors = Counter()
+    error_samples = []
+    next_index = iter(range(total))
+
+    async def worker():
+        for i in next_index:
+            method, url, body = make_request(i)
+            started_at = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+                status = response.status_code
+            except Exception as e:
+                status, response = type(e).__name__, None
+            latencies.append(time.perf_counter() - started_at)
+
+            if status not in (200, 202):
+                errors[str(status)] += 1
+                if len(error_samples) < 3:
+                    error_samples.append({"status": status, "body": response.text[:300] if response is not None else None})
+
+    rpc_before = counter.snapshot()
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+    rpc_calls = counter.snapshot() - rpc_before
+
+    succeeded = total - sum(errors.values())
+    result = {
+        "requests": total,
+        "succeeded": succeeded,
+        "errors": dict(errors),
+        "error_samples": error_samples,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(succeeded / elapsed, 2) if elapsed else None,
+        **latency_stats(latencies),
+        "rpc_calls": sum(rpc_calls.values()),
+        "rpc_calls_per_request": round(sum(rpc_calls.values()) / total, 2) if total else None,
+        "rpc_calls_by_method": dict(rpc_calls.most_common()),
+    }
+    print(
+        f"📊 {name}: {result['throughput_rps']} req/s, p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, "
+        f"p99 {result['p99_ms']} ms, {result['rpc_calls_per_request']} RPC/request, errors {result['errors'] or 0}"
+    )
+    return result
+
+async def run(args, counter):
+    import httpx
+    from app import main
+    from app.startup import contractsStartup
+
+    await main.app.router.startup()
+    results = {}
+    try:
+        try:
+            await asyncio.wait_for(asyncio.shield(main.startup_task), STARTUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise Exception(f"❌ App did not become ready: {contractsStartup.startup_error}")
+
+        rng = random.Random(args.seed)
+        customers = ["0x" + "%040x" % rng.getrandbits(160) for _ in range(args.customers)]
+        retailer = "0x" + "%040x" % rng.getrandbits(160)
+
+        def record_request(i):
+            return "POST", "/transactions/record", {
+                "customer_address": customers[i % len(customers)],
+                "retailer_address": retailer,
+                "amount_INR": round(rng.uniform(100, 5000), 2),
+                "product_id": f"SKU-{i % 50}",
+                "quantity": 1 + i % 3,
+                "description": "benchmark sale",
+            }
+
+        def balance_request(i):
+            return "GET", f"/loyalty/balance/{customers[i % len(customers)]}", None
+
+        def redeem_request(i):
+            return "POST", "/loyalty/redeem", {"customer_address": customers[i % len(customers)], "points_amount": 1}
+
+        phase_requests = {"record": record_request, "balance": balance_request, "redeem": redeem_request}
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            ready = await client.get("/ready")
+            if ready.status_code != 200:
+                raise Exception(f"❌ App is not ready: {ready.json()}")
+
+            for name in args.phases:
+                results[name] = await run_phase(client, counter, name, phase_requests[name], args.requests, args.concurrency)
+    finally:
+        await main.app.router.shutdown()
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_PATH, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def compare(baseline, current):
+    """
+    Prints how each phase changed against an earlier results file.
+    """
+    print(f"\n🔍 Compared with {baseline.get('commit')} ({baseline.get('created_at')}):")
+    for name, result in current["phases"].items():
+        before = baseline.get("phases", {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "rpc_calls_per_request"):
+            old, new = before.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            change = f" ({(new - old) / old * 100:+.1f}%)" if old else ""
+            changes.append(f"{metric} {old} -> {new}{change}")
+        print(f"- {name}: " + ", ".join(changes))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the API against an in-process chain.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per phase")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once")
+    parser.add_argument("--phases", nargs="+", choices=PHASES, default=list(PHASES), help="Phases to run, in order (redeem needs points from record)")
+    parser.add_argument("--customers", type=int, default=50, help="Distinct customer addresses")
+    parser.add_argument("--signers", type=int, default=1, help="Accounts in the signer pool")
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="CHAIN_POLL_INTERVAL for the app (seconds)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<commit>-<time>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    os.environ["CHAIN_POLL_INTERVAL"] = str(args.poll_interval)
+    counter = setup_chain(args.signers)
+    phases = asyncio.run(run(args, counter))
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "phases": phases,
+    }
+
+    output = args.output or os.path.join(RESULTS_PATH, f"{commit or 'unknown'}-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.services.loyaltyManager import balance_checker
+from app.services.loyaltyManager.balance_cache import BalanceCache
+
+CUSTOMER = "0x" + "11" * 20
+OTHER = "0x" + "22" * 20
+
+class StubFollower:
+    def __init__(self, next_block):
+        self.next_block = next_block
+
+class StubDecoder:
+    def decode(self, log):
+        return log
+
+def points_event(event, address, block_number, tx_hash):
+    args = {"recipient": address} if event == "PointsAwarded" else {"redeemer": address}
+    return {"event": event, "args": args, "blockNumber": block_number, "transactionHash": bytes.fromhex(tx_hash)}
+
+def started_cache(next_block=11, **kwargs):
+    cache = BalanceCache(StubFollower(next_block), **kwargs)
+    cache.decoder = StubDecoder()
+    return cache
+
+def test_lru_and_ttl_eviction(monkeypatch):
+    cache = started_cache(max_entries=2, ttl=60)
+    cache.set("a", 1, 10)
+    cache.set("b", 2, 10)
+    assert cache.get("a") == 1  # "a" is now the most recently used
+    cache.set("c", 3, 10)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert cache.get("a") is None
+
+def test_local_changes_are_not_applied_twice():
+    async def scenario():
+        cache = started_cache()
+        cache.set(CUSTOMER, 100, 10)
+        receipt = SimpleNamespace(transactionHash=bytes.fromhex("aa" * 32), blockNumber=12)
+        cache.apply_local_change(CUSTOMER, -30, receipt)
+        assert cache.get(CUSTOMER) == 70
+
+        # The follower later sees the same redemption: the updated entry is kept
+        await cache._on_logs([points_event("PointsRedeemed", CUSTOMER, 12, "aa" * 32)], 11, 12)
+        assert cache.get(CUSTOMER) == 70
+
+        # A change made elsewhere invalidates it
+        await cache._on_logs([points_event("PointsAwarded", CUSTOMER, 13, "bb" * 32)], 13, 13)
+        assert cache.get(CUSTOMER) is None
+
+    asyncio.run(scenario())
+
+def test_change_during_a_slow_read_is_not_cached_over(monkeypatch):
+    cache = started_cache(next_block=11)
+    monkeypatch.setattr(balance_checker, "balance_cache", cache)
+    gate = asyncio.Event()
+
+    class SlowBalance:
+        def __init__(self, address):
+            pass
+
+        async def call(self, block_identifier):
+            assert block_identifier == 10
+            await gate.wait()
+            return 100  # the balance at block 10, before the award below
+
+    contract = SimpleNamespace(functions=SimpleNamespace(getBalance=SlowBalance))
+    monkeypatch.setattr(balance_checker, "load_contract", lambda name, web3: contract)
+
+    async def scenario():
+        read = asyncio.create_task(balance_checker.get_loyalty_balance(CUSTOMER))
+        await asyncio.sleep(0)
+        # The follower processes an award for the address while the read is in flight
+        await cache._on_logs([points_event("PointsAwarded", CUSTOMER, 11, "cc" * 32)], 11, 11)
+        cache.follower.next_block = 12
+        gate.set()
+        assert await read == 100
+        assert cache.get(CUSTOMER) is None
+
+        # A read taken after the change is cached as usual
+        cache.set(CUSTOMER, 150, 11)
+        assert cache.get(CUSTOMER) == 150
+
+    asyncio.run(scenario())
+
+def test_reads_from_a_replaced_chain_are_not_cached():
+    async def scenario():
+        cache = started_cache(next_block=21)
+        await cache._on_logs([], 15, 20)
+        await cache._on_reorg(18)
+        cache.set(OTHER, 5, 19)  # read before the reorg, at a block that was replaced
+        assert cache.get(OTHER) is None
+        cache.set(OTHER, 5, 21)
+        assert cache.get(OTHER) == 5
+
+    asyncio.run(scenario())
@@ -0,0 +1,5 @@
+import os
+
+# Tests run against eth-tester's in-process chain (or none at all), never a configured node.
+# Set before any test module imports the shared contract config.
+os.environ["WEB3_PROVIDER"] = "tester://"
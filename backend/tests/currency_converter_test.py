@@ -0,0 +1,61 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.services.currencyManager.currency_converter import (
+    INR_to_wei, wei_to_INR, INR_to_wei_batch, wei_to_INR_batch, FIXED_INR_TO_WEI_RATE
+)
+from app.services.loyaltyManager.points_calculator import calculate_loyalty_points, calculate_loyalty_points_batch
+
+def test_known_values():
+    assert INR_to_wei(1500.75) == 1500 * FIXED_INR_TO_WEI_RATE + 3 * FIXED_INR_TO_WEI_RATE // 4
+    assert wei_to_INR(INR_to_wei(1500.75)) == 1500.75
+    assert calculate_loyalty_points(INR_to_wei(1500.75)) == 1500
+    assert calculate_loyalty_points(INR_to_wei(0.99)) == 0
+
+def test_batch_matches_scalar():
+    rng = random.Random(42)
+    INR_amounts = [round(rng.uniform(0, 50000), rng.choice([0, 1, 2, 3])) for _ in range(2000)] + [0.0, 0.29, 0.285]
+    wei_amounts = [rng.randrange(0, 2**62) for _ in range(2000)] + [0, FIXED_INR_TO_WEI_RATE // 200]
+
+    assert [int(wei) for wei in INR_to_wei_batch(INR_amounts)] == [INR_to_wei(amount) for amount in INR_amounts]
+    assert wei_to_INR_batch(np.array(wei_amounts)).tolist() == [wei_to_INR(wei) for wei in wei_amounts]
+    assert [int(points) for points in calculate_loyalty_points_batch(wei_amounts)] == [
+        calculate_loyalty_points(wei) for wei in wei_amounts
+    ]
+
+def test_batch_is_exact_beyond_int64():
+    wei_amounts = [10**25 + 1, 2**64 + FIXED_INR_TO_WEI_RATE // 2]
+    INR_amounts = [5e8, 12345678901.23]
+
+    assert wei_to_INR_batch(wei_amounts).tolist() == [wei_to_INR(wei) for wei in wei_amounts]
+    assert [int(points) for points in calculate_loyalty_points_batch(wei_amounts)] == [
+        calculate_loyalty_points(wei) for wei in wei_amounts
+    ]
+    assert [int(wei) for wei in INR_to_wei_batch(INR_amounts)] == [INR_to_wei(amount) for amount in INR_amounts]
+    assert int(INR_to_wei_batch([5e8])[0]) == 5 * 10**8 * FIXED_INR_TO_WEI_RATE
+
+def test_negative_amounts_are_rejected():
+    with pytest.raises(ValueError):
+        INR_to_wei_batch([1.0, -1.0])
+    with pytest.raises(ValueError):
+        wei_to_INR_batch([1, -1])
+
+def test_amounts_are_rounded_to_whole_paise_halves_to_even():
+    # Sub-paisa fractions don't reach the wei amount, in either path
+    assert INR_to_wei(10.004) == INR_to_wei(10.0) == 10 * FIXED_INR_TO_WEI_RATE
+    assert INR_to_wei(10.006) == INR_to_wei(10.01)
+    # 0.125 and 0.375 are exact in binary, so these are true halves
+    assert INR_to_wei(0.125) == 12 * FIXED_INR_TO_WEI_RATE // 100
+    assert INR_to_wei(0.375) == 38 * FIXED_INR_TO_WEI_RATE // 100
+    assert [int(wei) for wei in INR_to_wei_batch([10.004, 0.125, 0.375])] == [
+        INR_to_wei(10.004), INR_to_wei(0.125), INR_to_wei(0.375)
+    ]
+
+@pytest.mark.parametrize("amount", [float("nan"), float("inf")])
+def test_non_finite_amounts_are_rejected(amount):
+    with pytest.raises(ValueError):
+        INR_to_wei(amount)
+    with pytest.raises(ValueError):
+        INR_to_wei_batch([1.0, amount])
@@ -0,0 +1,120 @@
+import asyncio
+
+from app.services.subscriptionManager.event_broadcaster import EventBroadcaster, SLOW_SUBSCRIBER
+
+CUSTOMER = "0x" + "11" * 20
+RETAILER = "0x" + "22" * 20
+OTHER = "0x" + "33" * 20
+
+class StubFollower:
+    def watch(self, *addresses):
+        pass
+
+    def subscribe(self, on_logs, on_reorg=None):
+        pass
+
+    def unsubscribe(self, on_logs):
+        pass
+
+def sale(block_number, tx_hash, customer=CUSTOMER):
+    return {
+        "id": f"{block_number}-0", "event": "TransactionRecorded", "transaction_hash": tx_hash,
+        "block_number": block_number, "log_index": 0, "customer_address": customer, "retailer_address": RETAILER,
+    }
+
+def redemption(block_number, tx_hash, address=CUSTOMER):
+    return {
+        "id": f"{block_number}-1", "event": "PointsRedeemed", "transaction_hash": tx_hash,
+        "block_number": block_number, "log_index": 1, "address": address, "amount": "5",
+    }
+
+async def drain(subscription):
+    messages = []
+    while True:
+        message = await subscription.get(0)
+        if message is None:
+            return messages
+        messages.append(message)
+
+def test_events_reach_matching_subscribers_only():
+    async def scenario():
+        broadcaster = EventBroadcaster(StubFollower())
+        by_customer = broadcaster.subscribe(addresses=[CUSTOMER])
+        by_retailer = broadcaster.subscribe(addresses=[RETAILER], events=["PointsRedeemed"])
+        by_tx_hash = broadcaster.subscribe(tx_hashes=["0xBB"])
+        everything = broadcaster.subscribe()
+
+        broadcaster.publish(sale(1, "0xaa"))
+        broadcaster.publish(redemption(2, "0xbb", OTHER))
+
+        assert [m["transaction_hash"] for m in await drain(by_customer)] == ["0xaa"]
+        assert await drain(by_retailer) == []
+        assert [m["event"] for m in await drain(by_tx_hash)] == ["PointsRedeemed"]
+        assert len(await drain(everything)) == 2
+
+        broadcaster.unsubscribe(by_customer)
+        broadcaster.publish(sale(3, "0xcc"))
+        assert await drain(by_customer) == [] and by_customer.closed == "unsubscribed"
+        assert broadcaster._by_address.keys() == {RETAILER}
+
+    asyncio.run(scenario())
+
+def test_replay_reorg_and_slow_subscribers():
+    async def scenario():
+        broadcaster = EventBroadcaster(StubFollower())
+        broadcaster.publish(sale(1, "0xaa"))
+        broadcaster.publish(sale(2, "0xbb"))
+
+        # A tx mined just before subscribing, and a client resuming after its last event id
+        assert [m["id"] for m in await drain(broadcaster.subscribe(tx_hashes=["0xbb"]))] == ["2-0"]
+        assert [m["id"] for m in await drain(broadcaster.subscribe(after="1-0"))] == ["2-0"]
+
+        subscription = broadcaster.subscribe()
+        await broadcaster._on_reorg(2)
+        reorg = await drain(subscription)
+        assert [(m["event"], m["from_block"]) for m in reorg] == [("reorg", 2)]
+        assert [m["id"] for m in await drain(broadcaster.subscribe(after="0-0"))] == ["1-0"]
+
+        subscription.queue_size = 1
+        broadcaster.publish(sale(2, "0xdd"))
+        broadcaster.publish(sale(3, "0xee"))
+        assert subscription.closed is not None and subscription not in broadcaster._subscriptions
+        assert [m["transaction_hash"] for m in await drain(subscription)] == ["0xdd"]
+
+    asyncio.run(scenario())
+
+def test_resume_with_more_than_a_queue_of_events_closes_the_subscription():
+    async def scenario():
+        broadcaster = EventBroadcaster(StubFollower(), queue_size=3)
+        for block_number in range(1, 6):
+            broadcaster.publish(sale(block_number, f"0x{block_number:02x}"))
+
+        # Only the first events fit: the client is told to reconnect after the last id it gets
+        subscription = broadcaster.subscribe(after="0-0")
+        assert subscription.closed == SLOW_SUBSCRIBER
+        assert [m["id"] for m in await drain(subscription)] == ["1-0", "2-0", "3-0"]
+        assert subscription not in broadcaster._subscriptions
+
+        resumed = broadcaster.subscribe(after="3-0")
+        assert resumed.closed is None
+        assert [m["id"] for m in await drain(resumed)] == ["4-0", "5-0"]
+
+    asyncio.run(scenario())
+
+def test_resuming_after_a_reorg_message_replays_the_new_chain():
+    async def scenario():
+        broadcaster = EventBroadcaster(StubFollower())
+        broadcaster.publish(sale(1, "0xaa"))
+        broadcaster.publish(sale(2, "0xbb"))
+        subscription = broadcaster.subscribe()
+        await broadcaster._on_reorg(2)
+        broadcaster.publish(sale(2, "0xcc"))
+        broadcaster.publish(sale(3, "0xdd"))
+
+        messages = await drain(subscription)
+        assert [m["event"] for m in messages] == ["reorg", "TransactionRecorded", "TransactionRecorded"]
+        # The client dropped right after the reorg message: its last id must not skip block 2 of the new chain
+        resumed = broadcaster.subscribe(after=messages[0]["id"])
+        assert [m["transaction_hash"] for m in await drain(resumed)] == ["0xcc", "0xdd"]
+
+    asyncio.run(scenario())
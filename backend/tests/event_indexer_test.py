@@ -0,0 +1,36 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.services.indexManager import event_indexer as event_indexer_module
+from app.services.indexManager.event_indexer import EventIndexer
+from app.services.indexManager.event_store import EventStore
+
+class FlakyEth:
+    """
+    eth_getLogs that fails once for each range starting at a block in `fail_from`.
+    """
+
+    def __init__(self, fail_from):
+        self.fail_from = set(fail_from)
+        self.ranges = []
+
+    async def get_logs(self, params):
+        if params["fromBlock"] in self.fail_from:
+            self.fail_from.discard(params["fromBlock"])
+            raise ConnectionError("node unavailable")
+        self.ranges.append((params["fromBlock"], params["toBlock"]))
+        return []
+
+def test_backfill_retries_from_the_last_stored_chunk(tmp_path, monkeypatch):
+    monkeypatch.setattr(event_indexer_module, "BACKFILL_RETRY_DELAY", 0)
+    eth = FlakyEth(fail_from=[10])
+    indexer = EventIndexer(EventStore(str(tmp_path / "index.sqlite3")), None, SimpleNamespace(eth=eth), chunk_size=10)
+    indexer.retail_contract = SimpleNamespace(address="0x" + "11" * 20)
+    indexer.loyalty_contract = SimpleNamespace(address="0x" + "22" * 20)
+
+    asyncio.run(indexer._backfill(0, 29))
+
+    assert indexer.backfill_complete and indexer.backfill_error is None
+    # The chunk stored before the failure isn't fetched again
+    assert eth.ranges == [(0, 9), (10, 19), (20, 29)]
+    assert int(indexer.store.get_state("indexed_to")) == 29
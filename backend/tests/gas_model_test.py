@@ -0,0 +1,86 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.services.chainManager import gas_model as gas_model_module
+from app.services.chainManager.gas_model import GasModel, size_class
+
+class FakeFunction:
+    """
+    Contract function whose calldata is `words` 32-byte words and whose estimate is fixed.
+    """
+
+    def __init__(self, words, estimate=100000, fn_name="awardPoints"):
+        self.address = "0x0000000000000000000000000000000000000001"
+        self.fn_name = fn_name
+        self.data = "0x" + "00" * 32 * words
+        self.estimate = estimate
+        self.estimates = 0
+
+    def _encode_transaction_data(self):
+        return self.data
+
+    async def estimate_gas(self, transaction):
+        self.estimates += 1
+        return self.estimate
+
+def test_size_class_buckets_calldata_in_powers_of_two_words():
+    classes = [size_class("0x" + "00" * 32 * words) for words in (0, 1, 2, 3, 4, 7, 8, 100)]
+    assert classes == [1, 1, 2, 2, 3, 3, 4, 7]
+
+def test_cached_estimate_is_scaled_to_longer_calldata_in_the_same_class():
+    model = GasModel(None, margin_percent=20, margin_fixed=25000)
+    short, longer = FakeFunction(words=4), FakeFunction(words=6)
+
+    async def run():
+        return await model.gas_limit(short, "0xsender"), await model.gas_limit(longer, "0xsender")
+
+    short_limit, longer_limit = asyncio.run(run())
+    assert short_limit == 100000 + 20000 + 25000
+    # 6 words against an estimate taken at 4: about 1.5x, before the margin
+    scaled = 100000 * len(longer.data) // len(short.data)
+    assert scaled > 145000
+    assert longer_limit == scaled + scaled * 20 // 100 + 25000
+    assert (short.estimates, longer.estimates) == (1, 0)
+
+def test_shorter_calldata_is_not_scaled_down():
+    model = GasModel(None, margin_percent=0, margin_fixed=0)
+    first, shorter = FakeFunction(words=7), FakeFunction(words=4)
+
+    async def run():
+        await model.gas_limit(first, "0xsender")
+        return await model.gas_limit(shorter, "0xsender")
+
+    assert asyncio.run(run()) == 100000
+    assert shorter.estimates == 0
+
+def test_other_size_class_is_estimated_separately():
+    model = GasModel(None, margin_percent=0, margin_fixed=0)
+    small, large = FakeFunction(words=2), FakeFunction(words=8, estimate=300000)
+
+    async def run():
+        return await model.gas_limit(small, "0xsender"), await model.gas_limit(large, "0xsender")
+
+    assert asyncio.run(run()) == (100000, 300000)
+    assert large.estimates == 1
+
+def test_out_of_gas_failure_drops_the_cached_estimate(monkeypatch):
+    futures = {}
+    monkeypatch.setattr(gas_model_module, "receipt_tracker", SimpleNamespace(
+        track=lambda tx_hash: {"future": futures.setdefault(tx_hash, asyncio.get_running_loop().create_future())}
+    ))
+    model = GasModel(None)
+    function = FakeFunction(words=4)
+
+    async def run():
+        limit = await model.gas_limit(function, "0xsender")
+        model.watch(function, "0xok", limit)
+        model.watch(function, "0xout", limit)
+        futures["0xok"].set_result(SimpleNamespace(status=0, gasUsed=limit - 1))
+        await asyncio.sleep(0)
+        kept = len(model._estimates)
+        futures["0xout"].set_result(SimpleNamespace(status=0, gasUsed=limit))
+        await asyncio.sleep(0)
+        return kept, len(model._estimates)
+
+    # A revert below the limit keeps the estimate; running out of gas drops it
+    assert asyncio.run(run()) == (1, 0)
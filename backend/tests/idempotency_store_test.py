@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.idempotencyManager.idempotency import Idempotency, IdempotencyKeyReused
+from app.services.idempotencyManager.idempotency_store import IdempotencyStore
+
+def test_claim_attach_and_complete(tmp_path):
+    store = IdempotencyStore(str(tmp_path / "idempotency.sqlite3"))
+    assert store.claim("loyalty.redeem", "k1", "hash", retention=60) is None
+
+    record = store.claim("loyalty.redeem", "k1", "hash", retention=60)
+    assert record["status"] == "in_flight" and record["tx_hash"] is None
+    # Keys are scoped per endpoint
+    assert store.claim("transactions.record", "k1", "hash", retention=60) is None
+
+    store.attach("loyalty.redeem", "k1", tx_hash="0xabc")
+    store.attach("loyalty.redeem", "k1", intent_id=3)
+    store.complete("loyalty.redeem", "k1", 200, {"transaction_hash": "0xabc"})
+    record = store.get("loyalty.redeem", "k1")
+    assert record["status"] == "done" and record["tx_hash"] == "0xabc" and record["intent_id"] == 3
+    assert record["status_code"] == 200 and record["response"] == {"transaction_hash": "0xabc"}
+
+    # A transaction the node never accepted is detached again, with its sender and nonce
+    store.claim("loyalty.redeem", "k2", "hash", retention=60)
+    store.attach("loyalty.redeem", "k2", tx_hash="0xdef", sender="0xsender", nonce=4)
+    assert store.get("loyalty.redeem", "k2")["nonce"] == 4
+    store.clear_tx("loyalty.redeem", "k2")
+    record = store.get("loyalty.redeem", "k2")
+    assert record["tx_hash"] is None and record["sender"] is None and record["nonce"] is None
+
+def test_expired_keys_are_reclaimed_and_pruned(tmp_path, monkeypatch):
+    store = IdempotencyStore(str(tmp_path / "idempotency.sqlite3"))
+    store.claim("loyalty.redeem", "old", "hash", retention=60)
+    store.claim("loyalty.redeem", "other", "hash", retention=60)
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert store.get("loyalty.redeem", "old") is None
+    assert store.claim("loyalty.redeem", "old", "new-hash", retention=60) is None
+    assert store.prune_expired() == 1
+    assert store.get("loyalty.redeem", "old")["request_hash"] == "new-hash"
+
+def test_retries_attach_to_the_original_request(tmp_path):
+    async def scenario():
+        idempotency = Idempotency(IdempotencyStore(str(tmp_path / "idempotency.sqlite3")), retention=60)
+        body = {"customer_address": "0xabc", "points_amount": 5}
+        assert idempotency.begin("loyalty.redeem", "k1", body) is None
+
+        with pytest.raises(IdempotencyKeyReused):
+            idempotency.begin("loyalty.redeem", "k1", {**body, "points_amount": 6})
+
+        # A concurrent retry waits for the original request, then sees its transaction
+        assert idempotency.begin("loyalty.redeem", "k1", body)["tx_hash"] is None
+        waiting = asyncio.create_task(idempotency.wait("loyalty.redeem", "k1", timeout=5))
+        idempotency.attach("loyalty.redeem", "k1", tx_hash="0xabc")
+        idempotency.detach("loyalty.redeem", "k1")
+        assert (await waiting)["tx_hash"] == "0xabc"
+
+        # A request that failed before sending anything frees its key
+        assert idempotency.begin("loyalty.redeem", "k2", body) is None
+        idempotency.abandon("loyalty.redeem", "k2")
+        assert idempotency.begin("loyalty.redeem", "k2", body) is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,60 @@
+import json
+
+from app.services.contractsManager.ingest_utils import Checkpoint
+
+def read_records(path):
+    with open(path) as f:
+        return [json.loads(raw) for raw in f]
+
+def test_done_below_waits_for_the_oldest_unsettled_line(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "sales.checkpoint.jsonl"))
+    checkpoint.load()
+    for line in (2, 3, 4):
+        checkpoint.reach(line)
+
+    # Lines settle out of order; done_below stays at line 2 until it's done
+    checkpoint.write(3, "done", tx_hash="0x03")
+    checkpoint.write(4, "invalid", error="quantity: must be positive")
+    assert checkpoint.done_below == 2
+    checkpoint.write(2, "signed", tx_hash="0x02", nonce=0, **{"from": "0xsigner"})
+    assert checkpoint.done_below == 2
+    checkpoint.write(2, "done", tx_hash="0x02")
+    assert checkpoint.done_below == 5
+    # Settled records below done_below are no longer kept in memory
+    assert checkpoint.entries == {}
+    assert [checkpoint.is_settled(line) for line in (2, 3, 4, 5)] == [True, True, True, False]
+    checkpoint.close()
+
+def test_resume_skips_settled_lines_and_returns_those_in_flight(tmp_path):
+    path = str(tmp_path / "sales.checkpoint.jsonl")
+    first_run = Checkpoint(path)
+    first_run.load()
+    for line in (2, 3, 4, 5):
+        first_run.reach(line)
+    first_run.write(2, "done", tx_hash="0x02")
+    first_run.write(3, "signed", durable=True, tx_hash="0x03", nonce=7, **{"from": "0xsigner"})
+    first_run.write(4, "failed", error="Blockchain transaction failed.")
+    first_run.close()
+    # The crash cut the last line short
+    with open(path, "a") as f:
+        f.write('{"line": 5, "stat')
+
+    resumed = Checkpoint(path)
+    resumed.load()
+
+    assert resumed.done_below == 3
+    assert [resumed.is_settled(line) for line in (2, 3, 4, 5)] == [True, False, True, False]
+    assert resumed.in_flight() == [{"line": 3, "status": "signed", "tx_hash": "0x03", "nonce": 7, "from": "0xsigner", "done_below": 3}]
+    # The file is rewritten with only what's still needed
+    assert [record.get("line") for record in read_records(path)] == [None, 3, 4]
+    assert all(record["done_below"] == 3 for record in read_records(path))
+
+    # Settling the in-flight line lets done_below jump past everything read before it
+    resumed.reach(3)
+    resumed.reach(5)
+    resumed.write(3, "done", tx_hash="0x03")
+    assert resumed.done_below == 5
+    resumed.write(5, "done", tx_hash="0x05")
+    assert resumed.done_below == 6
+    resumed.close()
+    assert read_records(path)[-1]["done_below"] == 6
@@ -0,0 +1,87 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.models.schemas import RecordTransactionRequest
+from app.services.contractsManager import ingest_utils
+from app.services.contractsManager.ingest_utils import Checkpoint, send_row
+from app.services.indexManager.event_indexer import event_indexer
+from app.services.indexManager.event_store import EventStore
+from app.transactionManager import transaction_matcher
+from app.transactionManager.transaction_matcher import match_references
+
+class FakeRouter:
+    """
+    CheckoutRouter whose functions just remember how they were called.
+    """
+
+    def __init__(self):
+        self.functions = self
+
+    def __getattr__(self, fn_name):
+        return lambda *args: SimpleNamespace(fn_name=fn_name, args=args)
+
+class FakeRetailTransaction:
+    def __init__(self, transaction_id):
+        recorded = [{"args": {"transactionId": transaction_id}, "logIndex": 0}]
+        self.events = SimpleNamespace(TransactionRecorded=lambda: SimpleNamespace(
+            process_receipt=lambda tx_receipt, errors=None: recorded
+        ))
+
+def sale(**fields):
+    return RecordTransactionRequest(**{
+        "customer_address": "0x" + "ab" * 20, "retailer_address": "0x" + "cd" * 20,
+        "amount_INR": 100, "product_id": "SKU-1", "quantity": 1, "description": None, **fields,
+    })
+
+def use_chain(monkeypatch, tmp_path, status=1):
+    sent = []
+
+    async def send_transaction(function, on_signed=None):
+        sent.append(function)
+        tx_hash = bytes([len(sent)]) * 32
+        on_signed({"nonce": len(sent), "from": "0xsigner"}, tx_hash)
+        return tx_hash
+
+    async def wait(tx_hash, timeout):
+        return SimpleNamespace(transactionHash=tx_hash, status=status, blockNumber=1)
+
+    monkeypatch.setattr(event_indexer, "store", EventStore(str(tmp_path / "index.sqlite3")))
+    monkeypatch.setattr(ingest_utils, "send_transaction", send_transaction)
+    monkeypatch.setattr(ingest_utils, "receipt_tracker", SimpleNamespace(wait=wait))
+    monkeypatch.setattr(transaction_matcher, "checkout_anchoring_supported", True)
+    checkpoint = Checkpoint(str(tmp_path / "sales.checkpoint.jsonl"))
+    checkpoint.load()
+    return checkpoint, sent
+
+def test_rows_carry_their_references_into_the_record_call_and_the_index(tmp_path, monkeypatch):
+    checkpoint, sent = use_chain(monkeypatch, tmp_path)
+
+    async def run():
+        first = await send_row(checkpoint, FakeRouter(), FakeRetailTransaction(5), 2, sale(payment_ref="PAY-1"), 10, 1)
+        # A later row reusing the reference isn't sent
+        second = await send_row(checkpoint, FakeRouter(), FakeRetailTransaction(6), 3, sale(payment_ref="PAY-1", receipt_number="R-3"), 10, 1)
+        plain = await send_row(checkpoint, FakeRouter(), FakeRetailTransaction(7), 4, sale(), 10, 1)
+        return first, second, plain
+
+    assert asyncio.run(run()) == ("done", "invalid", "done")
+    assert [function.fn_name for function in sent] == ["recordAndAwardReferenced", "recordAndAward"]
+    assert sent[0].args[0][6:] == ("PAY-1", "")
+    # The signed record keeps them, so a resumed run can index a sale it finds mined
+    with open(checkpoint.path) as f:
+        signed = [json.loads(raw) for raw in f if '"signed"' in raw]
+    assert signed[0]["references"] == [["payment_ref", "PAY-1"]]
+    assert {pair: match["transaction_id"] for pair, match in match_references([("payment_ref", "PAY-1"), ("receipt_number", "R-3")]).items()} == {
+        ("payment_ref", "PAY-1"): 5
+    }
+    checkpoint.close()
+
+def test_a_failed_row_frees_its_references(tmp_path, monkeypatch):
+    checkpoint, sent = use_chain(monkeypatch, tmp_path, status=0)
+
+    async def run():
+        return await send_row(checkpoint, FakeRouter(), FakeRetailTransaction(5), 2, sale(receipt_number="R-2"), 10, 1)
+
+    assert asyncio.run(run()) == "failed"
+    transaction_matcher.claim_references([("receipt_number", "R-2")], "intent:1")
+    checkpoint.close()
@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.services.indexManager import log_scanner
+from app.services.indexManager.log_scanner import get_logs_adaptive, scan_logs_backwards
+
+class FakeEth:
+    """
+    eth_getLogs over an in-memory log list that, like hosted nodes, refuses
+    ranges holding more than `max_results` logs.
+    """
+
+    def __init__(self, logs, max_results):
+        self.logs = logs
+        self.max_results = max_results
+        self.ranges = []
+
+    async def get_logs(self, params):
+        self.ranges.append((params["fromBlock"], params["toBlock"]))
+        found = [log for log in self.logs if params["fromBlock"] <= log["blockNumber"] <= params["toBlock"]]
+        if len(found) > self.max_results:
+            raise ValueError({"code": -32005, "message": f"query returned more than {self.max_results} results"})
+        return found
+
+def make_logs(blocks):
+    return [{"blockNumber": block, "logIndex": index} for block in blocks for index in range(2)]
+
+def test_range_is_halved_until_the_node_accepts_it():
+    logs = make_logs(range(0, 64))
+    eth = FakeEth(logs, max_results=16)
+    found = asyncio.run(get_logs_adaptive(SimpleNamespace(eth=eth), {}, 0, 63))
+
+    assert sorted(found, key=lambda log: (log["blockNumber"], log["logIndex"])) == logs
+    # 128 logs at 16 per call: the range is split down to 8-block pieces
+    assert {(lower, upper) for lower, upper in eth.ranges if upper - lower == 7} == {(n, n + 7) for n in range(0, 64, 8)}
+
+def test_non_limit_errors_are_not_retried():
+    class BrokenEth:
+        async def get_logs(self, params):
+            raise ConnectionError("node unavailable")
+
+    try:
+        asyncio.run(get_logs_adaptive(SimpleNamespace(eth=BrokenEth()), {}, 0, 63))
+    except ConnectionError:
+        pass
+    else:
+        raise AssertionError("expected the error to propagate")
+
+def test_cursor_pages_through_history_newest_first(monkeypatch):
+    monkeypatch.setattr(log_scanner, "LOG_CHUNK_SIZE", 10)
+    logs = make_logs([3, 4, 40, 41, 95, 250])
+    web3 = SimpleNamespace(eth=FakeEth(logs, max_results=1000))
+
+    async def all_pages():
+        pages, cursor = [], None
+        while True:
+            page, cursor = await scan_logs_backwards(web3, {}, 300, limit=3, cursor=cursor, lowest_block=0)
+            pages.append(page)
+            if cursor is None:
+                return pages
+
+    pages = asyncio.run(all_pages())
+    positions = [(log["blockNumber"], log["logIndex"]) for page in pages for log in page]
+    assert all(len(page) <= 3 for page in pages)
+    # Every log exactly once, newest first, including logs sharing a block across a page boundary
+    assert positions == sorted({(log["blockNumber"], log["logIndex"]) for log in logs}, reverse=True)
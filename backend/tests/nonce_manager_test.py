@@ -0,0 +1,56 @@
+import asyncio
+
+from app.services.chainManager.nonce_manager import NonceManager, is_nonce_error
+
+class FakeEth:
+    def __init__(self, pending_count):
+        self.pending_count = pending_count
+        self.calls = 0
+
+    async def get_transaction_count(self, address, block_identifier="latest"):
+        self.calls += 1
+        return self.pending_count
+
+class FakeWeb3:
+    def __init__(self, pending_count):
+        self.eth = FakeEth(pending_count)
+
+ADDRESS = "0x0000000000000000000000000000000000000001"
+
+def test_concurrent_allocations_are_unique_and_seeded_once():
+    web3 = FakeWeb3(pending_count=7)
+    manager = NonceManager(web3)
+
+    async def run():
+        return await asyncio.gather(*(manager.allocate(ADDRESS) for _ in range(20)))
+
+    nonces = asyncio.run(run())
+    assert sorted(nonces) == list(range(7, 27))
+    assert web3.eth.calls == 1
+
+def test_released_nonce_is_reused_first():
+    manager = NonceManager(FakeWeb3(pending_count=0))
+
+    async def run():
+        first = await manager.allocate(ADDRESS)
+        await manager.allocate(ADDRESS)
+        await manager.release(ADDRESS, first)
+        return await manager.allocate(ADDRESS), await manager.allocate(ADDRESS)
+
+    assert asyncio.run(run()) == (0, 2)
+
+def test_resync_reseeds_from_node():
+    web3 = FakeWeb3(pending_count=3)
+    manager = NonceManager(web3)
+
+    async def run():
+        await manager.allocate(ADDRESS)
+        web3.eth.pending_count = 10
+        await manager.resync(ADDRESS)
+        return await manager.allocate(ADDRESS)
+
+    assert asyncio.run(run()) == 10
+
+def test_is_nonce_error():
+    assert is_nonce_error(ValueError({"message": "nonce too low"}))
+    assert not is_nonce_error(ValueError("insufficient funds for gas * price + value"))
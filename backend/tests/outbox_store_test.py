@@ -0,0 +1,101 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.outboxManager import outbox as outbox_module
+from app.services.outboxManager.outbox import Outbox, OutboxFull
+from app.services.outboxManager.outbox_store import OutboxStore
+
+def test_claim_order_and_follow_ups(tmp_path):
+    store = OutboxStore(str(tmp_path / "outbox.sqlite3"))
+    first = store.insert("record_transaction", {"amount_wei": 10**30})
+    second = store.insert("record_transaction", {"amount_wei": 1})
+
+    claimed = store.claim()
+    assert claimed["id"] == first and claimed["status"] == "sending" and claimed["attempts"] == 1
+    assert claimed["payload"] == {"amount_wei": 10**30}
+
+    store.mark_signed([first], "0xabc", "0xsender", 7)
+    store.mark_done([(first, {"transaction_id": 1}, [("award_points", {"points": 5})])])
+    assert store.get(first)["result"] == {"transaction_id": 1}
+    assert store.counts() == {"done": 1, "queued": 2}
+
+    assert store.claim()["id"] == second
+    follow_up = store.claim()
+    assert follow_up["kind"] == "award_points" and follow_up["payload"] == {"points": 5}
+    assert store.claim() is None
+
+def test_interrupted_and_delayed_intents(tmp_path):
+    store = OutboxStore(str(tmp_path / "outbox.sqlite3"))
+    intent_id = store.insert("award_points", {"points": 5})
+    store.claim()
+
+    # Claimed but never signed before a restart: safe to send again
+    assert store.requeue_interrupted() == 1
+    store.claim()
+    store.requeue(intent_id, delay=60, error="node down")
+    assert store.claim() is None
+    assert store.get(intent_id)["error"] == "node down"
+
+def test_enqueue_backpressure(tmp_path):
+    outbox = Outbox(OutboxStore(str(tmp_path / "outbox.sqlite3")), max_pending=2)
+    outbox.register("award_points", None, None)
+
+    async def run():
+        await outbox.enqueue("award_points", {"points": 1})
+        await outbox.enqueue("award_points", {"points": 2})
+        with pytest.raises(OutboxFull):
+            await outbox.enqueue("award_points", {"points": 3})
+
+    asyncio.run(run())
+    assert outbox.stats()["queued"] == 2
+
+    # The count survives a restart, since it's read back from the store
+    assert Outbox(outbox.store, max_pending=2).pending_count() == 2
+
+def test_batched_kinds_are_claimed_together(tmp_path):
+    store = OutboxStore(str(tmp_path / "outbox.sqlite3"))
+    award_ids = [store.insert("award_points", {"points": points}) for points in range(1, 6)]
+    sale_id = store.insert("record_transaction", {"amount_wei": 1})
+
+    # Workers sending one intent at a time leave batched kinds alone
+    assert store.claim(exclude_kinds=("award_points",))["id"] == sale_id
+    assert store.claim(exclude_kinds=("award_points",)) is None
+
+    assert [intent["id"] for intent in store.claim_batch("award_points", 3)] == award_ids[:3]
+    assert [intent["id"] for intent in store.claim_batch("award_points", 3)] == award_ids[3:]
+    store.mark_signed(award_ids[:3], "0xabc", "0xsender", 1)
+    assert [intent["tx_hash"] for intent in store.list_by_status(("signed",))] == ["0xabc"] * 3
+
+def test_mined_intent_is_processed_again_when_completion_fails(tmp_path, monkeypatch):
+    receipt = SimpleNamespace(status=1, transactionHash=b"\xab" * 32)
+
+    async def wait(tx_hash, timeout=None):
+        return receipt
+
+    monkeypatch.setattr(outbox_module.receipt_tracker, "wait", wait)
+    monkeypatch.setattr(outbox_module, "OUTBOX_RETRY_DELAY", 0)
+    outbox = Outbox(OutboxStore(str(tmp_path / "outbox.sqlite3")))
+    seen = []
+
+    async def complete(payload, tx_receipt):
+        intent = outbox.get(intent_id)
+        seen.append((intent["status"], intent["error"]))
+        if len(seen) == 1:
+            raise ConnectionError("node went away")
+        return {"transaction_id": 1}, [("award_points", {"points": 5})]
+
+    outbox.register("record_transaction", None, complete)
+    intent_id = outbox.store.insert("record_transaction", {"amount_wei": 1})
+    outbox.store.claim()
+    outbox.store.mark_signed([intent_id], "0xab", "0xsender", 0)
+    intent = outbox.get(intent_id)
+
+    asyncio.run(outbox._complete([intent], "0xab"))
+
+    # The failed attempt left it signed, not failed, so its follow-up wasn't lost
+    assert seen[0] == ("signed", None)
+    assert seen[1][0] == "signed" and "node went away" in seen[1][1]
+    assert outbox.get(intent_id)["status"] == "done"
+    assert [follow_up["kind"] for follow_up in outbox.store.list_by_status(("queued",))] == ["award_points"]
@@ -0,0 +1,103 @@
+import asyncio
+from types import SimpleNamespace
+from web3.providers.async_rpc import AsyncHTTPProvider
+from app.services.chainManager.rpc_batch import send_batch
+
+class FakeManager:
+    """
+    web3's request manager, answering each call with its params' first item.
+    """
+
+    def __init__(self):
+        self.requests = []
+
+    async def coro_request(self, method, params):
+        self.requests.append((method, params))
+        if params[0] == "fail":
+            raise ValueError("execution reverted")
+        return params[0]
+
+class FakeResponse:
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise RuntimeError(f"HTTP {self.status}")
+
+    async def json(self, content_type=None):
+        return self.body
+
+class FakeSession:
+    """
+    aiohttp session whose node answers a batch POST with `answer(payload)` -> (status, body).
+    """
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.posts = 0
+
+    def post(self, url, json):
+        self.posts += 1
+        return FakeResponse(*self.answer(json))
+
+def make_web3(provider):
+    return SimpleNamespace(provider=provider, manager=FakeManager())
+
+CALLS = [("eth_call", [7]), ("eth_call", ["fail"]), ("eth_call", [b"\x01"])]
+
+def test_batch_responses_come_back_in_call_order():
+    web3 = make_web3(AsyncHTTPProvider("http://node"))
+    # The node answers out of order
+    session = FakeSession(lambda payload: (200, [{"id": request["id"], "result": request["params"][0]} for request in reversed(payload)]))
+
+    responses = asyncio.run(send_batch(web3, CALLS, session))
+
+    assert [response["result"] for response in responses] == [7, "fail", b"\x01"]
+    assert session.posts == 1 and web3.manager.requests == []
+
+def test_rejected_batch_falls_back_to_one_request_per_call():
+    web3 = make_web3(AsyncHTTPProvider("http://node"))
+    session = FakeSession(lambda payload: (200, {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "batch too large"}}))
+
+    responses = asyncio.run(send_batch(web3, CALLS, session))
+
+    assert responses[0] == {"result": "0x7"}
+    assert "execution reverted" in responses[1]["error"]["message"]
+    assert responses[2] == {"result": "0x01"}
+    assert web3.manager.requests == [(method, params) for method, params in CALLS]
+
+def test_http_4xx_falls_back_to_one_request_per_call():
+    web3 = make_web3(AsyncHTTPProvider("http://node"))
+    session = FakeSession(lambda payload: (413, None))
+
+    responses = asyncio.run(send_batch(web3, CALLS[:1], session))
+
+    assert responses == [{"result": "0x7"}]
+    assert len(web3.manager.requests) == 1
+
+def test_node_failure_is_not_retried_per_call():
+    web3 = make_web3(AsyncHTTPProvider("http://node"))
+    session = FakeSession(lambda payload: (502, None))
+
+    try:
+        asyncio.run(send_batch(web3, CALLS, session))
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("a 5xx should fail the batch")
+    assert web3.manager.requests == []
+
+def test_non_http_provider_sends_one_request_per_call():
+    web3 = make_web3(object())
+
+    responses = asyncio.run(send_batch(web3, CALLS[:1]))
+
+    assert responses == [{"result": "0x7"}]
@@ -0,0 +1,81 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.services.chainManager import signer_pool as signer_pool_module
+from app.services.chainManager.signer_pool import SignerPool, bump_fee, MAX_REPRICES
+
+PRIVATE_KEY = "0x" + "11" * 32
+
+class FakeEth:
+    """
+    Signs by echoing the tx and accepts every raw transaction under a new hash.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.account = SimpleNamespace(sign_transaction=lambda tx, private_key: SimpleNamespace(rawTransaction=dict(tx)))
+
+    async def send_raw_transaction(self, raw_tx):
+        self.sent.append(raw_tx)
+        return bytes([len(self.sent)]) * 32
+
+class FakeChainState:
+    def __init__(self, fees):
+        self.fees = fees
+
+    async def get_fee_params(self):
+        return self.fees
+
+class FakeReceiptTracker:
+    def __init__(self):
+        self.replaced = []
+
+    def track(self, tx_hash):
+        return {"future": asyncio.get_running_loop().create_future()}
+
+    def replace(self, tx_hash, new_tx_hash):
+        self.replaced.append((tx_hash, new_tx_hash))
+
+def make_pool(monkeypatch, fees):
+    monkeypatch.setattr(signer_pool_module, "chain_state", FakeChainState(fees))
+    monkeypatch.setattr(signer_pool_module, "receipt_tracker", FakeReceiptTracker())
+    web3 = SimpleNamespace(eth=FakeEth())
+    return SignerPool(web3, [PRIVATE_KEY], poll_interval=0.001, stuck_timeout=0), web3.eth
+
+def test_bump_fee_raises_by_more_than_the_replacement_minimum():
+    assert bump_fee(100) == 113
+    assert bump_fee(10**9) == 1_120_000_001
+    # Nodes want at least +10%, rounding included
+    assert all(bump_fee(fee) * 10 >= fee * 11 for fee in (1, 7, 99, 12345))
+
+def test_reprice_bumps_every_fee_field_but_never_below_current_fees(monkeypatch):
+    pool, eth = make_pool(monkeypatch, {"maxFeePerGas": 500, "maxPriorityFeePerGas": 1})
+    account = pool.accounts[0]
+
+    async def run():
+        pool.sent(account, {"nonce": 3, "maxFeePerGas": 100, "maxPriorityFeePerGas": 10}, b"\x00" * 32)
+        await pool._reprice(pool._in_flight[account.address][3])
+
+    asyncio.run(run())
+    assert eth.sent == [{"nonce": 3, "maxFeePerGas": 500, "maxPriorityFeePerGas": 12}]
+    record = pool._in_flight[account.address][3]
+    assert record["reprices"] == 1 and record["tx_hash"] == b"\x01" * 32
+    assert signer_pool_module.receipt_tracker.replaced == [(b"\x00" * 32, b"\x01" * 32)]
+
+def test_stuck_transaction_is_repriced_at_most_max_reprices_times(monkeypatch):
+    pool, eth = make_pool(monkeypatch, {"gasPrice": 1})
+    account = pool.accounts[0]
+
+    async def run():
+        pool.sent(account, {"nonce": 0, "gasPrice": 100}, b"\x00" * 32)
+        await pool.start()
+        await asyncio.sleep(0.1)
+        await pool.stop()
+
+    asyncio.run(run())
+    assert len(eth.sent) == MAX_REPRICES
+    prices = [100] + [tx["gasPrice"] for tx in eth.sent]
+    assert all(new == bump_fee(old) for old, new in zip(prices, prices[1:]))
+    # Each replacement is chained onto the hash it replaced
+    replaced = signer_pool_module.receipt_tracker.replaced
+    assert [old for old, _ in replaced[1:]] == [new for _, new in replaced[:-1]]
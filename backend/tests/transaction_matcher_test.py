@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from web3 import Web3
+
+from app.services.indexManager.event_indexer import event_indexer
+from app.services.indexManager.event_store import EventStore
+from app.transactionManager import transaction_matcher
+from app.transactionManager.transaction_matcher import match_transaction_id, match_references, sale_references
+
+def test_match_references(tmp_path, monkeypatch):
+    monkeypatch.setattr(event_indexer, "store", EventStore(str(tmp_path / "index.sqlite3")))
+
+    transaction_matcher.index_references(7, sale_references({"payment_ref": "PAY-7", "receipt_number": "R-7"}))
+    event_indexer.record_local_references(8, [("payment_ref", "PAY-8")])
+
+    assert match_transaction_id("PAY-7") == 7
+    assert match_transaction_id("R-7") == 7
+    assert match_transaction_id("R-7", reference_type="receipt_number") == 7
+    with pytest.raises(ValueError):
+        match_transaction_id("R-7", reference_type="payment_ref")
+
+    # Lookups are chunked, so any number of references can be matched at once
+    references = [("payment_ref", f"PAY-{i}") for i in range(2000)]
+    assert {match["transaction_id"] for match in match_references(references).values()} == {7, 8}
+
+def test_referenced_sale_carries_references_into_the_record_call():
+    sale = {
+        "customer_address": "0x" + "ab" * 20, "retailer_address": "0x" + "cd" * 20, "product_id": "SKU-1",
+        "quantity": 2, "description": None, "payment_ref": "PAY-9", "receipt_number": None,
+    }
+    customer, retailer, amount, product_id, quantity, description, payment_ref, receipt_number = (
+        transaction_matcher.referenced_sale(sale, 10**15)
+    )
+    assert (customer, retailer) == (Web3.to_checksum_address(sale["customer_address"]), Web3.to_checksum_address(sale["retailer_address"]))
+    assert (amount, product_id, quantity, description) == (10**15, "SKU-1", 2, "")
+    # A missing reference is an empty string, which the contract doesn't log
+    assert (payment_ref, receipt_number) == ("PAY-9", "")
+
+def test_a_reference_can_only_be_claimed_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(event_indexer, "store", EventStore(str(tmp_path / "index.sqlite3")))
+    monkeypatch.setattr(transaction_matcher.outbox, "get", lambda intent_id: {"id": intent_id, "status": "signed"})
+
+    transaction_matcher.claim_references([("payment_ref", "PAY-1")], "intent:1")
+    # Claiming again under the same owner is fine, under another one is not
+    transaction_matcher.claim_references([("payment_ref", "PAY-1")], "intent:1")
+    with pytest.raises(transaction_matcher.ReferenceClaimed):
+        transaction_matcher.claim_references([("receipt_number", "R-2"), ("payment_ref", "PAY-1")], "intent:2")
+    # All or none: R-2 wasn't claimed by the refused sale
+    transaction_matcher.claim_references([("receipt_number", "R-2")], "intent:3")
+
+    # Once recorded, the reference stays taken
+    transaction_matcher.index_references(7, [("payment_ref", "PAY-1")])
+    with pytest.raises(transaction_matcher.ReferenceClaimed) as refused:
+        transaction_matcher.claim_references([("payment_ref", "PAY-1")], "intent:4")
+    assert refused.value.conflict["transaction_id"] == 7
+
+def test_concurrent_claims_of_a_reference_have_one_winner(tmp_path, monkeypatch):
+    path = str(tmp_path / "index.sqlite3")
+    monkeypatch.setattr(event_indexer, "store", EventStore(path))
+    event_indexer.store.connect()
+    # Separate connections, as separate processes sharing the index would have
+    stores = [EventStore(path) for _ in range(8)]
+    barrier = threading.Barrier(len(stores))
+
+    def claim(i):
+        barrier.wait()
+        return stores[i].claim_references([("payment_ref", "PAY-1")], f"request:{i}")
+
+    with ThreadPoolExecutor(len(stores)) as pool:
+        conflicts = list(pool.map(claim, range(len(stores))))
+    assert conflicts.count(None) == 1
+
+def test_claims_of_sales_that_never_reached_the_chain_are_taken_over(tmp_path, monkeypatch):
+    monkeypatch.setattr(event_indexer, "store", EventStore(str(tmp_path / "index.sqlite3")))
+    statuses = {1: "dead", 2: "queued"}
+    monkeypatch.setattr(transaction_matcher.outbox, "get", lambda intent_id: {"id": intent_id, "status": statuses[intent_id]})
+
+    transaction_matcher.claim_references([("payment_ref", "PAY-1")], "intent:1")
+    transaction_matcher.claim_references([("payment_ref", "PAY-2")], "intent:2")
+    transaction_matcher.claim_references([("payment_ref", "PAY-3")], "request:abc")
+
+    transaction_matcher.claim_references([("payment_ref", "PAY-1")], "intent:5")
+    with pytest.raises(transaction_matcher.ReferenceClaimed):
+        transaction_matcher.claim_references([("payment_ref", "PAY-2")], "intent:5")
+    # A request's claim is only taken over once it has outlived the timeout
+    with pytest.raises(transaction_matcher.ReferenceClaimed):
+        transaction_matcher.claim_references([("payment_ref", "PAY-3")], "intent:5")
+    monkeypatch.setattr(transaction_matcher, "REFERENCE_CLAIM_TIMEOUT", -1)
+    transaction_matcher.claim_references([("payment_ref", "PAY-3")], "intent:5")
+
+    transaction_matcher.release_references("intent:5")
+    transaction_matcher.claim_references([("payment_ref", "PAY-1"), ("payment_ref", "PAY-3")], "intent:6")
@@ -0,0 +1,95 @@
+import asyncio
+from types import SimpleNamespace
+
+from eth_account import Account
+from web3.exceptions import TransactionNotFound
+
+from app.services.chainManager import tx_sender
+from app.services.chainManager.nonce_manager import NonceManager
+from app.services.chainManager.tx_sender import send_transaction
+
+ACCOUNT = Account.from_key("0x" + "22" * 32)
+
+class FakeEth:
+    """
+    A node whose sends fail with `send_error` and that has `pending_count`
+    transactions from the account, none of them with a known hash.
+    """
+
+    def __init__(self, send_error, pending_count=0):
+        self.send_error = send_error
+        self.pending_count = pending_count
+        self.account = SimpleNamespace(sign_transaction=lambda tx, private_key: SimpleNamespace(
+            hash=bytes([tx["nonce"] + 1]) * 32, rawTransaction=b"raw"
+        ))
+
+    async def send_raw_transaction(self, raw_tx):
+        raise self.send_error
+
+    async def get_transaction_receipt(self, tx_hash):
+        raise TransactionNotFound("not found")
+
+    async def get_transaction(self, tx_hash):
+        raise TransactionNotFound("not found")
+
+    async def get_transaction_count(self, address, block_identifier="latest"):
+        return self.pending_count
+
+class FakeFunction:
+    async def build_transaction(self, transaction):
+        return dict(transaction)
+
+class FakeChainState:
+    async def get_fee_params(self):
+        return {"gasPrice": 1}
+
+    async def get_chain_id(self):
+        return 1
+
+def use_node(monkeypatch, eth):
+    web3 = SimpleNamespace(eth=eth)
+    monkeypatch.setattr(tx_sender, "async_w3", web3)
+    monkeypatch.setattr(tx_sender, "chain_state", FakeChainState())
+    monkeypatch.setattr(tx_sender, "nonce_manager", NonceManager(web3))
+    monkeypatch.setattr(tx_sender, "UNANSWERED_SEND_CHECK_DELAY", 0.01)
+
+async def send_and_fail():
+    try:
+        await send_transaction(FakeFunction(), account=ACCOUNT, gas=21000)
+    except Exception as e:
+        return e
+    raise AssertionError("the send should have failed")
+
+def test_rejected_send_gives_its_nonce_back(monkeypatch):
+    use_node(monkeypatch, FakeEth(ValueError("insufficient funds")))
+
+    async def run():
+        await send_and_fail()
+        return await tx_sender.nonce_manager.allocate(ACCOUNT.address)
+
+    assert asyncio.run(run()) == 0
+
+def test_unanswered_send_keeps_its_nonce_while_the_node_may_have_it(monkeypatch):
+    eth = FakeEth(asyncio.TimeoutError())
+    use_node(monkeypatch, eth)
+
+    async def run():
+        await send_and_fail()
+        # Before the lookup the nonce isn't handed out again
+        before_check = await tx_sender.nonce_manager.allocate(ACCOUNT.address)
+        # The node counts nonce 0 as used, by a transaction it has under another hash
+        eth.pending_count = 2
+        await asyncio.sleep(0.05)
+        return before_check, await tx_sender.nonce_manager.allocate(ACCOUNT.address)
+
+    assert asyncio.run(run()) == (1, 2)
+
+def test_unanswered_send_frees_its_nonce_once_known_dropped(monkeypatch):
+    use_node(monkeypatch, FakeEth(ConnectionResetError("connection reset"), pending_count=0))
+
+    async def run():
+        await send_and_fail()
+        await asyncio.sleep(0.05)
+        return await tx_sender.nonce_manager.allocate(ACCOUNT.address)
+
+    assert asyncio.run(run()) == 0
@@ -0,0 +1,116 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.0;
+
+// Subset of RetailTransaction used by the router
+interface IRetailTransaction {
+    // Same layout as RetailTransaction.ReferencedSaleInput
+    struct ReferencedSaleInput {
+        address customerAddress;
+        address retailerAddress;
+        uint256 amountInWei;
+        string productId;
+        uint256 quantity;
+        string description;
+        string paymentRef;
+        string receiptNumber;
+    }
+
+    function recordReferencedTransactions(ReferencedSaleInput[] memory _sales) external returns (uint256[] memory);
+
+    function recordTransaction(
+        address _customerAddress,
+        address _retailerAddress,
+        uint256 _amountInWei,
+        string memory _productId,
+        uint256 _quantity,
+        string memory _description
+    ) external returns (uint256);
+}
+
+// Subset of LoyaltyPoints used by the router
+interface ILoyaltyPoints {
+    function awardPoints(address _recipient, uint256 _amount) external;
+}
+
+/**
+ * @title CheckoutRouter
+ * @dev Records a sale and awards its loyalty points in a single transaction,
+ * so either both effects land or neither does.
+ */
+contract CheckoutRouter {
+    // Contract the sales are recorded on
+    IRetailTransaction public immutable retailTransaction;
+
+    // Contract the loyalty points are awarded on
+    ILoyaltyPoints public immutable loyaltyPoints;
+
+    /**
+     * @dev Constructor of the contract.
+     * @param _retailTransaction The address of the RetailTransaction contract.
+     * @param _loyaltyPoints The address of the LoyaltyPoints contract.
+     */
+    constructor(address _retailTransaction, address _loyaltyPoints) {
+        // Ensure valid contract addresses are provided
+        require(_retailTransaction != address(0), "Invalid RetailTransaction address.");
+        require(_loyaltyPoints != address(0), "Invalid LoyaltyPoints address.");
+
+        retailTransaction = IRetailTransaction(_retailTransaction);
+        loyaltyPoints = ILoyaltyPoints(_loyaltyPoints);
+    }
+
+    /**
+     * @dev Records a retail transaction and awards loyalty points to the customer.
+     * The points are calculated off-chain by the backend's points rule.
+     * @param _customerAddress The address of the customer.
+     * @param _retailerAddress The address of the retailer.
+     * @param _amountInWei The total amount of the transaction in Wei.
+     * @param _productId The identifier of the product.
+     * @param _quantity The quantity of the product purchased.
+     * @param _description An optional description for the transaction.
+     * @param _points The loyalty points to award; no award is made when zero.
+     * @return transactionId The unique transaction ID generated for this transaction.
+     */
+    function recordAndAward(
+        address _customerAddress,
+        address _retailerAddress,
+        uint256 _amountInWei,
+        string memory _productId,
+        uint256 _quantity,
+        string memory _description,
+        uint256 _points
+    ) public returns (uint256 transactionId) {
+        transactionId = retailTransaction.recordTransaction(
+            _customerAddress,
+            _retailerAddress,
+            _amountInWei,
+            _productId,
+            _quantity,
+            _description
+        );
+
+        // LoyaltyPoints rejects zero awards, so small sales only record the transaction
+        if (_points > 0) {
+            loyaltyPoints.awardPoints(_customerAddress, _points);
+        }
+    }
+
+    /**
+     * @dev Like recordAndAward, for a sale carrying off-chain references (payment
+     * gateway ref, POS receipt number): they are logged by RetailTransaction in the same transaction.
+     * @param _sale The sale and its references; empty strings for references it doesn't have.
+     * @param _points The loyalty points to award; no award is made when zero.
+     * @return transactionId The unique transaction ID generated for this transaction.
+     */
+    function recordAndAwardReferenced(
+        IRetailTransaction.ReferencedSaleInput memory _sale,
+        uint256 _points
+    ) public returns (uint256 transactionId) {
+        IRetailTransaction.ReferencedSaleInput[] memory sales = new IRetailTransaction.ReferencedSaleInput[](1);
+        sales[0] = _sale;
+        transactionId = retailTransaction.recordReferencedTransactions(sales)[0];
+
+        if (_points > 0) {
+            loyaltyPoints.awardPoints(_sale.customerAddress, _points);
+        }
+    }
+}
@@ -22,6 +22,30 @@ contract LoyaltyPoints {
      * @param _amount The number of loyalty points to award.
      */
     function awardPoints(address _recipient, uint256 _amount) public {
+        _awardPoints(_recipient, _amount);
+    }
+
+    /**
+     * @dev Awards loyalty points to many addresses in a single transaction.
+     * Emits one PointsAwarded event per recipient, exactly like awardPoints.
+     * @param _recipients The addresses to whom points are to be awarded.
+     * @param _amounts The number of loyalty points to award to each recipient, in the same order.
+     */
+    function awardPointsBatch(address[] calldata _recipients, uint256[] calldata _amounts) public {
+        // Ensure at least one award is provided
+        require(_recipients.length > 0, "No awards provided.");
+        // Ensure every recipient has an amount
+        require(_recipients.length == _amounts.length, "Recipients and amounts must have the same length.");
+
+        for (uint256 i = 0; i < _recipients.length; i++) {
+            _awardPoints(_recipients[i], _amounts[i]);
+        }
+    }
+
+    /**
+     * @dev Validates and credits a single award.
+     */
+    function _awardPoints(address _recipient, uint256 _amount) internal {
         // Ensure a valid recipient address
         require(_recipient != address(0), "Invalid recipient address.");
         // Ensure a positive amount of points
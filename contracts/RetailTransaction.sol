@@ -35,6 +35,13 @@ contract RetailTransaction {
         uint256 timestamp
     );
 
+    // Event emitted when an off-chain reference (payment gateway ref, POS receipt number) is attached to a transaction
+    event TransactionReferenced(
+        uint256 indexed transactionId,
+        string referenceType,
+        string externalRef
+    );
+
     /**
      * @dev Constructor of the contract. Initializes the transaction ID counter.
      */
@@ -42,6 +49,28 @@ contract RetailTransaction {
         nextTransactionId = 1; // Start transaction IDs from 1
     }
 
+    // Input for a single sale when recording several transactions at once
+    struct SaleInput {
+        address customerAddress;
+        address retailerAddress;
+        uint256 amountInWei;
+        string productId;
+        uint256 quantity;
+        string description;
+    }
+
+    // Input for a sale recorded together with its off-chain references; empty strings for references it doesn't have
+    struct ReferencedSaleInput {
+        address customerAddress;
+        address retailerAddress;
+        uint256 amountInWei;
+        string productId;
+        uint256 quantity;
+        string description;
+        string paymentRef;
+        string receiptNumber;
+    }
+
     /**
      * @dev Records a new retail transaction.
      * @param _customerAddress The address of the customer.
@@ -60,6 +89,83 @@ contract RetailTransaction {
         uint256 _quantity,
         string memory _description
     ) public returns (uint256) {
+        return _recordTransaction(
+            _customerAddress,
+            _retailerAddress,
+            _amountInWei,
+            _productId,
+            _quantity,
+            _description
+        );
+    }
+
+    /**
+     * @dev Records several retail transactions in a single call.
+     * Emits one TransactionRecorded event per sale, in input order.
+     * @param _sales The sales to record.
+     * @return transactionIds The unique transaction IDs generated, in input order.
+     */
+    function recordTransactions(SaleInput[] memory _sales) public returns (uint256[] memory transactionIds) {
+        // Ensure at least one sale is provided
+        require(_sales.length > 0, "No transactions provided.");
+
+        transactionIds = new uint256[](_sales.length);
+        for (uint256 i = 0; i < _sales.length; i++) {
+            transactionIds[i] = _recordTransaction(
+                _sales[i].customerAddress,
+                _sales[i].retailerAddress,
+                _sales[i].amountInWei,
+                _sales[i].productId,
+                _sales[i].quantity,
+                _sales[i].description
+            );
+        }
+    }
+
+    /**
+     * @dev Records several retail transactions in a single call, each with the
+     * off-chain references (payment gateway ref, POS receipt number) it was made under.
+     * Emits one TransactionRecorded event per sale, in input order, followed by a
+     * TransactionReferenced event per non-empty reference. The references aren't
+     * stored; their logs let an off-chain index of references be rebuilt from the chain.
+     * @param _sales The sales to record.
+     * @return transactionIds The unique transaction IDs generated, in input order.
+     */
+    function recordReferencedTransactions(ReferencedSaleInput[] memory _sales) public returns (uint256[] memory transactionIds) {
+        // Ensure at least one sale is provided
+        require(_sales.length > 0, "No transactions provided.");
+
+        transactionIds = new uint256[](_sales.length);
+        for (uint256 i = 0; i < _sales.length; i++) {
+            transactionIds[i] = _recordTransaction(
+                _sales[i].customerAddress,
+                _sales[i].retailerAddress,
+                _sales[i].amountInWei,
+                _sales[i].productId,
+                _sales[i].quantity,
+                _sales[i].description
+            );
+            if (bytes(_sales[i].paymentRef).length > 0) {
+                emit TransactionReferenced(transactionIds[i], "payment_ref", _sales[i].paymentRef);
+            }
+            if (bytes(_sales[i].receiptNumber).length > 0) {
+                emit TransactionReferenced(transactionIds[i], "receipt_number", _sales[i].receiptNumber);
+            }
+        }
+    }
+
+    /**
+     * @dev Validates, stores and logs a single retail transaction.
+     * @return The unique transaction ID generated for this transaction.
+     */
+    function _recordTransaction(
+        address _customerAddress,
+        address _retailerAddress,
+        uint256 _amountInWei,
+        string memory _productId,
+        uint256 _quantity,
+        string memory _description
+    ) internal returns (uint256) {
         // Ensure that the amount is positive
         require(_amountInWei > 0, "Transaction amount must be positive.");
         // Ensure that the quantity is positive